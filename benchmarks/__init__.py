@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks offline do Poligonizador de Linhas de Corte"""
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark offline do pipeline de poligonização
+Gera quadras e linhas de corte sintéticas em GeoPackage, executa o pipeline
+sem banco de dados e sem rede e mede vazão (quadras/s, lotes/s) e pico de memória
+
+Uso (na raiz do repositório, com o Python do QGIS):
+    python -m benchmarks.benchmark_pipeline
+    python -m benchmarks.benchmark_pipeline --motor memoria --tamanhos 1 10 100
+    python -m benchmarks.benchmark_pipeline --motor geos --tamanhos 100 1000
+    python -m benchmarks.benchmark_pipeline --saida resultado.json --perfil
+    python -m benchmarks.benchmark_pipeline --vetorizacao
+
+Cada tamanho roda em um subprocesso próprio para que o pico de memória
+(ru_maxrss) seja o daquele tamanho e não o acumulado das execuções anteriores.
+
+--vetorizacao compara a extensão de linhas com NumPy (vetorizado) e por
+feição (extendLine) em quantidades crescentes de linhas e sugere o valor de
+vetorizado.LIMIAR_VETORIZACAO: a menor quantidade a partir da qual o NumPy
+vence em todas as maiores.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+TAMANHOS_PADRAO = [1, 10, 100, 1000]
+QUANTIDADES_VETORIZACAO = [4, 8, 16, 32, 64, 128, 256, 1024]
+
+
+def _executar_processing(quadra_layer, linhas_layer, modo, perfil):
+    """Motor 'processing': ProcessingPipeline.executar_pipeline_completo"""
+    from qgis.core import QgsFields, QgsProcessingFeedback, QgsProcessingMultiStepFeedback
+    from poligonizador_linha_corte.services.nucleo import criar_camada_memoria
+    from poligonizador_linha_corte.services.pipeline_processing import ProcessingPipeline
+    from poligonizador_linha_corte.services.indice_espacial import LinhasCorteIndex
+    from poligonizador_linha_corte.services.definicao_pipeline import DefinicaoPipeline
+    from poligonizador_linha_corte.services.pipeline_memoria import InMemoryPipeline
+
+    contexto = InMemoryPipeline.contexto_execucao()
+    definicao = DefinicaoPipeline.padrao()
+    crs = quadra_layer.crs().authid()
+    feedback = QgsProcessingFeedback()
+
+    def executar(quadras, linhas):
+        camada_quadras = criar_camada_memoria(
+            quadras, quadra_layer.fields(), quadra_layer.wkbType(), crs, 'Quadra'
+        )
+        camada_quadras.selectAll()
+        camada_linhas = criar_camada_memoria(
+            linhas, QgsFields(), linhas_layer.wkbType(), crs, 'Linhas_corte'
+        )
+        outputs = ProcessingPipeline.executar_pipeline_completo(
+            camada_quadras, camada_linhas, None,
+            QgsProcessingMultiStepFeedback(definicao.num_etapas, feedback),
+            contexto=contexto, definicao=definicao, perfil=perfil
+        )
+        return outputs['EditarCampos']['OUTPUT'].featureCount()
+
+    indice = LinhasCorteIndex(linhas_layer)
+    quadras = list(quadra_layer.getFeatures())
+    if modo == 'lote':
+        linhas = {}
+        for quadra in quadras:
+            for linha in indice.linhas_intersectando(quadra.geometry()):
+                linhas.setdefault(linha.id(), linha)
+        return executar(quadras, list(linhas.values()))
+
+    lotes = 0
+    for quadra in quadras:
+        with perfil.quadra(quadra['id']):
+            lotes += executar([quadra], indice.linhas_intersectando(quadra.geometry()))
+    return lotes
+
+
+def _executar_memoria(quadra_layer, linhas_layer, modo, perfil, nodagem=False):
+    """
+    Motores 'memoria' e 'geos' (nodagem única): InMemoryPipeline.executar por quadra
+
+    Como no plugin, o modo 'quadra' entrega uma camada de lotes por quadra à
+    importação e o modo 'lote' uma única camada com os lotes de todas.
+    """
+    from poligonizador_linha_corte.services.indice_espacial import LinhasCorteIndex
+    from poligonizador_linha_corte.services.pipeline_memoria import InMemoryPipeline
+
+    contexto = InMemoryPipeline.contexto_execucao()
+    crs = quadra_layer.crs().authid()
+    indice = LinhasCorteIndex(linhas_layer)
+    lotes, total = [], 0
+    for quadra in quadra_layer.getFeatures():
+        linhas = [f.geometry() for f in indice.linhas_intersectando(quadra.geometry())]
+        with perfil.quadra(quadra['id']):
+            resultado = InMemoryPipeline.executar(
+                quadra, linhas, contexto=contexto, perfil=perfil, nodagem=nodagem
+            )['lotes']
+        if modo == 'lote':
+            lotes.extend(resultado)
+        else:
+            total += InMemoryPipeline.criar_camada_lotes(resultado, crs).featureCount()
+    if modo == 'lote':
+        total = InMemoryPipeline.criar_camada_lotes(lotes, crs).featureCount()
+    return total
+
+
+def comparar_vetorizacao(quantidades, repeticoes=20, distancia=0.3):
+    """
+    Tempo da extensão de linhas com NumPy e por feição para cada quantidade de linhas
+
+    Usa o menor tempo de `repeticoes` execuções de cada caminho, sobre as
+    linhas de corte sintéticas.
+
+    Returns:
+        dict: {'limiar_atual', 'limiar_sugerido', 'medicoes': [{'linhas', 'escalar_ms', 'numpy_ms', 'razao'}]}
+    """
+    from poligonizador_linha_corte.services import vetorizado
+    if not vetorizado.disponivel():
+        raise Exception("NumPy não está instalado")
+
+    from poligonizador_linha_corte.services.nucleo import iniciar_qgis
+    app = iniciar_qgis()
+    from benchmarks.dados_sinteticos import gerar_linhas_corte, gerar_quadras
+
+    def melhor_tempo(funcao, linhas):
+        melhor = None
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            funcao(linhas)
+            duracao = time.perf_counter() - inicio
+            melhor = duracao if melhor is None else min(melhor, duracao)
+        return melhor
+
+    # 9 linhas por quadra com 5 lotes por lado
+    todas = [f.geometry() for f in gerar_linhas_corte(gerar_quadras(max(quantidades) // 9 + 1))]
+    medicoes = []
+    for quantidade in quantidades:
+        linhas = todas[:quantidade]
+        escalar = melhor_tempo(lambda ls: [g.extendLine(distancia, distancia) for g in ls], linhas)
+        numpy = melhor_tempo(lambda ls: vetorizado.estender_linhas(ls, distancia), linhas)
+        medicoes.append({
+            'linhas': quantidade,
+            'escalar_ms': round(escalar * 1000, 4),
+            'numpy_ms': round(numpy * 1000, 4),
+            'razao': round(escalar / numpy, 2) if numpy else None
+        })
+
+    # Menor quantidade a partir da qual o NumPy vence em todas as maiores
+    sugerido = None
+    for medicao in reversed(medicoes):
+        if medicao['numpy_ms'] >= medicao['escalar_ms']:
+            break
+        sugerido = medicao['linhas']
+
+    app.exitQgis()
+    return {'limiar_atual': vetorizado.LIMIAR_VETORIZACAO, 'limiar_sugerido': sugerido, 'medicoes': medicoes}
+
+
+def imprimir_vetorizacao(resultado):
+    """Tabela da comparação NumPy × por feição"""
+    cabecalho = f"{'linhas':>8}{'por feição (ms)':>17}{'numpy (ms)':>12}{'razão':>8}"
+    print(cabecalho)
+    print('-' * len(cabecalho))
+    for m in resultado['medicoes']:
+        print(f"{m['linhas']:>8}{m['escalar_ms']:>17.3f}{m['numpy_ms']:>12.3f}{m['razao']:>8.2f}")
+    print(f"LIMIAR_VETORIZACAO atual: {resultado['limiar_atual']}; "
+          f"sugerido: {resultado['limiar_sugerido'] or 'NumPy não venceu'}")
+
+
+def executar_tamanho(args):
+    """Executa um tamanho no processo atual e retorna o dict de resultado"""
+    from poligonizador_linha_corte.services.nucleo import iniciar_qgis
+    app = iniciar_qgis(com_processing=True)
+    from benchmarks.dados_sinteticos import criar_geopackage
+    from poligonizador_linha_corte.services.profiler import PipelineProfiler
+
+    caminho = os.path.join(args.diretorio, f"sintetico_{args.executar_tamanho}.gpkg")
+    quadra_layer, linhas_layer = criar_geopackage(
+        caminho, args.executar_tamanho, args.lotes_por_lado, args.vertices_borda
+    )
+    perfil = PipelineProfiler(ativo=args.perfil)
+    inicio = time.perf_counter()
+    if args.motor == 'processing':
+        lotes = _executar_processing(quadra_layer, linhas_layer, args.modo, perfil)
+    else:
+        lotes = _executar_memoria(quadra_layer, linhas_layer, args.modo, perfil, args.motor == 'geos')
+    duracao = time.perf_counter() - inicio
+
+    resultado = {
+        'motor': args.motor,
+        'modo': args.modo,
+        'quadras': args.executar_tamanho,
+        'linhas': linhas_layer.featureCount(),
+        'lotes': lotes,
+        'lotes_esperados': args.executar_tamanho * 2 * args.lotes_por_lado,
+        'duracao_s': round(duracao, 4),
+        'quadras_por_s': round(args.executar_tamanho / duracao, 2) if duracao else None,
+        'lotes_por_s': round(lotes / duracao, 2) if duracao else None,
+        # ru_maxrss é em KiB no Linux
+        'pico_memoria_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+    }
+    if args.perfil:
+        resultado['etapas'] = perfil.resumo()
+
+    del quadra_layer, linhas_layer
+    app.exitQgis()
+    return resultado
+
+
+def _argumentos_filho(args, tamanho):
+    filho = [
+        sys.executable, '-m', 'benchmarks.benchmark_pipeline',
+        '--executar-tamanho', str(tamanho),
+        '--motor', args.motor, '--modo', args.modo,
+        '--lotes-por-lado', str(args.lotes_por_lado),
+        '--vertices-borda', str(args.vertices_borda),
+        '--diretorio', args.diretorio
+    ]
+    if args.perfil:
+        filho.append('--perfil')
+    return filho
+
+
+def imprimir_tabela(resultados):
+    """Tabela resumida no terminal"""
+    cabecalho = f"{'motor':<11}{'modo':<7}{'quadras':>8}{'lotes':>8}{'tempo (s)':>11}" \
+                f"{'quadras/s':>11}{'lotes/s':>10}{'pico (MB)':>11}"
+    print(cabecalho)
+    print('-' * len(cabecalho))
+    for r in resultados:
+        if 'erro' in r:
+            print(f"{r['motor']:<11}{r['modo']:<7}{r['quadras']:>8}  ERRO: {r['erro']}")
+            continue
+        print(f"{r['motor']:<11}{r['modo']:<7}{r['quadras']:>8}{r['lotes']:>8}{r['duracao_s']:>11.3f}"
+              f"{r['quadras_por_s']:>11.2f}{r['lotes_por_s']:>10.2f}{r['pico_memoria_mb']:>11.1f}")
+        if r['lotes'] != r['lotes_esperados']:
+            print(f"    aviso: {r['lotes_esperados']} lotes esperados")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO,
+                        help='Quantidades de quadras (padrão: 1 10 100 1000)')
+    parser.add_argument('--motor', choices=['processing', 'memoria', 'geos'], default='processing')
+    parser.add_argument('--modo', choices=['quadra', 'lote'], default='quadra',
+                        help="'quadra': uma execução por quadra; 'lote': todas de uma vez")
+    parser.add_argument('--lotes-por-lado', type=int, default=5,
+                        help='Densidade das linhas de corte (lotes = 2 × valor por quadra)')
+    parser.add_argument('--vertices-borda', type=int, default=0,
+                        help='Vértices extras por lado da quadra')
+    parser.add_argument('--diretorio', default=tempfile.gettempdir(),
+                        help='Onde gravar os GeoPackages sintéticos')
+    parser.add_argument('--saida', help='Arquivo JSON com os resultados')
+    parser.add_argument('--perfil', action='store_true', help='Inclui tempos por etapa (PipelineProfiler)')
+    parser.add_argument('--vetorizacao', action='store_true',
+                        help='Compara a extensão de linhas com NumPy e por feição e sugere LIMIAR_VETORIZACAO')
+    parser.add_argument('--executar-tamanho', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.vetorizacao:
+        resultado = comparar_vetorizacao(QUANTIDADES_VETORIZACAO)
+        imprimir_vetorizacao(resultado)
+        if args.saida:
+            with open(args.saida, 'w', encoding='utf-8') as arquivo:
+                json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+        return 0
+
+    if args.executar_tamanho is not None:
+        print(json.dumps(executar_tamanho(args)))
+        return 0
+
+    resultados = []
+    for tamanho in args.tamanhos:
+        processo = subprocess.run(_argumentos_filho(args, tamanho), capture_output=True, text=True)
+        saida = processo.stdout.strip().splitlines()
+        if processo.returncode != 0 or not saida:
+            resultados.append({'motor': args.motor, 'modo': args.modo, 'quadras': tamanho,
+                               'erro': (processo.stderr.strip().splitlines() or ['sem saída'])[-1]})
+            continue
+        resultados.append(json.loads(saida[-1]))
+
+    imprimir_tabela(resultados)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, ensure_ascii=False, indent=2)
+
+    return 1 if any('erro' in r for r in resultados) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Geradores de dados sintéticos para o benchmark
+Cria uma grade de quadras retangulares e uma rede de linhas de corte em
+GeoPackage, com os mesmos campos usados pelo plugin (camadas Quadra e Linhas_corte)
+"""
+import os
+
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import (QgsCoordinateTransformContext, QgsFeature, QgsField, QgsFields,
+                       QgsGeometry, QgsPointXY, QgsVectorFileWriter, QgsVectorLayer,
+                       QgsWkbTypes, QgsCoordinateReferenceSystem)
+
+
+CRS_PADRAO = 'EPSG:31984'
+# Origem em coordenadas UTM plausíveis para o SIRGAS 2000 / UTM 24S
+ORIGEM = (550000.0, 8560000.0)
+
+
+def campos_quadra():
+    """Campos da camada Quadra lidos pelo plugin"""
+    fields = QgsFields()
+    for nome in ('id', 'id_localidade', 'id_setor', 'id_bairro'):
+        fields.append(QgsField(nome, QVariant.LongLong))
+    fields.append(QgsField('ins_quadra', QVariant.String))
+    return fields
+
+
+def gerar_quadras(num_quadras, largura=80.0, altura=40.0, rua=12.0, vertices_borda=0):
+    """
+    Gera quadras retangulares em grade quadrada
+
+    Args:
+        num_quadras: Quantidade de quadras
+        largura, altura: Dimensões de cada quadra (m)
+        rua: Espaçamento entre quadras (m)
+        vertices_borda: Vértices extras por lado (densidade da borda)
+
+    Returns:
+        list: QgsFeature com os campos de campos_quadra()
+    """
+    colunas = max(1, int(round(num_quadras ** 0.5)))
+    fields = campos_quadra()
+    quadras = []
+    for indice in range(num_quadras):
+        linha, coluna = divmod(indice, colunas)
+        x0 = ORIGEM[0] + coluna * (largura + rua)
+        y0 = ORIGEM[1] + linha * (altura + rua)
+        cantos = [(x0, y0), (x0 + largura, y0), (x0 + largura, y0 + altura), (x0, y0 + altura)]
+
+        anel = []
+        for (xa, ya), (xb, yb) in zip(cantos, cantos[1:] + cantos[:1]):
+            for passo in range(vertices_borda + 1):
+                t = passo / (vertices_borda + 1)
+                anel.append(QgsPointXY(xa + (xb - xa) * t, ya + (yb - ya) * t))
+        anel.append(anel[0])
+
+        quadra = QgsFeature(fields)
+        quadra.setGeometry(QgsGeometry.fromPolygonXY([anel]))
+        quadra.setAttributes([indice + 1, 1, 1 + linha // 10, 1 + coluna // 10, f"01{indice + 1:06d}"])
+        quadras.append(quadra)
+    return quadras
+
+
+def gerar_linhas_corte(quadras, lotes_por_lado=5, folga=0.1):
+    """
+    Gera a rede de linhas de corte de cada quadra
+
+    Uma linha longitudinal divide a quadra ao meio e linhas transversais
+    dividem cada metade em lotes_por_lado lotes. As extremidades param a
+    `folga` metros da borda, como nos desenhos reais, e dependem da extensão
+    de linhas do pipeline para fechar os lotes.
+
+    Returns:
+        list: QgsFeature (sem atributos) com geometria LineString
+    """
+    linhas = []
+
+    def adicionar(xa, ya, xb, yb):
+        linha = QgsFeature()
+        linha.setGeometry(QgsGeometry.fromPolylineXY([QgsPointXY(xa, ya), QgsPointXY(xb, yb)]))
+        linhas.append(linha)
+
+    for quadra in quadras:
+        caixa = quadra.geometry().boundingBox()
+        xmin, ymin, xmax, ymax = caixa.xMinimum(), caixa.yMinimum(), caixa.xMaximum(), caixa.yMaximum()
+        ymeio = (ymin + ymax) / 2
+        adicionar(xmin + folga, ymeio, xmax - folga, ymeio)
+
+        passo = (xmax - xmin) / lotes_por_lado
+        for i in range(1, lotes_por_lado):
+            x = xmin + i * passo
+            adicionar(x, ymin + folga, x, ymeio)
+            adicionar(x, ymeio, x, ymax - folga)
+    return linhas
+
+
+def _gravar_camada(features, fields, wkb_type, caminho, nome, crs_authid):
+    opcoes = QgsVectorFileWriter.SaveVectorOptions()
+    opcoes.driverName = 'GPKG'
+    opcoes.layerName = nome
+    opcoes.actionOnExistingFile = (
+        QgsVectorFileWriter.CreateOrOverwriteLayer if os.path.exists(caminho)
+        else QgsVectorFileWriter.CreateOrOverwriteFile
+    )
+    writer = QgsVectorFileWriter.create(
+        caminho, fields, wkb_type, QgsCoordinateReferenceSystem(crs_authid),
+        QgsCoordinateTransformContext(), opcoes
+    )
+    if writer.hasError() != QgsVectorFileWriter.NoError:
+        raise Exception(f"Erro ao gravar {nome}: {writer.errorMessage()}")
+    writer.addFeatures(features)
+    del writer
+
+
+def criar_geopackage(caminho, num_quadras, lotes_por_lado=5, vertices_borda=0, crs_authid=CRS_PADRAO):
+    """
+    Grava as camadas Quadra e Linhas_corte em um GeoPackage
+
+    Returns:
+        tuple: (quadra_layer, linhas_layer) abertas do arquivo
+    """
+    if os.path.exists(caminho):
+        os.remove(caminho)
+
+    quadras = gerar_quadras(num_quadras, vertices_borda=vertices_borda)
+    linhas = gerar_linhas_corte(quadras, lotes_por_lado)
+    _gravar_camada(quadras, campos_quadra(), QgsWkbTypes.Polygon, caminho, 'Quadra', crs_authid)
+    _gravar_camada(linhas, QgsFields(), QgsWkbTypes.LineString, caminho, 'Linhas_corte', crs_authid)
+
+    quadra_layer = QgsVectorLayer(f"{caminho}|layername=Quadra", 'Quadra', 'ogr')
+    linhas_layer = QgsVectorLayer(f"{caminho}|layername=Linhas_corte", 'Linhas_corte', 'ogr')
+    if not quadra_layer.isValid() or not linhas_layer.isValid():
+        raise Exception(f"GeoPackage inválido: {caminho}")
+    return quadra_layer, linhas_layer
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Poligonização em lote pela linha de comando, sem QGIS Desktop
+Lê quadras e linhas de corte de um GeoPackage ou de um banco PostGIS, filtra
+por ids de quadra e/ou extensão, grava os lotes em massa e emite um relatório JSON
+
+Uso (na pasta que contém o plugin, com o Python do QGIS):
+    python -m poligonizador_linha_corte.cli --gpkg dados.gpkg --ids 10 11 12 --saida lotes.gpkg
+    python -m poligonizador_linha_corte.cli --postgis "service=cadastro" \\
+        --camada-quadras comercial_umc.v_quadra --camada-linhas comercial_umc.linhas_corte \\
+        --bbox 550000 8560000 551000 8561000 --relatorio relatorio.json
+
+Com origem PostGIS e sem --saida, os lotes são acrescentados a comercial_umc.v_lote
+no mesmo banco, como na importação do plugin.
+
+Município inteiro, em ladrilhos por setor ou em grade, com retomada após falha ou Ctrl+C:
+    python -m poligonizador_linha_corte.cli --postgis "service=cadastro" ... \\
+        --ladrilhos id_setor --diario municipio.sqlite --job municipio_2025
+    python -m poligonizador_linha_corte.cli --gpkg dados.gpkg --saida lotes.gpkg \\
+        --ladrilhos grade:500 --diario municipio.sqlite
+Executar de novo o mesmo comando continua do primeiro ladrilho não concluído.
+"""
+import argparse
+import json
+import signal
+import sys
+import time
+import traceback
+
+
+def _argumentos(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    origem = parser.add_mutually_exclusive_group(required=True)
+    origem.add_argument('--gpkg', help='GeoPackage com as camadas de quadras e linhas de corte')
+    origem.add_argument('--postgis', help='String de conexão libpq ("host=... dbname=... user=..." ou "service=...")')
+    parser.add_argument('--camada-quadras', default='Quadra',
+                        help="Camada (GeoPackage) ou [esquema.]tabela (PostGIS) das quadras (padrão: Quadra)")
+    parser.add_argument('--camada-linhas', default='Linhas_corte',
+                        help="Camada (GeoPackage) ou [esquema.]tabela (PostGIS) das linhas (padrão: Linhas_corte)")
+    parser.add_argument('--ids', type=int, nargs='+', help='Ids das quadras (campo id)')
+    parser.add_argument('--bbox', type=float, nargs=4, metavar=('XMIN', 'YMIN', 'XMAX', 'YMAX'),
+                        help='Extensão das quadras, no SRC da camada')
+    parser.add_argument('--saida', help='GeoPackage de saída (camada lotes)')
+    parser.add_argument('--sem-gravar', action='store_true', help='Só poligoniza e relata, sem gravar os lotes')
+    parser.add_argument('--definicao', help='Definição do pipeline em JSON (padrão: pipeline.json do plugin)')
+    parser.add_argument('--motor', choices=['memoria', 'geos'], default='memoria',
+                        help="'geos': nodagem única por quadra (recorte + uma unaryUnion)")
+    parser.add_argument('--quadras-por-commit', type=int, default=0,
+                        help='Quadras por transação na gravação PostGIS (padrão: 0 = uma transação)')
+    parser.add_argument('--workers', type=int, default=1, help='Quadras em paralelo (0 = número de núcleos)')
+    parser.add_argument('--perfil', help='Grava os tempos por etapa neste arquivo JSON-lines')
+    parser.add_argument('--relatorio', help='Arquivo do relatório JSON (padrão: saída padrão)')
+    parser.add_argument('--ladrilhos', metavar='CAMPO|grade:TAMANHO',
+                        help="Processa em ladrilhos por campo (ex.: id_setor) ou em grade (ex.: grade:500)")
+    parser.add_argument('--diario', help='Diário SQLite do job em ladrilhos (retomada)')
+    parser.add_argument('--job', default='municipio', help='Nome do job no diário (padrão: municipio)')
+    args = parser.parse_args(argv)
+
+    if args.ladrilhos:
+        if not args.diario:
+            parser.error('--ladrilhos requer --diario')
+        if args.ids:
+            parser.error('--ids não se combina com --ladrilhos (use --bbox para limitar a extensão)')
+        if args.sem_gravar:
+            parser.error('--sem-gravar não se combina com --ladrilhos')
+    elif not args.ids and not args.bbox:
+        parser.error('informe --ids e/ou --bbox')
+    if args.gpkg and not args.saida and not args.sem_gravar:
+        parser.error('com --gpkg informe --saida ou --sem-gravar')
+    return args
+
+
+def _abrir_origem(args):
+    from .services.nucleo import abrir_camada_gpkg, abrir_camada_postgis
+
+    if args.gpkg:
+        abrir, origem = abrir_camada_gpkg, args.gpkg
+    else:
+        abrir, origem = abrir_camada_postgis, args.postgis
+    return abrir(origem, args.camada_quadras), abrir(origem, args.camada_linhas)
+
+
+def executar(args):
+    """Executa a poligonização descrita pelos argumentos e retorna o relatório"""
+    from .services.nucleo import (poligonizar_camadas, gravar_lotes_gpkg, gravar_lotes_postgis,
+                                  ESQUEMA_LOTES, TABELA_LOTES)
+    from .services.definicao_pipeline import DefinicaoPipeline
+    from .services.profiler import PipelineProfiler
+
+    quadra_layer, linhas_layer = _abrir_origem(args)
+    definicao = DefinicaoPipeline.de_arquivo(args.definicao) if args.definicao else DefinicaoPipeline.padrao()
+    perfil = PipelineProfiler(args.perfil, ativo=bool(args.perfil))
+    crs = quadra_layer.crs().authid()
+
+    inicio = time.perf_counter()
+    if args.ladrilhos:
+        relatorio = _executar_job(args, quadra_layer, linhas_layer, definicao, perfil, crs)
+        destino = args.saida or f"{ESQUEMA_LOTES}.{TABELA_LOTES}"
+    else:
+        lotes, relatorio = poligonizar_camadas(
+            quadra_layer, linhas_layer, ids=args.ids, bbox=args.bbox,
+            definicao=definicao, num_workers=args.workers, perfil=perfil, nodagem=args.motor == 'geos'
+        )
+
+        if args.sem_gravar:
+            destino = None
+        elif args.saida:
+            destino = args.saida
+            with perfil.etapa('GravarLotes', lotes):
+                gravar_lotes_gpkg(lotes, args.saida, crs)
+        else:
+            destino = f"{ESQUEMA_LOTES}.{TABELA_LOTES}"
+            if lotes:
+                with perfil.etapa('ImportarBanco', lotes):
+                    relatorio['carga'] = gravar_lotes_postgis(lotes, args.postgis,
+                                                              quadras_por_commit=args.quadras_por_commit)
+
+    relatorio.update({
+        'origem': args.gpkg or 'postgis',
+        'destino': destino,
+        'crs': crs,
+        'motor': args.motor,
+        'etapas': definicao.etapas,
+        'parametros': definicao.parametros(),
+        'duracao_s': round(time.perf_counter() - inicio, 3)
+    })
+    if perfil.ativo:
+        relatorio['perfil'] = perfil.resumo()
+        perfil.gravar()
+    return relatorio
+
+
+def _executar_job(args, quadra_layer, linhas_layer, definicao, perfil, crs):
+    """Modo --ladrilhos: job retomável com diário SQLite"""
+    from qgis.core import QgsFeedback, QgsRectangle
+    from .services.nucleo import gravar_lotes_gpkg, gravar_lotes_postgis, remover_lotes_gpkg
+    from .services.job_ladrilhos import DiarioCheckpoint, executar_job, ladrilhos_em_grade, ladrilhos_por_campo
+
+    extensao = QgsRectangle(*args.bbox) if args.bbox else None
+    if args.ladrilhos.startswith('grade:'):
+        ladrilhos = ladrilhos_em_grade(quadra_layer, float(args.ladrilhos.split(':', 1)[1]), extensao)
+    else:
+        ladrilhos = ladrilhos_por_campo(quadra_layer, args.ladrilhos, extensao)
+    particao = f"{args.ladrilhos} {args.bbox or ''}".strip()
+
+    if args.saida:
+        def gravar(lotes, substituir):
+            # Cada ladrilho acrescenta à camada; um ladrilho regravado remove antes os seus lotes
+            remover_lotes_gpkg(args.saida, substituir)
+            gravar_lotes_gpkg(lotes, args.saida, crs, anexar=True)
+    else:
+        def gravar(lotes, substituir):
+            gravar_lotes_postgis(lotes, args.postgis, quadras_por_commit=args.quadras_por_commit,
+                                 substituir=substituir)
+
+    def progresso(indice, total, chave, parcial):
+        print(f"[{indice + 1}/{total}] {chave}: {len(parcial['processadas'])} quadra(s), "
+              f"{parcial['total_lotes']} lote(s)", file=sys.stderr)
+
+    # Ctrl+C cancela: termina as quadras em andamento, grava e registra o ladrilho
+    feedback = QgsFeedback()
+    anterior = signal.signal(signal.SIGINT, lambda *_: feedback.cancel())
+    diario = DiarioCheckpoint(args.diario)
+    try:
+        relatorio = executar_job(
+            quadra_layer, linhas_layer, ladrilhos, diario, args.job, gravar, particao,
+            definicao, args.workers, perfil, feedback, progresso, args.motor == 'geos'
+        )
+    finally:
+        diario.fechar()
+        signal.signal(signal.SIGINT, anterior)
+
+    for chave in relatorio['ladrilhos_regravados']:
+        print(f"O ladrilho {chave} foi retomado: os lotes já gravados das suas quadras "
+              "foram substituídos", file=sys.stderr)
+    return relatorio
+
+
+def main(argv=None):
+    args = _argumentos(argv)
+
+    from .services.nucleo import iniciar_qgis
+    app = iniciar_qgis()
+    try:
+        relatorio = executar(args)
+        codigo = 0
+    except Exception as e:
+        print(f"Erro na poligonização: {traceback.format_exc()}", file=sys.stderr)
+        relatorio = {'erro': str(e)}
+        codigo = 1
+    finally:
+        app.exitQgis()
+
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2, default=str)
+    if args.relatorio:
+        with open(args.relatorio, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto)
+    else:
+        print(texto)
+    return codigo
+
+
+if __name__ == '__main__':
+    sys.exit(main())
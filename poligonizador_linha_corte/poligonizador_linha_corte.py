@@ -6,27 +6,97 @@ Estrutura modular com separação de responsabilidades
 from qgis.PyQt.QtCore import QSettings, QTranslator, QCoreApplication, Qt, QTimer
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction, QMessageBox, QToolBar
-from qgis.core import (QgsProcessing, QgsProcessingMultiStepFeedback,
+from qgis.core import (QgsProcessing, QgsProcessingMultiStepFeedback, QgsProcessingFeedback,
+                       QgsProcessingException, QgsTask, QgsApplication,
                        QgsProviderRegistry, QgsCoordinateReferenceSystem,
                        QgsProject, QgsVectorLayer, QgsWkbTypes, QgsMessageLog, Qgis,
-                       QgsFeatureRequest, QgsGeometry, QgsPointXY)
+                       QgsFeatureRequest, QgsFeature, QgsFields, QgsGeometry, QgsPointXY,
+                       QgsExpression, QgsRectangle, QgsFillSymbol, QgsDataSourceUri)
 from qgis.gui import QgsMapToolIdentify, QgsMapTool, QgsRubberBand
-import processing
 from .resources import *
 from .poligonizador_linha_corte_dialog import PoligonizadorDialog, exibir_relatorio_processamento,exibir_relatorio_remocao
 from .services.Notification import show_notification, get_notification_manager, clear_all_notifications, cancel_pending_notifications
+from .services.pipeline_memoria import InMemoryPipeline
+from .services.pipeline_processing import ProcessingPipeline
+from .services.execucao_paralela import ParallelQuadraExecutor, custo_estimado
+from .services.indice_espacial import LinhasCorteIndex
+from .services.profiler import PipelineProfiler
+from .services.cache_resultados import ResultCache, hash_entrada, chave_cache
+from .services.impressoes import FingerprintStore
+from .services.definicao_pipeline import DefinicaoPipeline
+from .services.armazenamento import ArmazenamentoIntermediario
+from .services.nucleo import info_quadra, criar_camada_memoria
+from .services.preverificacao import preverificar
+from .services.carga_lotes import CargaLotes
+from .services import carga_lotes
+from .services.remocao_lotes import RemocaoLotes
+from .services import remocao_lotes
+from .services import pool_sessoes
 import os.path
+import time
 import traceback
 
 
 # ==================== CLASSES AUXILIARES ====================
 
+class PluginSettings:
+    """Configurações persistentes do plugin (QSettings)"""
+    
+    PREFIXO = 'PoligonizadorLinhaCorte'
+    
+    # motor: 'processing' (cadeia de algoritmos), 'memoria' (InMemoryPipeline) ou
+    #   'geos' (InMemoryPipeline com nodagem única: recorte + uma unaryUnion por quadra)
+    # modo_lote: processa todas as quadras selecionadas em uma única execução
+    # modo_paralelo / num_workers: quadras em paralelo (requer motor 'memoria', 0 = núcleos)
+    # Etapas e parâmetros do pipeline (distâncias, tolerâncias, razão de área) ficam
+    # na definição do pipeline (pipeline.json ou entrada do projeto), não aqui
+    # perfil_ativo / arquivo_perfil: mede as etapas e grava em JSON-lines
+    #   (arquivo vazio = poligonizador_perfil.jsonl no diretório de configurações do QGIS)
+    # cache_ativo / cache_limite_mb / diretorio_cache: lotes por hash da entrada da quadra (opt-in)
+    #   (diretório vazio = poligonizador_cache no diretório de configurações do QGIS)
+    # modo_incremental: ignora quadras sem alteração desde a última execução bem-sucedida
+    # preverificacao: descarta antes do pipeline as quadras que as linhas não conseguem dividir
+    # quadras_por_commit: quadras por transação na gravação e na remoção de lotes
+    #   (0 = execução inteira em uma transação; requer psycopg2)
+    # armazenamento_intermediario: 'memoria', 'tmpfs' ou 'disco' (saídas de processing);
+    #   diretorio_intermediario vazio = /dev/shm (tmpfs) ou temp do sistema (disco)
+    PADROES = {
+        'motor': 'processing',
+        'modo_lote': False,
+        'modo_paralelo': False,
+        'num_workers': 0,
+        'perfil_ativo': False,
+        'arquivo_perfil': '',
+        'cache_ativo': False,
+        'cache_limite_mb': 200,
+        'diretorio_cache': '',
+        'modo_incremental': False,
+        'preverificacao': True,
+        'quadras_por_commit': 0,  # 0 = execução inteira em uma transação
+        'armazenamento_intermediario': 'memoria',
+        'diretorio_intermediario': ''
+    }
+    
+    @staticmethod
+    def get(chave):
+        """Lê configuração, usando o padrão quando não definida"""
+        padrao = PluginSettings.PADROES.get(chave)
+        tipo = type(padrao) if padrao is not None else str
+        return QSettings().value(f"{PluginSettings.PREFIXO}/{chave}", padrao, type=tipo)
+    
+    @staticmethod
+    def set(chave, valor):
+        """Grava configuração"""
+        QSettings().setValue(f"{PluginSettings.PREFIXO}/{chave}", valor)
+
+
 class DatabaseManager:
     """Gerenciador centralizado de operações com banco de dados"""
     
     def __init__(self):
         self.metadata = QgsProviderRegistry.instance().providerMetadata('postgres')
         self._cached_connections = {}
+        self._cached_dsns = {}
     
     def get_connection_names(self):
         """Retorna lista de nomes de conexões disponíveis"""
@@ -56,10 +126,30 @@ class DatabaseManager:
         return conn.configuration()
     
     def execute_sql(self, connection_name, query):
-        """Executa query SQL"""
+        """Executa query SQL (em uma sessão do pool, se houver psycopg2)"""
+        if pool_sessoes.disponivel():
+            with self.get_pool(connection_name).sessao() as sessao:
+                linhas = sessao.executar(query)
+                sessao.commit()
+                return linhas
         conn = self.get_connection(connection_name)
         return conn.executeSql(query)
     
+    def get_pool(self, connection_name):
+        """Pool de sessões psycopg2 da conexão, compartilhado por todo o plugin"""
+        return pool_sessoes.pool(self.get_dsn(connection_name))
+    
+    def get_session_stats(self, connection_name):
+        """Contadores do pool da conexão (abertas, reutilizadas, descartadas, consultas)"""
+        return self.get_pool(connection_name).estatisticas()
+    
+    def get_dsn(self, connection_name):
+        """String de conexão libpq da conexão (com credenciais de authcfg expandidas)"""
+        if connection_name not in self._cached_dsns:
+            conn = self.get_connection(connection_name)
+            self._cached_dsns[connection_name] = QgsDataSourceUri(conn.uri()).connectionInfo(True)
+        return self._cached_dsns[connection_name]
+    
     def build_postgres_uri(self, connection_name, table_schema, table_name, geometry_column='geom'):
         """Constrói URI para camada PostgreSQL"""
         config = self.get_connection_config(connection_name)
@@ -103,6 +193,19 @@ class LayerManager:
             return temp_layer
         return None
     
+    @staticmethod
+    def add_loaded_layer(layer, layer_name):
+        """Adiciona camada já carregada ao projeto, substituindo a anterior"""
+        LayerManager.remove_layer_by_name(layer_name)
+        layer.setName(layer_name)
+        QgsProject.instance().addMapLayer(layer)
+        return layer
+    
+    @staticmethod
+    def create_memory_layer(features, fields, wkb_type, crs_authid, layer_name):
+        """Cria camada de memória (fora do projeto) com cópia das feições"""
+        return criar_camada_memoria(features, fields, wkb_type, crs_authid, layer_name)
+    
     @staticmethod
     def reload_layer(layer_name):
         """Recarrega camada existente"""
@@ -153,219 +256,7 @@ class QuadraManager:
     
     def get_quadra_info(self, feature):
         """Extrai informações da quadra"""
-        fields = feature.fields().names()
-        return {
-            'inscricao': feature['ins_quadra'] if 'ins_quadra' in fields else f"ID {feature.id()}",
-            'id': feature['id'] if 'id' in fields else feature.id(),
-            'geometry': feature.geometry()
-        }
-
-
-class ProcessingPipeline:
-    """Pipeline de processamento de poligonização"""
-    
-    @staticmethod
-    def build_field_mappings():
-        """Constrói mapeamento de campos para refactorfields"""
-        quadra_fields = [
-            ('id_localidade', 'id_localidade'),
-            ('id_setor', 'id_setor'),
-            ('id_bairro', 'id_bairro'),
-            ('id', 'id_quadra'),
-            ('ins_quadra', 'ins_quadra')
-        ]
-        
-        mappings = [
-            {
-                'expression': f'aggregate(layer:=\'Quadra\', aggregate:=\'max\', '
-                             f'expression:="{field}", filter:=intersects($geometry, geometry(@parent)))',
-                'length': -1,
-                'name': name,
-                'precision': 0,
-                'type': 4
-            }
-            for field, name in quadra_fields
-        ]
-        
-        mappings.extend([
-            {'expression': '\'Habitado\'', 'length': -1, 'name': 'sit_imovel', 'precision': 0, 'type': 10},
-            {'expression': '@user_account_name || \' - \' || @user_full_name', 'length': -1, 'name': 'usuario', 'precision': 0, 'type': 10},
-            {'expression': 'to_date(now())', 'length': -1, 'name': 'data_atual', 'precision': 0, 'type': 14}
-        ])
-        
-        return mappings
-    
-    @staticmethod
-    def executar_pipeline_completo(quadra_layer, linhas_layer, conexao_nome, feedback):
-        """Executa o pipeline completo de poligonização"""
-        outputs = {}
-        
-        # Step 0: Extrair feições selecionadas da quadra
-        feedback.setCurrentStep(0)
-        outputs['ExtrairFeicoes'] = processing.run('native:saveselectedfeatures', {
-            'INPUT': quadra_layer,
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }, feedback=feedback)
-        
-        # Step 1: Extrair linhas dentro da quadra
-        feedback.setCurrentStep(1)
-        outputs['LinhasDentroQuadra'] = processing.run('native:extractbylocation', {
-            'INPUT': linhas_layer,
-            'INTERSECT': outputs['ExtrairFeicoes']['OUTPUT'],
-            'PREDICATE': [0],
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }, feedback=feedback)
-        
-        # Step 2: Estender linhas
-        feedback.setCurrentStep(2)
-        outputs['EstenderLinhas'] = processing.run('native:extendlines', {
-            'INPUT': outputs['LinhasDentroQuadra']['OUTPUT'],
-            'START_DISTANCE': 0.3,
-            'END_DISTANCE': 0.3,
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }, feedback=feedback)
-        
-        # Step 3: Polígonos para linhas
-        feedback.setCurrentStep(3)
-        outputs['PoligonosParaLinhas'] = processing.run('native:polygonstolines', {
-            'INPUT': outputs['ExtrairFeicoes']['OUTPUT'],
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }, feedback=feedback)
-        
-        # Step 4: Mesclar camadas
-        feedback.setCurrentStep(4)
-        outputs['MesclarCamadas'] = processing.run('native:mergevectorlayers', {
-            'LAYERS': [outputs['EstenderLinhas']['OUTPUT'], outputs['PoligonosParaLinhas']['OUTPUT']],
-            'CRS': None,
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }, feedback=feedback)
-        
-        # Step 5: Simplificar geometrias
-        feedback.setCurrentStep(5)
-        outputs['Simplificar'] = processing.run('native:simplifygeometries', {
-            'INPUT': outputs['MesclarCamadas']['OUTPUT'],
-            'METHOD': 0,
-            'TOLERANCE': 0.001,
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }, feedback=feedback)
-        
-        # Step 6: Poligonizar
-        feedback.setCurrentStep(6)
-        outputs['Poligonizar'] = processing.run('native:polygonize', {
-            'INPUT': outputs['Simplificar']['OUTPUT'],
-            'KEEP_FIELDS': False,
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }, feedback=feedback)
-        
-        # Step 7: Remover duplicados 1
-        feedback.setCurrentStep(7)
-        outputs['RemoverDuplicados1'] = processing.run('native:removeduplicatevertices', {
-            'INPUT': outputs['Poligonizar']['OUTPUT'],
-            'TOLERANCE': 1e-06,
-            'USE_Z_VALUE': False,
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }, feedback=feedback)
-        
-        # Step 8: Remover duplicados 2
-        feedback.setCurrentStep(8)
-        outputs['RemoverDuplicados2'] = processing.run('native:removeduplicatevertices', {
-            'INPUT': outputs['RemoverDuplicados1']['OUTPUT'],
-            'TOLERANCE': 1e-06,
-            'USE_Z_VALUE': False,
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }, feedback=feedback)
-        
-        # Step 9: Ajustar geometrias
-        feedback.setCurrentStep(9)
-        outputs['AjustarGeometrias'] = processing.run('native:snapgeometries', {
-            'INPUT': outputs['RemoverDuplicados2']['OUTPUT'],
-            'REFERENCE_LAYER': outputs['RemoverDuplicados2']['OUTPUT'],
-            'TOLERANCE': 0.0001,
-            'BEHAVIOR': 0,
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }, feedback=feedback)
-        
-        # Step 10: Calcular área do lote
-        feedback.setCurrentStep(10)
-        outputs['CalcularAreaLote'] = processing.run('qgis:fieldcalculator', {
-            'INPUT': outputs['AjustarGeometrias']['OUTPUT'],
-            'FIELD_NAME': 'area_lote',
-            'FIELD_TYPE': 0,
-            'FIELD_LENGTH': 20,
-            'FIELD_PRECISION': 2,
-            'FORMULA': '$area',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }, feedback=feedback)
-        
-        # Step 11: Calcular área da quadra
-        feedback.setCurrentStep(11)
-        outputs['CalcularAreaQuadra'] = processing.run('qgis:fieldcalculator', {
-            'INPUT': outputs['ExtrairFeicoes']['OUTPUT'],
-            'FIELD_NAME': 'area_quadra',
-            'FIELD_TYPE': 0,
-            'FIELD_LENGTH': 20,
-            'FIELD_PRECISION': 2,
-            'FORMULA': '$area',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }, feedback=feedback)
-        
-        # Step 12: Join de áreas
-        feedback.setCurrentStep(12)
-        outputs['JoinAreas'] = processing.run('native:joinattributesbylocation', {
-            'INPUT': outputs['CalcularAreaLote']['OUTPUT'],
-            'JOIN': outputs['CalcularAreaQuadra']['OUTPUT'],
-            'PREDICATE': [0],
-            'JOIN_FIELDS': ['area_quadra'],
-            'METHOD': 0,
-            'DISCARD_NONMATCHING': False,
-            'PREFIX': '',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }, feedback=feedback)
-        
-        # Step 13: Filtrar lotes válidos
-        feedback.setCurrentStep(13)
-        outputs['FiltrarLotesValidos'] = processing.run('native:extractbyexpression', {
-            'INPUT': outputs['JoinAreas']['OUTPUT'],
-            'EXPRESSION': '"area_lote" < ("area_quadra" * 0.95)',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }, feedback=feedback)
-        
-        # Step 14: Remover campos auxiliares
-        feedback.setCurrentStep(14)
-        outputs['RemoverCamposAux'] = processing.run('qgis:deletecolumn', {
-            'INPUT': outputs['FiltrarLotesValidos']['OUTPUT'],
-            'COLUMN': ['area_lote', 'area_quadra'],
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }, feedback=feedback)
-        
-        # Step 15: Adicionar campos personalizados
-        feedback.setCurrentStep(15)
-        outputs['EditarCampos'] = processing.run('native:refactorfields', {
-            'FIELDS_MAPPING': ProcessingPipeline.build_field_mappings(),
-            'INPUT': outputs['RemoverCamposAux']['OUTPUT'],
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }, feedback=feedback)
-        
-        return outputs
-    
-    @staticmethod
-    def importar_para_banco(output_layer, conexao_nome, feedback):
-        """Importa lotes gerados para o banco de dados"""
-        processing.run('gdal:importvectorintopostgisdatabaseavailableconnections', {
-            'ADDFIELDS': False,
-            'APPEND': True,
-            'A_SRS': QgsCoordinateReferenceSystem('EPSG:31984'),
-            'DATABASE': conexao_nome,
-            'GEOCOLUMN': 'geom',
-            'INPUT': output_layer,
-            'LAUNDER': False,
-            'OVERWRITE': False,
-            'PRECISION': True,
-            'PROMOTETOMULTI': False,
-            'SCHEMA': 'comercial_umc',
-            'TABLE': 'v_lote',
-            'SKIPFAILURES': False
-        }, feedback=feedback)
+        return info_quadra(feature)
 
 
 class ReportGenerator:
@@ -420,6 +311,43 @@ class ReportGenerator:
         return "\n".join(mensagem_partes)
 
 
+# ==================== TAREFAS ====================
+
+class PluginTask(QgsTask):
+    """Tarefa em segundo plano com progresso e cancelamento via QgsProcessingFeedback"""
+    
+    def __init__(self, descricao, funcao, ao_concluir):
+        """
+        Args:
+            descricao: Texto exibido no gerenciador de tarefas
+            funcao: Executada na thread da tarefa, recebe o feedback e retorna o resultado
+            ao_concluir: Chamada na thread principal com (resultado, erro, cancelada)
+        """
+        super().__init__(descricao, QgsTask.CanCancel)
+        self.funcao = funcao
+        self.ao_concluir = ao_concluir
+        self.resultado = None
+        self.erro = None
+        self.feedback = QgsProcessingFeedback()
+        self.feedback.progressChanged.connect(self.setProgress)
+    
+    def run(self):
+        try:
+            self.resultado = self.funcao(self.feedback)
+            return not self.isCanceled()
+        except Exception as e:
+            print(f"Erro na tarefa: {traceback.format_exc()}")
+            self.erro = e
+            return False
+    
+    def cancel(self):
+        self.feedback.cancel()
+        super().cancel()
+    
+    def finished(self, result):
+        self.ao_concluir(self.resultado, self.erro, self.isCanceled())
+
+
 # ==================== MAP TOOL ====================
 
 class MapToolSelectQuadra(QgsMapTool):
@@ -571,6 +499,8 @@ class MapToolSelectQuadra(QgsMapTool):
 
 class PoligonizadorLinhaCorte:
     """Plugin de Poligonização - Refatorado"""
+    
+    CAMADA_PREVIA = "Lotes_previa"
 
     def __init__(self, iface):
         self.iface = iface
@@ -591,6 +521,9 @@ class PoligonizadorLinhaCorte:
         self.map_tool = None
         self.previous_map_tool = None
         self.custom_map_tool = None
+        self._tarefa_atual = None
+        self._impressoes = None
+        self._previa = None
         
         self._setup_translator()
 
@@ -657,6 +590,8 @@ class PoligonizadorLinhaCorte:
             QgsMessageLog.logMessage(message, 'OrganizadorDeLotes', level)
             
     def unload(self):
+        if self._tarefa_atual is not None:
+            self._tarefa_atual.cancel()
         for action in self.actions:
             self.iface.removePluginVectorMenu(self.menu, action)
             if self.toolbar:
@@ -664,6 +599,7 @@ class PoligonizadorLinhaCorte:
         if self.previous_map_tool:
             self.iface.mapCanvas().setMapTool(self.previous_map_tool)
         self.custom_map_tool = None
+        pool_sessoes.fechar_todos()
 
     def popular_conexoes(self):
         """Popula combo de conexões"""
@@ -754,8 +690,8 @@ class PoligonizadorLinhaCorte:
     def atualizar_info_selecao(self):
         pass
 
-    def finalizar_selecao_quadras(self):
-        """Finaliza seleção e inicia poligonização"""
+    def finalizar_selecao_quadras(self, previa=False):
+        """Finaliza seleção e inicia poligonização (ou a prévia em memória)"""
         if self.quadra_manager.get_selected_count() == 0:
             show_notification("Aviso", "Selecione ao menos uma quadra!", "warning", 3000)
             return
@@ -766,9 +702,10 @@ class PoligonizadorLinhaCorte:
             show_notification("Aviso", "Selecione uma conexão PostgreSQL!", "warning", 3000)
             return
         
+        acao = "prévia da poligonização (sem gravar no banco)" if previa else "poligonização"
         resposta = QMessageBox.question(
             self.dlg, "Confirmar Poligonização",
-            f"Executar poligonização de {num} quadra(s)?\n\nConexão: {conexao}\n",
+            f"Executar {acao} de {num} quadra(s)?\n\nConexão: {conexao}\n",
             QMessageBox.Yes | QMessageBox.No, QMessageBox.No
         )
         
@@ -777,7 +714,7 @@ class PoligonizadorLinhaCorte:
             return
         
         self.dlg.close()
-        self.executar_poligonizacao(conexao)
+        self.executar_poligonizacao(conexao, previa)
         self.resetar_estado_plugin()
 
     def on_cancelar(self):
@@ -803,9 +740,16 @@ class PoligonizadorLinhaCorte:
         except Exception as e:
             show_notification("Erro", f"Erro ao atualizar Lote: {e}", "error")
 
-    def executar_poligonizacao(self, conexao_nome):
-        """Executa pipeline de poligonização"""
+    def executar_poligonizacao(self, conexao_nome, previa=False):
+        """
+        Prepara as quadras selecionadas e inicia a poligonização em segundo plano
+        
+        Com previa=True os lotes vão para a camada de memória Lotes_previa em vez do banco
+        """
         try:
+            if self._tarefa_em_andamento():
+                return [False, 0]
+            
             quadra_layer = self.quadra_manager.get_quadra_layer()
             if not quadra_layer or self.quadra_manager.get_selected_count() == 0:
                 show_notification("Erro", "Nenhuma quadra selecionada!", "error")
@@ -817,88 +761,783 @@ class PoligonizadorLinhaCorte:
                 return [False, 0]
             
             relatorio_quadras = {'processadas': [], 'ignoradas': [], 'total_lotes': 0}
+            config = self._configuracao_poligonizacao(quadra_layer, linhas_layer, conexao_nome)
+            config['previa'] = previa
+            
+            # Índice único da execução, limitado à extensão da seleção
+            indice_linhas = LinhasCorteIndex(linhas_layer, quadra_layer.boundingBoxOfSelected())
             
+            # Extensão de todas as linhas da seleção em uma chamada (vetorizada com NumPy)
+            distancia = config['parametros']['distancia_extensao']
+            config['extensoes'] = indice_linhas.estendidas(distancia) \
+                if config['usar_memoria'] and not config['nodagem'] and distancia > 0 else None
+            impressoes = self._obter_impressoes()
+            
+            # Cópia das quadras e linhas: a tarefa não acessa as camadas do projeto
+            quadras = []
             for quadra_feature in self.quadra_manager.get_selected_features():
+                quadra_info = self.quadra_manager.get_quadra_info(quadra_feature)
+                quadra_geom = quadra_info['geometry']
+                
+                # Verifica se há linhas de corte
+                if not indice_linhas.tem_linhas(quadra_geom):
+                    relatorio_quadras['ignoradas'].append({
+                        'inscricao': quadra_info['inscricao'],
+                        'id': quadra_info['id'],
+                        'motivo': 'Sem linhas de corte'
+                    })
+                    continue
+                
+                linhas_dentro = indice_linhas.linhas_intersectando(quadra_geom)
+                geometrias_linhas = [f.geometry() for f in linhas_dentro]
+                
+                # Pré-verificação: quadras que as linhas não dividem não passam pelo pipeline
+                motivo = preverificar(
+                    quadra_geom, geometrias_linhas, config['parametros'], quadra_info['inscricao']
+                ) if config['preverificacao'] else None
+                if motivo:
+                    relatorio_quadras['ignoradas'].append({
+                        'inscricao': quadra_info['inscricao'],
+                        'id': quadra_info['id'],
+                        'motivo': motivo
+                    })
+                    continue
+                
+                quadra_info['impressao'] = hash_entrada(quadra_geom, geometrias_linhas, config['parametros'])
+                if config['modo_incremental'] and \
+                        impressoes.obter(conexao_nome, quadra_info['id']) == quadra_info['impressao']:
+                    relatorio_quadras['ignoradas'].append({
+                        'inscricao': quadra_info['inscricao'],
+                        'id': quadra_info['id'],
+                        'motivo': 'Sem alterações desde a última execução'
+                    })
+                    continue
+                
+                quadras.append((QgsFeature(quadra_feature), quadra_info, linhas_dentro))
+            
+            config['impressoes'] = {str(info['id']): info['impressao'] for _, info, _ in quadras}
+            # Quadras já gravadas nesta conexão: os lotes antigos dão lugar aos novos
+            config['substituir'] = [
+                info['id'] for _, info, _ in quadras if impressoes.obter(conexao_nome, info['id']) is not None
+            ]
+            if not quadras:
+                self._concluir_poligonizacao(relatorio_quadras, config, [], None, False)
+                return [False, 0]
+            
+            tarefa = PluginTask(
+                f"Poligonização de {len(quadras)} quadra(s)",
+                lambda feedback: self._poligonizar_quadras(quadras, config, relatorio_quadras, feedback),
+                lambda resultado, erro, cancelada: self._concluir_poligonizacao(
+                    relatorio_quadras, config, resultado, erro, cancelada
+                )
+            )
+            self._iniciar_tarefa(tarefa)
+            return [True, len(quadras)]
+        
+        except Exception as e:
+            show_notification("Erro", f"Falha na poligonização:\n{e}", "error")
+            return [False, 0]
+
+    def _configuracao_poligonizacao(self, quadra_layer, linhas_layer, conexao_nome):
+        """Reúne, na thread principal, tudo o que a tarefa precisa das camadas e configurações"""
+        definicao = DefinicaoPipeline.carregar(QgsProject.instance())
+        if definicao.ignoradas:
+            self._log(f"Etapas ignoradas ({definicao.origem}): {', '.join(definicao.ignoradas)}")
+        
+        motor = PluginSettings.get('motor')
+        usar_memoria = motor in ('memoria', 'geos')
+        modo_paralelo = PluginSettings.get('modo_paralelo')
+        if modo_paralelo and not usar_memoria:
+            self._log("Modo paralelo requer o motor 'memoria'; executando sequencialmente", Qgis.Warning)
+            modo_paralelo = False
+        
+        return {
+            'conexao': conexao_nome,
+            'crs': quadra_layer.crs().authid(),
+            'quadra_fields': quadra_layer.fields(),
+            'quadra_wkb_type': quadra_layer.wkbType(),
+            'linhas_wkb_type': linhas_layer.wkbType(),
+            'motor': motor if usar_memoria else 'processing',
+            'usar_memoria': usar_memoria,
+            'nodagem': motor == 'geos',
+            'modo_lote': PluginSettings.get('modo_lote'),
+            'modo_paralelo': modo_paralelo,
+            'modo_incremental': PluginSettings.get('modo_incremental'),
+            'preverificacao': PluginSettings.get('preverificacao'),
+            'quadras_por_commit': PluginSettings.get('quadras_por_commit'),
+            'num_workers': PluginSettings.get('num_workers'),
+            'contexto': InMemoryPipeline.contexto_execucao(),
+            'definicao': definicao,
+            'parametros': definicao.parametros(),
+            'perfil': self._criar_profiler(),
+            'cache': self._criar_cache(),
+            'chaves_cache': {},
+            'impressoes': {},
+            'substituir': [],  # ids de quadra cujos lotes gravados são substituídos
+            'previa': False,
+            'lotes_previa': [],
+            'lotes_execucao': [],
+            'extensoes': None,  # {id da linha: linha estendida}, preenchido com o índice da execução
+            'dsn': self.db_manager.get_dsn(conexao_nome) if carga_lotes.disponivel() else None,
+            'armazenamento': ArmazenamentoIntermediario(
+                PluginSettings.get('armazenamento_intermediario'),
+                PluginSettings.get('diretorio_intermediario') or None
+            )
+        }
+
+    def _criar_profiler(self):
+        """Profiler da execução conforme as configurações (inativo por padrão)"""
+        caminho = PluginSettings.get('arquivo_perfil') or os.path.join(
+            QgsApplication.qgisSettingsDirPath(), 'poligonizador_perfil.jsonl'
+        )
+        return PipelineProfiler(caminho, ativo=PluginSettings.get('perfil_ativo'))
+
+    def _criar_cache(self):
+        """Cache de resultados conforme as configurações (None se desativado)"""
+        if not PluginSettings.get('cache_ativo'):
+            return None
+        diretorio = PluginSettings.get('diretorio_cache') or os.path.join(
+            QgsApplication.qgisSettingsDirPath(), 'poligonizador_cache'
+        )
+        try:
+            return ResultCache(diretorio, PluginSettings.get('cache_limite_mb') * 1024 * 1024)
+        except OSError as e:
+            self._log(f"Cache de resultados indisponível: {e}", Qgis.Warning)
+            return None
+
+    def _poligonizar_quadras(self, quadras, config, relatorio_quadras, feedback):
+        """Executa a poligonização (thread da tarefa); retorna as linhas estendidas"""
+        linhas_estendidas = []
+        
+        if config['cache'] is not None:
+            quadras = self._aplicar_cache(quadras, config, relatorio_quadras, linhas_estendidas)
+            if not quadras:
+                self._gravar_lotes_execucao(config, relatorio_quadras, feedback)
+                return linhas_estendidas
+        
+        if config['modo_paralelo']:
+            self._processar_paralelo(quadras, config, relatorio_quadras, linhas_estendidas, feedback)
+        elif config['modo_lote']:
+            self._processar_lote(quadras, config, relatorio_quadras, linhas_estendidas, feedback)
+        else:
+            passos = QgsProcessingMultiStepFeedback(len(quadras), feedback)
+            for indice, (quadra_feature, quadra_info, linhas) in enumerate(quadras):
+                if feedback.isCanceled():
+                    break
+                passos.setCurrentStep(indice)
                 try:
-                    quadra_info = self.quadra_manager.get_quadra_info(quadra_feature)
-                    quadra_geom = quadra_info['geometry']
-                    
-                    # Verifica se há linhas de corte
-                    linhas_dentro = [f for f in linhas_layer.getFeatures() 
-                                   if f.geometry().intersects(quadra_geom)]
-                    
-                    if not linhas_dentro:
-                        relatorio_quadras['ignoradas'].append({
-                            'inscricao': quadra_info['inscricao'],
-                            'id': quadra_info['id'],
-                            'motivo': 'Sem linhas de corte'
-                        })
-                        continue
+                    with config['perfil'].quadra(quadra_info['id']):
+                        if config['usar_memoria']:
+                            lotes_gerados = self._processar_quadra_memoria(
+                                quadra_feature, linhas, config, linhas_estendidas
+                            )
+                        else:
+                            lotes_gerados = self._processar_quadra_pipeline(
+                                quadra_feature, linhas, config, linhas_estendidas, passos
+                            )
                     
-                    # Seleciona quadra atual
-                    quadra_layer.selectByIds([quadra_feature.id()])
-                    
-                    # Executa pipeline
-                    lotes_gerados = self._processar_quadra_pipeline(
-                        quadra_layer, linhas_layer, conexao_nome
-                    )
-                    
-                    if lotes_gerados > 0:
-                        relatorio_quadras['processadas'].append({
-                            'inscricao': quadra_info['inscricao'],
-                            'id': quadra_info['id'],
-                            'lotes': lotes_gerados
-                        })
-                        relatorio_quadras['total_lotes'] += lotes_gerados
-                    else:
-                        relatorio_quadras['ignoradas'].append({
-                            'inscricao': quadra_info['inscricao'],
-                            'id': quadra_info['id'],
-                            'motivo': 'Linhas não alcançam a borda'
-                        })
+                    self._registrar_resultado_quadra(relatorio_quadras, quadra_info, lotes_gerados)
                 
                 except Exception as e:
+                    if feedback.isCanceled():
+                        break
                     print(f"Erro ao processar quadra: {traceback.format_exc()}")
                     relatorio_quadras['ignoradas'].append({
                         'inscricao': quadra_info.get('inscricao', 'N/A'),
                         'id': quadra_info.get('id', 'N/A'),
                         'motivo': f'Erro: {str(e)[:50]}'
                     })
+        
+        if feedback.isCanceled():
+            self._registrar_canceladas(relatorio_quadras, [info for _, info, _ in quadras])
+        
+        # Quadras concluídas antes de um cancelamento também são gravadas
+        self._gravar_lotes_execucao(config, relatorio_quadras, feedback)
+        return linhas_estendidas
+
+    def _aplicar_cache(self, quadras, config, relatorio_quadras, linhas_estendidas):
+        """
+        Importa direto os lotes das quadras encontradas no cache
+        
+        Returns:
+            list: Quadras que precisam passar pelo pipeline
+        """
+        cache = config['cache']
+        motor = config['motor']
+        pendentes, acertos, lotes = [], [], []
+        
+        with config['perfil'].etapa('CacheResultados') as etapa:
+            for quadra_feature, quadra_info, linhas in quadras:
+                geometrias_linhas = [f.geometry() for f in linhas]
+                chave = chave_cache(quadra_info['impressao'], motor)
+                geometrias = cache.obter(chave)
+                if geometrias is None:
+                    config['chaves_cache'][quadra_feature.id()] = chave
+                    pendentes.append((quadra_feature, quadra_info, linhas))
+                    continue
+                
+                lotes.extend(InMemoryPipeline.carimbar_atributos(geometrias, quadra_feature, config['contexto']))
+                linhas_estendidas.extend(InMemoryPipeline.estender_linhas(
+                    geometrias_linhas, config['parametros']['distancia_extensao']
+                ))
+                acertos.append((quadra_info, len(geometrias)))
+            etapa.saida = lotes
+        
+        if not acertos:
+            return pendentes
+        self._log(f"{len(acertos)} quadra(s) reaproveitada(s) do cache de resultados")
+        
+        try:
+            self._importar_lotes(InMemoryPipeline.criar_camada_lotes(lotes, config['crs']), config)
+            for quadra_info, lotes_gerados in acertos:
+                self._registrar_resultado_quadra(relatorio_quadras, quadra_info, lotes_gerados)
+        except Exception as e:
+            print(f"Erro ao importar lotes do cache: {traceback.format_exc()}")
+            for quadra_info, _ in acertos:
+                relatorio_quadras['ignoradas'].append({
+                    'inscricao': quadra_info['inscricao'],
+                    'id': quadra_info['id'],
+                    'motivo': f'Erro: {str(e)[:50]}'
+                })
+        return pendentes
+
+    def _guardar_no_cache(self, por_quadra, config):
+        """Guarda no cache os lotes importados ({id da feição da quadra: [lotes]})"""
+        for fid, lotes in por_quadra.items():
+            chave = config['chaves_cache'].get(fid)
+            if not chave:
+                continue
+            geometrias = [lote.geometry() for lote in lotes]
+            try:
+                config['cache'].gravar(chave, geometrias)
+            except OSError as e:
+                print(f"Erro ao gravar cache: {e}")
+                return
+
+    def _concluir_poligonizacao(self, relatorio_quadras, config, linhas_estendidas, erro, cancelada):
+        """Finaliza a poligonização na thread principal"""
+        self._tarefa_atual = None
+        
+        if erro:
+            show_notification("Erro", f"Falha na poligonização:\n{erro}", "error")
+        elif cancelada:
+            show_notification("Cancelado", "Poligonização cancelada pelo usuário", "warning", 3000)
+        
+        if not config['previa']:
+            self._registrar_impressoes(
+                config['conexao'], [item['id'] for item in relatorio_quadras['processadas']],
+                config['impressoes']
+            )
+        
+        if linhas_estendidas:
+            self.layer_manager.add_loaded_layer(
+                InMemoryPipeline.criar_camada_linhas(linhas_estendidas, config['crs']),
+                "Linhas_corte_processadas"
+            )
+        
+        armazenamento = config['armazenamento']
+        if armazenamento.backend != 'memoria':
+            relatorio_quadras['bytes_intermediarios'] = armazenamento.bytes_escritos
+            self._log(f"Intermediários ({armazenamento.backend}): {armazenamento.bytes_escritos} bytes gravados e removidos")
+        
+        perfil = config['perfil']
+        if config['previa']:
+            self._exibir_previa(config)
+        elif relatorio_quadras['total_lotes'] > 0:
+            with perfil.etapa('AtualizarCamadaLote'):
+                self.atualizar_camada_lotes(config['conexao'])
+        
+        if perfil.ativo:
+            relatorio_quadras['perfil'] = perfil.resumo()
+            try:
+                perfil.gravar()
+                self._log(f"Perfil gravado em {perfil.caminho_saida}")
+            except OSError as e:
+                self._log(f"Não foi possível gravar o perfil: {e}", Qgis.Warning)
+        
+        return exibir_relatorio_processamento(relatorio_quadras)
+
+    def _exibir_previa(self, config):
+        """Exibe os lotes da prévia em uma camada de memória estilizada"""
+        LayerManager.remove_layer_by_name(self.CAMADA_PREVIA)
+        self._previa = None
+        if not config['lotes_previa']:
+            return
+        
+        camada = InMemoryPipeline.criar_camada_lotes(config['lotes_previa'], config['crs'])
+        simbolo = QgsFillSymbol.createSimple({
+            'color': '255,193,7,90',
+            'outline_color': '230,81,0,255',
+            'outline_width': '0.5',
+            'outline_style': 'dash'
+        })
+        camada.renderer().setSymbol(simbolo)
+        self.layer_manager.add_loaded_layer(camada, self.CAMADA_PREVIA)
+        self._previa = {
+            'conexao': config['conexao'], 'crs': config['crs'],
+            'impressoes': config['impressoes'], 'substituir': config['substituir']
+        }
+        show_notification(
+            "Prévia",
+            f"{camada.featureCount()} lote(s) em '{self.CAMADA_PREVIA}'. Use 'Gravar Prévia' para enviar ao banco.",
+            "info", 5000
+        )
+
+    def gravar_previa(self):
+        """Grava no banco, em uma única importação, os lotes da camada de prévia"""
+        try:
+            if self._tarefa_em_andamento():
+                return
+            
+            camada = self.layer_manager.get_layer_by_name(self.CAMADA_PREVIA)
+            if not camada or self._previa is None:
+                show_notification("Aviso", "Nenhuma prévia para gravar", "warning", 3000)
+                return
+            if camada.isEditable():
+                show_notification("Aviso", "Salve ou descarte as edições da prévia antes de gravar", "warning", 3000)
+                return
+            if camada.featureCount() == 0:
+                show_notification("Aviso", "A prévia não possui lotes", "warning", 3000)
+                return
+            
+            previa = self._previa
+            resposta = QMessageBox.question(
+                self.dlg, "Confirmar Gravação",
+                f"Gravar {camada.featureCount()} lote(s) da prévia?\n\nConexão: {previa['conexao']}\n",
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+            )
+            if resposta == QMessageBox.No:
+                return
+            
+            # Cópia da camada (com eventuais exclusões do operador) para a tarefa
+            lotes = InMemoryPipeline.criar_camada_lotes(list(camada.getFeatures()), previa['crs'])
+            contagem = ProcessingPipeline.contar_lotes_por_quadra(lotes)
+            total = lotes.featureCount()
+            dsn = self.db_manager.get_dsn(previa['conexao']) if carga_lotes.disponivel() else None
+            
+            tarefa = PluginTask(
+                f"Gravação de {lotes.featureCount()} lote(s) da prévia",
+                lambda feedback: self._gravar_em_massa(
+                    list(lotes.getFeatures()), previa['conexao'], dsn, previa['crs'],
+                    feedback, PluginSettings.get('quadras_por_commit'), previa['substituir']
+                ),
+                lambda resultado, erro, cancelada: self._concluir_gravacao_previa(
+                    previa, contagem, total, erro, cancelada
+                )
+            )
+            self._iniciar_tarefa(tarefa)
+        
+        except Exception as e:
+            print(f"Erro ao gravar prévia: {traceback.format_exc()}")
+            show_notification("Erro", f"Falha ao gravar prévia: {str(e)[:100]}", "error", 5000)
+
+    def _concluir_gravacao_previa(self, previa, contagem, total, erro, cancelada):
+        """Finaliza a gravação da prévia na thread principal"""
+        self._tarefa_atual = None
+        
+        if erro:
+            show_notification("Erro", f"Falha ao gravar prévia:\n{erro}", "error")
+            return
+        if cancelada:
+            show_notification("Cancelado", "Gravação da prévia cancelada", "warning", 3000)
+            return
+        
+        self._registrar_impressoes(previa['conexao'], list(contagem), previa['impressoes'])
+        LayerManager.remove_layer_by_name(self.CAMADA_PREVIA)
+        self._previa = None
+        self.atualizar_camada_lotes(previa['conexao'])
+        show_notification("Sucesso", f"{total} lote(s) gravado(s)", "success")
+
+    def _obter_impressoes(self):
+        """Impressões digitais das quadras (carregadas na primeira utilização)"""
+        if self._impressoes is None:
+            self._impressoes = FingerprintStore(
+                os.path.join(QgsApplication.qgisSettingsDirPath(), 'poligonizador_impressoes.json')
+            )
+        return self._impressoes
+
+    def _registrar_impressoes(self, conexao_nome, quadra_ids, impressoes_execucao):
+        """Guarda a impressão das quadras cujos lotes foram gravados no banco"""
+        if not quadra_ids or not impressoes_execucao:
+            return
+        impressoes = self._obter_impressoes()
+        for quadra_id in quadra_ids:
+            impressao = impressoes_execucao.get(str(quadra_id))
+            if impressao:
+                impressoes.registrar(conexao_nome, quadra_id, impressao)
+        try:
+            impressoes.salvar()
+        except OSError as e:
+            self._log(f"Não foi possível gravar as impressões das quadras: {e}", Qgis.Warning)
+
+    def selecionar_quadras_alteradas(self):
+        """Seleciona as quadras já poligonizadas cuja entrada mudou desde a última execução"""
+        try:
+            conexao_nome = self.dlg.combo_conexao.currentData()
+            quadra_layer = self.quadra_manager.get_quadra_layer()
+            linhas_layer = self.layer_manager.get_layer_by_name('Linhas_corte')
+            if not conexao_nome or not quadra_layer or not linhas_layer:
+                show_notification("Aviso", "Selecione a conexão e carregue Quadra e Linhas_corte", "warning", 3000)
+                return
+            
+            registradas = self._obter_impressoes().quadras(conexao_nome)
+            if not registradas or 'id' not in quadra_layer.fields().names():
+                show_notification("Aviso", "Nenhuma quadra poligonizada registrada nesta conexão", "warning", 3000)
+                return
+            
+            valores = ', '.join(QgsExpression.quotedValue(int(i) if i.isdigit() else i) for i in registradas)
+            request = QgsFeatureRequest().setFilterExpression(f'"id" IN ({valores})')
+            quadras = list(quadra_layer.getFeatures(request))
+            if not quadras:
+                return
+            
+            extensao = QgsRectangle(quadras[0].geometry().boundingBox())
+            for quadra in quadras[1:]:
+                extensao.combineExtentWith(quadra.geometry().boundingBox())
+            indice_linhas = LinhasCorteIndex(linhas_layer, extensao)
+            parametros = DefinicaoPipeline.carregar(QgsProject.instance()).parametros()
+            
+            alteradas = []
+            for quadra in quadras:
+                geom = quadra.geometry()
+                linhas = [f.geometry() for f in indice_linhas.linhas_intersectando(geom)]
+                if hash_entrada(geom, linhas, parametros) != registradas.get(str(quadra['id'])):
+                    alteradas.append(quadra.id())
+            
+            quadra_layer.selectByIds(alteradas)
+            show_notification("Quadras alteradas", f"{len(alteradas)} quadra(s) com alterações selecionada(s)", "info", 3000)
+        
+        except Exception as e:
+            print(f"Erro ao selecionar quadras alteradas: {traceback.format_exc()}")
+            show_notification("Erro", f"Falha ao identificar quadras alteradas: {e}", "error")
+
+    def _importar_lotes(self, camada_lotes, config, feedback=None, por_quadra=None):
+        """
+        Acumula os lotes da execução (gravados de uma vez em _gravar_lotes_execucao)
+        
+        por_quadra ({id da feição da quadra: [lotes]}) alimenta o cache; as
+        chaves são as mesmas de config['chaves_cache'], não o id_quadra carimbado.
+        """
+        lotes = list(camada_lotes.getFeatures())
+        if config['previa']:
+            # Prévia: acumula os lotes em memória, sem tocar no banco
+            config['lotes_previa'].extend(lotes)
+        else:
+            config['lotes_execucao'].extend(lotes)
+        
+        if config['cache'] is not None and por_quadra:
+            self._guardar_no_cache(por_quadra, config)
+
+    def _gravar_lotes_execucao(self, config, relatorio_quadras, feedback):
+        """
+        Grava no banco, em uma única carga, os lotes acumulados na execução
+        
+        Com COPY a execução é uma transação (ou uma a cada quadras_por_commit
+        quadras), que também remove os lotes antigos das quadras em
+        config['substituir']: se falhar, as quadras não confirmadas passam
+        para as ignoradas e mantêm os lotes e a impressão anteriores.
+        """
+        lotes = config['lotes_execucao']
+        if config['previa'] or not lotes:
+            return
+        
+        try:
+            with config['perfil'].etapa('ImportarBanco', lotes) as etapa:
+                carga = self._gravar_em_massa(
+                    lotes, config['conexao'], config['dsn'], config['crs'],
+                    feedback, config['quadras_por_commit'], config['substituir']
+                )
+                etapa.saida = lotes
+            relatorio_quadras['carga'] = carga
+            self._log(f"{carga['linhas']} lote(s) gravado(s) via {carga['metodo']} em {carga['duracao_s']} s"
+                      f" ({carga['removidos']} lote(s) antigo(s) substituído(s))")
+            if config['dsn']:
+                relatorio_quadras['sessoes'] = pool_sessoes.pool(config['dsn']).estatisticas()
+                self._log(f"Sessões do banco: {relatorio_quadras['sessoes']}")
+        except Exception as e:
+            print(f"Erro na gravação dos lotes: {traceback.format_exc()}")
+            # Blocos confirmados antes da falha continuam gravados
+            gravadas = {str(q) for q in getattr(e, 'quadras_gravadas', [])}
+            mantidas = [item for item in relatorio_quadras['processadas'] if str(item['id']) in gravadas]
+            for item in relatorio_quadras['processadas']:
+                if str(item['id']) not in gravadas:
+                    relatorio_quadras['ignoradas'].append({
+                        'inscricao': item['inscricao'],
+                        'id': item['id'],
+                        'motivo': f'Erro na gravação: {str(e)[:50]}'
+                    })
+            relatorio_quadras['processadas'] = mantidas
+            relatorio_quadras['total_lotes'] = sum(item['lotes'] for item in mantidas)
+        finally:
+            config['lotes_execucao'] = []
+
+    def _gravar_em_massa(self, lotes, conexao_nome, dsn, crs, feedback=None, quadras_por_commit=0,
+                         substituir=None):
+        """
+        Grava lotes com COPY (psycopg2) ou, sem psycopg2, com uma única importação por processing
+        
+        Os lotes já gravados das quadras em `substituir` são removidos: no COPY,
+        na mesma transação da carga; sem psycopg2, por um comando anterior à
+        importação (o ogr2ogr não participa da transação do provider).
+        
+        Returns:
+            dict: {'metodo', 'linhas', 'removidos', 'duracao_s'} (+ 'commits' no COPY)
+        """
+        if dsn and carga_lotes.disponivel():
+            return CargaLotes(dsn).gravar(lotes, quadras_por_commit, substituir)
+        
+        inicio = time.perf_counter()
+        removidos = 0
+        presentes = {str(lote['id_quadra']): lote['id_quadra'] for lote in lotes}
+        antigas = [presentes[str(q)] for q in (substituir or []) if str(q) in presentes]
+        if antigas:
+            ids = ','.join(str(int(quadra_id)) for quadra_id in antigas)
+            linhas = self.db_manager.execute_sql(
+                conexao_nome, remocao_lotes.sql_remocao(f"ARRAY[{ids}]::bigint[]")
+            )
+            removidos = sum(int(n) for _, n in linhas or [])
+        camada = InMemoryPipeline.criar_camada_lotes(lotes, crs)
+        ProcessingPipeline.importar_para_banco(camada, conexao_nome, feedback)
+        return {
+            'metodo': 'ogr2ogr',
+            'linhas': camada.featureCount(),
+            'removidos': removidos,
+            'duracao_s': round(time.perf_counter() - inicio, 3)
+        }
+
+    def _registrar_resultado_quadra(self, relatorio_quadras, quadra_info, lotes_gerados):
+        """Registra no relatório o resultado de uma quadra"""
+        if lotes_gerados > 0:
+            relatorio_quadras['processadas'].append({
+                'inscricao': quadra_info['inscricao'],
+                'id': quadra_info['id'],
+                'lotes': lotes_gerados
+            })
+            relatorio_quadras['total_lotes'] += lotes_gerados
+        else:
+            relatorio_quadras['ignoradas'].append({
+                'inscricao': quadra_info['inscricao'],
+                'id': quadra_info['id'],
+                'motivo': 'Linhas não alcançam a borda'
+            })
+
+    def _registrar_canceladas(self, relatorio, quadras_info):
+        """Registra como ignoradas as quadras não alcançadas antes do cancelamento"""
+        registradas = {str(item['id']) for item in relatorio['processadas'] + relatorio['ignoradas']}
+        for quadra_info in quadras_info:
+            if str(quadra_info['id']) not in registradas:
+                relatorio['ignoradas'].append({
+                    'inscricao': quadra_info['inscricao'],
+                    'id': quadra_info['id'],
+                    'motivo': 'Cancelado pelo usuário'
+                })
+
+    def _extensoes(self, linhas, config):
+        """Linhas já estendidas (extensão única da execução) na ordem das feições, ou None"""
+        if config['extensoes'] is None:
+            return None
+        return [config['extensoes'][f.id()] for f in linhas]
+
+    def _processar_lote(self, pendentes, config, relatorio_quadras, linhas_estendidas, feedback):
+        """
+        Processa todas as quadras pendentes em uma única execução do pipeline
+        
+        No motor em memória um erro afeta só a quadra em que ocorreu, e um
+        cancelamento mantém as quadras já concluídas, como no modo sequencial.
+        """
+        try:
+            if config['usar_memoria']:
+                lotes, grupos, concluidas = [], {}, []
+                passos = QgsProcessingMultiStepFeedback(len(pendentes), feedback)
+                for indice, (quadra_feature, quadra_info, linhas) in enumerate(pendentes):
+                    if feedback.isCanceled():
+                        break
+                    passos.setCurrentStep(indice)
+                    try:
+                        with config['perfil'].quadra(quadra_info['id']):
+                            resultado = InMemoryPipeline.executar(
+                                quadra_feature, [f.geometry() for f in linhas],
+                                config['parametros'], config['contexto'], config['perfil'], config['nodagem'],
+                                self._extensoes(linhas, config)
+                            )
+                    except Exception as e:
+                        print(f"Erro ao processar quadra: {traceback.format_exc()}")
+                        relatorio_quadras['ignoradas'].append({
+                            'inscricao': quadra_info['inscricao'],
+                            'id': quadra_info['id'],
+                            'motivo': f'Erro: {str(e)[:50]}'
+                        })
+                        continue
+                    lotes.extend(resultado['lotes'])
+                    grupos[quadra_feature.id()] = resultado['lotes']
+                    linhas_estendidas.extend(resultado['linhas_estendidas'])
+                    concluidas.append((quadra_feature, quadra_info, linhas))
+                pendentes = concluidas
+                camada_lotes = InMemoryPipeline.criar_camada_lotes(lotes, config['crs'])
+            else:
+                quadra_layer, linhas_layer = self._criar_camadas_entrada(pendentes, config)
+                with config['perfil'].quadra('lote'):
+                    outputs = ProcessingPipeline.executar_pipeline_completo(
+                        quadra_layer, linhas_layer, config['conexao'],
+                        QgsProcessingMultiStepFeedback(config['definicao'].num_etapas, feedback),
+                        contexto=config['contexto'], definicao=config['definicao'],
+                        perfil=config['perfil'], armazenamento=config['armazenamento']
+                    )
+                camada_lotes = outputs['EditarCampos']['OUTPUT']
+                if camada_lotes.featureCount() > 0:
+                    linhas_estendidas.extend(outputs['LinhasCorte']['OUTPUT'])
+                # Lotes por feição da quadra (o id_quadra carimbado pode ser nulo)
+                grupos = ProcessingPipeline.lotes_por_quadra(
+                    camada_lotes, [(qf.id(), qf.geometry()) for qf, _, _ in pendentes]
+                )
             
-            if relatorio_quadras['total_lotes'] > 0:
-                self.atualizar_camada_lotes(conexao_nome)
+            if camada_lotes.featureCount() > 0:
+                self._importar_lotes(camada_lotes, config, por_quadra=grupos)
             
-            return exibir_relatorio_processamento(relatorio_quadras)
+            for quadra_feature, quadra_info, _ in pendentes:
+                self._registrar_resultado_quadra(
+                    relatorio_quadras, quadra_info, len(grupos.get(quadra_feature.id(), []))
+                )
         
         except Exception as e:
-            show_notification("Erro", f"Falha na poligonização:\n{e}", "error")
-            return [False, 0]
+            if feedback.isCanceled():
+                return
+            print(f"Erro no processamento em lote: {traceback.format_exc()}")
+            for _, quadra_info, _ in pendentes:
+                relatorio_quadras['ignoradas'].append({
+                    'inscricao': quadra_info['inscricao'],
+                    'id': quadra_info['id'],
+                    'motivo': f'Erro no lote: {str(e)[:50]}'
+                })
+
+    def _processar_paralelo(self, pendentes, config, relatorio_quadras, linhas_estendidas, feedback):
+        """Executa o pipeline em memória das quadras pendentes em paralelo"""
+        perfil = config['perfil']
+        
+        def executar_quadra(quadra_id, *args):
+            # O contexto de quadra do profiler é por thread
+            with perfil.quadra(quadra_id):
+                return InMemoryPipeline.executar(*args)
+        
+        tarefas = []
+        for quadra_feature, quadra_info, linhas in pendentes:
+            geometrias = [f.geometry() for f in linhas]
+            tarefas.append((
+                custo_estimado(quadra_feature.geometry(), geometrias),
+                (quadra_info['id'], quadra_feature, geometrias,
+                 config['parametros'], config['contexto'], perfil, config['nodagem'],
+                 self._extensoes(linhas, config))
+            ))
+        
+        executor = ParallelQuadraExecutor(config['num_workers'])
+        self._log(f"Processando {len(tarefas)} quadra(s) com {executor.num_workers} worker(s)")
+        resultados = executor.executar(tarefas, executar_quadra, feedback)
+        
+        # Importação e relatório na ordem da seleção; no cancelamento, só as
+        # quadras concluídas (as demais são registradas como canceladas)
+        lotes_lote, quadras_lote, grupos_lote = [], [], {}
+        for (quadra_feature, quadra_info, _), item in zip(pendentes, resultados):
+            if item is None:
+                continue
+            if 'erro' in item:
+                print(f"Erro ao processar quadra {quadra_info['inscricao']}: {item['erro']}")
+                relatorio_quadras['ignoradas'].append({
+                    'inscricao': quadra_info['inscricao'],
+                    'id': quadra_info['id'],
+                    'motivo': f"Erro: {str(item['erro'])[:50]}"
+                })
+                continue
+            
+            resultado = item['resultado']
+            if config['modo_lote']:
+                lotes_lote.extend(resultado['lotes'])
+                grupos_lote[quadra_feature.id()] = resultado['lotes']
+                linhas_estendidas.extend(resultado['linhas_estendidas'])
+                quadras_lote.append((quadra_info, len(resultado['lotes'])))
+                continue
+            
+            try:
+                if resultado['lotes']:
+                    with perfil.quadra(quadra_info['id']):
+                        self._importar_lotes(
+                            InMemoryPipeline.criar_camada_lotes(resultado['lotes'], config['crs']),
+                            config, por_quadra={quadra_feature.id(): resultado['lotes']}
+                        )
+                    linhas_estendidas.extend(resultado['linhas_estendidas'])
+                self._registrar_resultado_quadra(relatorio_quadras, quadra_info, len(resultado['lotes']))
+            except Exception as e:
+                print(f"Erro ao importar quadra: {traceback.format_exc()}")
+                relatorio_quadras['ignoradas'].append({
+                    'inscricao': quadra_info['inscricao'],
+                    'id': quadra_info['id'],
+                    'motivo': f'Erro: {str(e)[:50]}'
+                })
+        
+        if quadras_lote:
+            try:
+                if lotes_lote:
+                    with perfil.quadra('lote'):
+                        self._importar_lotes(
+                            InMemoryPipeline.criar_camada_lotes(lotes_lote, config['crs']), config,
+                            por_quadra=grupos_lote
+                        )
+                for quadra_info, lotes_gerados in quadras_lote:
+                    self._registrar_resultado_quadra(relatorio_quadras, quadra_info, lotes_gerados)
+            except Exception as e:
+                print(f"Erro ao importar lote: {traceback.format_exc()}")
+                for quadra_info, _ in quadras_lote:
+                    relatorio_quadras['ignoradas'].append({
+                        'inscricao': quadra_info['inscricao'],
+                        'id': quadra_info['id'],
+                        'motivo': f'Erro no lote: {str(e)[:50]}'
+                    })
+
+    def _criar_camadas_entrada(self, pendentes, config):
+        """Cria camadas de memória com as quadras e linhas copiadas (quadras selecionadas)"""
+        linhas_unicas = {}
+        for _, _, linhas in pendentes:
+            for linha in linhas:
+                linhas_unicas.setdefault(linha.id(), linha)
+        
+        quadra_layer = self.layer_manager.create_memory_layer(
+            [quadra_feature for quadra_feature, _, _ in pendentes],
+            config['quadra_fields'], config['quadra_wkb_type'], config['crs'], 'Quadra'
+        )
+        quadra_layer.selectAll()
+        # As linhas só contribuem com geometria (a poligonização descarta atributos)
+        linhas_layer = self.layer_manager.create_memory_layer(
+            list(linhas_unicas.values()),
+            QgsFields(), config['linhas_wkb_type'], config['crs'], 'Linhas_corte'
+        )
+        return quadra_layer, linhas_layer
 
-    def _processar_quadra_pipeline(self, quadra_layer, linhas_layer, conexao_nome):
+    def _processar_quadra_pipeline(self, quadra_feature, linhas, config, linhas_estendidas, feedback):
         """Executa pipeline de processamento para uma quadra"""
         try:
-            feedback = QgsProcessingMultiStepFeedback(16, None)
+            quadra_layer, linhas_layer = self._criar_camadas_entrada(
+                [(quadra_feature, None, linhas)], config
+            )
+            etapas = QgsProcessingMultiStepFeedback(config['definicao'].num_etapas, feedback)
             
             # Executa pipeline completo usando a classe ProcessingPipeline
             outputs = ProcessingPipeline.executar_pipeline_completo(
-                quadra_layer, linhas_layer, conexao_nome, feedback
+                quadra_layer, linhas_layer, config['conexao'], etapas,
+                contexto=config['contexto'], definicao=config['definicao'],
+                perfil=config['perfil'], armazenamento=config['armazenamento']
             )
             
             lotes_gerados = outputs['EditarCampos']['OUTPUT'].featureCount()
             
             if lotes_gerados > 0:
                 # Importa para o banco usando a classe ProcessingPipeline
-                ProcessingPipeline.importar_para_banco(
-                    outputs['EditarCampos']['OUTPUT'],
-                    conexao_nome,
-                    feedback
+                camada_lotes = outputs['EditarCampos']['OUTPUT']
+                self._importar_lotes(
+                    camada_lotes, config, etapas,
+                    por_quadra={quadra_feature.id(): list(camada_lotes.getFeatures())}
                 )
                 
-                # Adiciona linhas temporárias
-                self.layer_manager.add_temporary_layer(
-                    outputs['EstenderLinhas']['OUTPUT'],
-                    "Linhas_corte_processadas"
-                )
+                # Linhas estendidas exibidas ao final
+                linhas_estendidas.extend(outputs['LinhasCorte']['OUTPUT'])
             
             return lotes_gerados
             
@@ -906,6 +1545,27 @@ class PoligonizadorLinhaCorte:
             print(f"Erro no pipeline: {traceback.format_exc()}")
             raise e
 
+    def _processar_quadra_memoria(self, quadra_feature, linhas, config, linhas_estendidas):
+        """Executa o pipeline em memória para uma quadra"""
+        try:
+            resultado = InMemoryPipeline.executar(
+                quadra_feature, [f.geometry() for f in linhas],
+                config['parametros'], config['contexto'], config['perfil'], config['nodagem'],
+                self._extensoes(linhas, config)
+            )
+            lotes_gerados = len(resultado['lotes'])
+            
+            if lotes_gerados > 0:
+                camada_lotes = InMemoryPipeline.criar_camada_lotes(resultado['lotes'], config['crs'])
+                self._importar_lotes(camada_lotes, config, por_quadra={quadra_feature.id(): resultado['lotes']})
+                linhas_estendidas.extend(resultado['linhas_estendidas'])
+            
+            return lotes_gerados
+            
+        except Exception as e:
+            print(f"Erro no pipeline em memória: {traceback.format_exc()}")
+            raise e
+
     def _exibir_relatorio_processamento(self, relatorio):
         """Exibe relatório de processamento"""
         mensagem = ReportGenerator.generate_processing_report(relatorio)
@@ -923,6 +1583,9 @@ class PoligonizadorLinhaCorte:
 
     def remover_lotes_da_quadra_selecionada(self):
         try:
+            if self._tarefa_em_andamento():
+                return
+            
             if self.quadra_manager.get_selected_count() == 0:
                 show_notification("Aviso", "Selecione ao menos uma quadra!", "warning", 3000)
                 return
@@ -945,110 +1608,18 @@ class PoligonizadorLinhaCorte:
                 return
 
             self.dlg.close()
-            relatorio_remocao = {'processadas': [], 'ignoradas': [], 'total_removidos': 0}
-
-            print(f"\n{'='*60}")
-            print(f"🗑️  INICIANDO REMOÇÃO DE LOTES")
-            print(f"{'='*60}")
-
-            for quadra_feature in self.quadra_manager.get_selected_features():
-                try:
-                    quadra_info = self.quadra_manager.get_quadra_info(quadra_feature)
-                    quadra_id = quadra_info['id']
-                    ins_quadra = quadra_info['inscricao']
-
-                    print(f"\n📍 Processando Quadra: {ins_quadra} (ID: {quadra_id})")
-
-                    # Obtém os IDs dos lotes associados à quadra
-                    lotes_query = f"""
-                        SELECT id FROM comercial_umc.v_lote
-                        WHERE id_quadra = {quadra_id}
-                    """
-                    resultado_lotes = self.db_manager.execute_sql(conexao_nome, lotes_query)
-                    ids_lotes = [str(lote[0]) for lote in resultado_lotes] if resultado_lotes else []
-
-                    if not ids_lotes:
-                        relatorio_remocao['ignoradas'].append({
-                            'inscricao': ins_quadra,
-                            'id': quadra_id,
-                            'motivo': 'Nenhum lote encontrado'
-                        })
-                        print(f"   ⚠️  Ignorada - sem lotes")
-                        continue
-
-                    # Remove registros na tabela slote associados aos lotes
-                    ids_lotes_str = ",".join(ids_lotes)
-                    delete_slote_query = f"""
-                        DELETE FROM comercial_umc.slote
-                        WHERE id_lote IN ({ids_lotes_str})
-                    """
-                    self.db_manager.execute_sql(conexao_nome, delete_slote_query)
-                    print(f"   ✅ Registros na tabela 'slote' removidos para {len(ids_lotes)} lote(s)")
-
-                    # Remove cálculos de testada associados aos lotes
-                    delete_calculo_query = f"""
-                        DELETE FROM comercial_umc.v_calcular_testada
-                        WHERE id_lote IN ({ids_lotes_str})
-                    """
-                    self.db_manager.execute_sql(conexao_nome, delete_calculo_query)
-                    print(f"   ✅ Cálculos de testada removidos para {len(ids_lotes)} lote(s)")
-
-                    # Remove os lotes
-                    delete_query = f"""
-                        DELETE FROM comercial_umc.v_lote
-                        WHERE id IN ({ids_lotes_str})
-                    """
-                    self.db_manager.execute_sql(conexao_nome, delete_query)
-
-                    # Verifica remoção
-                    verificacao = self.db_manager.execute_sql(conexao_nome, f"""
-                        SELECT COUNT(*) FROM comercial_umc.v_lote
-                        WHERE id IN ({ids_lotes_str})
-                    """)
-                    lotes_restantes = verificacao[0][0] if verificacao and len(verificacao) > 0 else 0
-
-                    if lotes_restantes == 0:
-                        relatorio_remocao['processadas'].append({
-                            'inscricao': ins_quadra,
-                            'id': quadra_id,
-                            'lotes_removidos': len(ids_lotes)
-                        })
-                        relatorio_remocao['total_removidos'] += len(ids_lotes)
-                        print(f"   ✅ {len(ids_lotes)} lote(s) removido(s)")
-                    else:
-                        lotes_removidos = len(ids_lotes) - lotes_restantes
-                        if lotes_removidos > 0:
-                            relatorio_remocao['processadas'].append({
-                                'inscricao': ins_quadra,
-                                'id': quadra_id,
-                                'lotes_removidos': lotes_removidos
-                            })
-                            relatorio_remocao['total_removidos'] += lotes_removidos
-
-                        relatorio_remocao['ignoradas'].append({
-                            'inscricao': ins_quadra,
-                            'id': quadra_id,
-                            'motivo': f'Remoção parcial: {lotes_restantes} lote(s) permaneceram'
-                        })
-                        print(f"   ⚠️  Remoção parcial")
-
-                except Exception as e:
-                    print(f"   ❌ Erro: {traceback.format_exc()}")
-                    relatorio_remocao['ignoradas'].append({
-                        'inscricao': quadra_info.get('inscricao', 'N/A'),
-                        'id': quadra_info.get('id', 'N/A'),
-                        'motivo': f'Erro: {str(e)[:50]}'
-                    })
-
-            print(f"{'='*60}\n")
-
-            # Atualiza camada
-            if relatorio_remocao['total_removidos'] > 0:
-                self.layer_manager.reload_layer('Lote')
-                self.iface.mapCanvas().refresh()
-
-            # Exibe relatório
-            exibir_relatorio_remocao(relatorio_remocao)
+            quadras = [self.quadra_manager.get_quadra_info(f) for f in self.quadra_manager.get_selected_features()]
+            dsn = self.db_manager.get_dsn(conexao_nome) if remocao_lotes.disponivel() else None
+            quadras_por_commit = PluginSettings.get('quadras_por_commit')
+            
+            tarefa = PluginTask(
+                f"Remoção de lotes de {len(quadras)} quadra(s)",
+                lambda feedback: self._remover_lotes(quadras, conexao_nome, feedback, dsn, quadras_por_commit),
+                lambda resultado, erro, cancelada: self._concluir_remocao(
+                    resultado, erro, cancelada, conexao_nome
+                )
+            )
+            self._iniciar_tarefa(tarefa)
             self.resetar_estado_plugin()
 
         except Exception as e:
@@ -1057,10 +1628,93 @@ class PoligonizadorLinhaCorte:
             print(f"{'='*60}\n")
             show_notification("Erro", f"Falha ao remover lotes: {str(e)[:100]}", "error", 5000)
 
+    def _remover_lotes(self, quadras, conexao_nome, feedback, dsn=None, quadras_por_commit=0):
+        """
+        Remove os lotes das quadras (thread da tarefa); retorna o relatório
+        
+        Um comando em conjunto remove slote, cálculo de testada e lotes da
+        seleção (RemocaoLotes, em blocos de quadras_por_commit com psycopg2);
+        sem psycopg2 o mesmo comando vai pelo provider, com os ids inteiros
+        como literal. Quadras com id nulo ou não numérico ficam de fora.
+        """
+        print(f"\n{'='*60}")
+        print(f"🗑️  INICIANDO REMOÇÃO DE LOTES")
+        print(f"{'='*60}")
+        
+        if dsn:
+            relatorio_remocao = RemocaoLotes(dsn).remover(quadras, quadras_por_commit, feedback)
+            if feedback.isCanceled():
+                self._registrar_canceladas(relatorio_remocao, quadras)
+            print(f"   Sessões do banco: {pool_sessoes.pool(dsn).estatisticas()}")
+        else:
+            relatorio_remocao = {'processadas': [], 'ignoradas': [], 'total_removidos': 0, 'commits': 0}
+            validas, invalidas = remocao_lotes.separar_ids(quadras)
+            remocao_lotes.registrar_invalidas(relatorio_remocao, invalidas)
+            try:
+                if validas:
+                    ids = ','.join(str(quadra_id) for quadra_id, _ in validas)
+                    linhas = self.db_manager.execute_sql(
+                        conexao_nome, remocao_lotes.sql_remocao(f"ARRAY[{ids}]::bigint[]")
+                    )
+                    relatorio_remocao['commits'] = 1
+                    remocao_lotes.registrar_contagem(
+                        relatorio_remocao, [quadra_info for _, quadra_info in validas], linhas or []
+                    )
+            except Exception as e:
+                print(f"   ❌ Erro: {traceback.format_exc()}")
+                for _, quadra_info in validas:
+                    relatorio_remocao['ignoradas'].append({
+                        'inscricao': quadra_info.get('inscricao', 'N/A'),
+                        'id': quadra_info.get('id', 'N/A'),
+                        'motivo': f'Erro: {str(e)[:50]}'
+                    })
+        
+        for item in relatorio_remocao['processadas']:
+            print(f"   ✅ {item['inscricao']}: {item['lotes_removidos']} lote(s) removido(s)")
+        print(f"🗑️  {relatorio_remocao['total_removidos']} lote(s) removido(s) em "
+              f"{relatorio_remocao['commits']} transação(ões)")
+        print(f"{'='*60}\n")
+        return relatorio_remocao
+
+    def _concluir_remocao(self, relatorio_remocao, erro, cancelada, conexao_nome=None):
+        """Finaliza a remoção de lotes na thread principal"""
+        self._tarefa_atual = None
+        
+        if erro or relatorio_remocao is None:
+            show_notification("Erro", f"Falha ao remover lotes: {str(erro)[:100]}", "error", 5000)
+            return
+        if cancelada:
+            show_notification("Cancelado", "Remoção cancelada pelo usuário", "warning", 3000)
 
+        # Quadras sem lotes voltam a ficar pendentes para o modo incremental
+        if conexao_nome and relatorio_remocao['processadas']:
+            impressoes = self._obter_impressoes()
+            impressoes.descartar(conexao_nome, [item['id'] for item in relatorio_remocao['processadas']])
+            try:
+                impressoes.salvar()
+            except OSError as e:
+                self._log(f"Não foi possível gravar as impressões das quadras: {e}", Qgis.Warning)
+
+        # Atualiza camada
+        if relatorio_remocao['total_removidos'] > 0:
+            self.layer_manager.reload_layer('Lote')
+            self.iface.mapCanvas().refresh()
+
+        # Exibe relatório
+        exibir_relatorio_remocao(relatorio_remocao)
+
+    def _tarefa_em_andamento(self):
+        """Impede iniciar uma operação enquanto outra roda em segundo plano"""
+        if self._tarefa_atual is not None:
+            show_notification("Aviso", "Aguarde a operação em andamento terminar.", "warning", 3000)
+            return True
+        return False
 
-
-
+    def _iniciar_tarefa(self, tarefa):
+        """Envia a tarefa ao gerenciador de tarefas do QGIS"""
+        self._tarefa_atual = tarefa
+        QgsApplication.taskManager().addTask(tarefa)
+        show_notification("Em andamento", f"{tarefa.description()} em segundo plano", "info", 3000)
 
     def _exibir_relatorio_remocao(self, relatorio):
         """Exibe relatório de remoção"""
@@ -1123,6 +1777,12 @@ class PoligonizadorLinhaCorte:
                 self.dlg.btn_ok.clicked.connect(self.finalizar_selecao_quadras)
             if hasattr(self.dlg, 'btn_remover_lotes'):
                 self.dlg.btn_remover_lotes.clicked.connect(self.remover_lotes_da_quadra_selecionada)
+            if hasattr(self.dlg, 'btn_previa'):
+                self.dlg.btn_previa.clicked.connect(lambda: self.finalizar_selecao_quadras(previa=True))
+            if hasattr(self.dlg, 'btn_gravar_previa'):
+                self.dlg.btn_gravar_previa.clicked.connect(self.gravar_previa)
+            if hasattr(self.dlg, 'btn_selecionar_alteradas'):
+                self.dlg.btn_selecionar_alteradas.clicked.connect(self.selecionar_quadras_alteradas)
         
         self.resetar_estado_plugin()
         self.popular_conexoes()
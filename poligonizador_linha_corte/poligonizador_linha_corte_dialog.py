@@ -236,6 +236,11 @@ class ReportDialog(QDialog):
         resumo_frame = self._criar_secao_resumo()
         layout.addWidget(resumo_frame)
         
+        # Tempos por etapa (profiler ativo)
+        if self.detalhes.get('perfil'):
+            perfil_frame = self._criar_secao_perfil()
+            layout.addWidget(perfil_frame)
+        
         return container
     
     def _criar_secao_processadas(self):
@@ -302,6 +307,15 @@ class ReportDialog(QDialog):
         if 'total_lotes' in self.detalhes:
             stats_layout.addWidget(self._criar_stat_card("Lotes Gerados", str(self.detalhes['total_lotes']), "#1a73e8"))
         
+        # Bytes de intermediários gravados em arquivo (se aplicável)
+        if self.detalhes.get('bytes_intermediarios'):
+            mb = self.detalhes['bytes_intermediarios'] / (1024 * 1024)
+            stats_layout.addWidget(self._criar_stat_card("Temporários (MB)", f"{mb:.1f}", "#5f6368"))
+        
+        # Carga única dos lotes no banco (se aplicável)
+        if self.detalhes.get('carga'):
+            stats_layout.addWidget(self._criar_stat_card("Gravação (s)", f"{self.detalhes['carga']['duracao_s']:.2f}", "#5f6368"))
+        
         # Total removidos (se aplicável)
         if 'total_removidos' in self.detalhes:
             stats_layout.addWidget(self._criar_stat_card("Lotes Removidos", str(self.detalhes['total_removidos']), "#ea4335"))
@@ -311,6 +325,32 @@ class ReportDialog(QDialog):
         
         return frame
     
+    def _criar_secao_perfil(self):
+        """Cria seção com o tempo gasto em cada etapa do pipeline"""
+        frame = QFrame()
+        frame.setObjectName("secaoPerfil")
+        layout = QVBoxLayout(frame)
+        layout.setContentsMargins(20, 15, 20, 15)
+        layout.setSpacing(6)
+        
+        etapas = self.detalhes['perfil']
+        total = sum(e['parede_s'] for e in etapas) or 1.0
+        
+        titulo = QLabel(f"⏱️ Tempo por Etapa ({total:.2f} s)")
+        titulo.setObjectName("tituloSecao")
+        layout.addWidget(titulo)
+        
+        for etapa in sorted(etapas, key=lambda e: -e['parede_s']):
+            linha = QLabel(
+                f"<b>{etapa['etapa']}</b>: {etapa['parede_s']:.2f} s "
+                f"({100.0 * etapa['parede_s'] / total:.0f}%) · CPU {etapa['cpu_s']:.2f} s · "
+                f"{etapa['chamadas']}×"
+            )
+            linha.setObjectName("itemLabel")
+            layout.addWidget(linha)
+        
+        return frame
+    
     def _criar_item_processado(self, item):
         """Cria widget para item processado"""
         widget = QFrame()
@@ -492,7 +532,7 @@ class ReportDialog(QDialog):
                 background-color: transparent;
             }}
             
-            #secaoProcessadas, #secaoIgnoradas, #secaoResumo {{
+            #secaoProcessadas, #secaoIgnoradas, #secaoResumo, #secaoPerfil {{
                 background-color: #f8f9fa;
                 border: 1px solid #e1e4e8;
                 border-radius: 8px;
@@ -792,6 +832,13 @@ class PoligonizadorDialog(QDialog):
         self.btn_selecionar.setFixedHeight(30)  # Reduzido de 35 para 30
         layout.addWidget(self.btn_selecionar)
 
+        # Botão selecionar quadras alteradas desde a última poligonização
+        self.btn_selecionar_alteradas = ModernButton("Selecionar Alteradas")
+        self.btn_selecionar_alteradas.setObjectName("btnSelecionarAlteradas")
+        self.btn_selecionar_alteradas.setCursor(Qt.PointingHandCursor)
+        self.btn_selecionar_alteradas.setFixedHeight(28)
+        layout.addWidget(self.btn_selecionar_alteradas)
+
        
 
         # Botões ação (Cancelar e Poligonizar)
@@ -813,6 +860,24 @@ class PoligonizadorDialog(QDialog):
         buttons_layout.addWidget(self.btn_ok)
         layout.addLayout(buttons_layout)
 
+        # Botões de prévia (lotes em memória, gravados depois em uma única importação)
+        previa_layout = QHBoxLayout()
+        previa_layout.setSpacing(2)
+
+        self.btn_previa = ModernButton("Pré-visualizar")
+        self.btn_previa.setObjectName("btnPrevia")
+        self.btn_previa.setCursor(Qt.PointingHandCursor)
+        self.btn_previa.setFixedHeight(28)
+
+        self.btn_gravar_previa = ModernButton("Gravar Prévia")
+        self.btn_gravar_previa.setObjectName("btnGravarPrevia")
+        self.btn_gravar_previa.setCursor(Qt.PointingHandCursor)
+        self.btn_gravar_previa.setFixedHeight(28)
+
+        previa_layout.addWidget(self.btn_previa)
+        previa_layout.addWidget(self.btn_gravar_previa)
+        layout.addLayout(previa_layout)
+
         layout.addSpacing(5)  # Reduzido de 8 para 5
 
         # Botão deletar lotes (abaixo dos outros botões)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Armazenamento das camadas intermediárias do pipeline de processing
+Camadas de memória, arquivos em tmpfs ou em disco, sempre removidos ao fim
+de cada execução do pipeline, com contagem dos bytes gravados
+"""
+import os
+import shutil
+import tempfile
+import uuid
+
+
+BACKENDS = ('memoria', 'tmpfs', 'disco')
+DIRETORIO_TMPFS = '/dev/shm'
+
+
+class ArmazenamentoIntermediario:
+    """Destino das saídas intermediárias de processing.run"""
+
+    def __init__(self, backend='memoria', diretorio=None):
+        """
+        Args:
+            backend: 'memoria' (provider memory), 'tmpfs' ou 'disco' (GeoPackage)
+            diretorio: Base dos arquivos (padrão: /dev/shm para tmpfs, temp do sistema para disco)
+
+        Raises:
+            Exception: Backend desconhecido
+        """
+        if backend not in BACKENDS:
+            raise Exception(f"Armazenamento intermediário desconhecido: {backend!r} (use {', '.join(BACKENDS)})")
+        if backend == 'tmpfs' and not diretorio and not os.path.isdir(DIRETORIO_TMPFS):
+            # Sem tmpfs disponível (ex.: Windows): grava no temp do sistema
+            backend = 'disco'
+
+        self.backend = backend
+        self.bytes_escritos = 0
+        self._base = diretorio or (DIRETORIO_TMPFS if backend == 'tmpfs' else tempfile.gettempdir())
+        self._diretorio = None
+        self._contador = 0
+
+    def saida(self, nome='intermediaria'):
+        """Valor de OUTPUT para processing.run"""
+        if self.backend == 'memoria':
+            return 'memory:'
+        if self._diretorio is None:
+            self._diretorio = os.path.join(self._base, f"poligonizador_{os.getpid()}_{uuid.uuid4().hex[:8]}")
+            os.makedirs(self._diretorio, exist_ok=True)
+        self._contador += 1
+        return os.path.join(self._diretorio, f"{self._contador:03d}_{nome}.gpkg")
+
+    def limpar(self):
+        """Remove os arquivos criados até aqui, somando seus tamanhos a bytes_escritos"""
+        if self._diretorio is None:
+            return
+        for raiz, _, arquivos in os.walk(self._diretorio):
+            for arquivo in arquivos:
+                try:
+                    self.bytes_escritos += os.path.getsize(os.path.join(raiz, arquivo))
+                except OSError:
+                    pass
+        shutil.rmtree(self._diretorio, ignore_errors=True)
+        self._diretorio = None
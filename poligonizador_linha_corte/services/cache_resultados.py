@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Cache de resultados da poligonização
+Guarda em disco as geometrias dos lotes de cada quadra, endereçadas pelo hash
+da geometria da quadra, das linhas de corte que a intersectam e dos parâmetros
+"""
+import hashlib
+import json
+import os
+import threading
+
+from qgis.core import QgsGeometry
+from qgis.PyQt.QtCore import QByteArray
+
+
+# Incrementar quando o algoritmo mudar de forma a invalidar resultados antigos
+VERSAO_CACHE = 1
+
+
+def hash_entrada(quadra_geom, linhas, parametros):
+    """
+    Hash (sha256 hex) da entrada de uma quadra
+
+    Args:
+        quadra_geom: QgsGeometry da quadra
+        linhas: Geometrias das linhas de corte (ordem indiferente)
+        parametros: dict de parâmetros do pipeline
+    """
+    h = hashlib.sha256()
+    h.update(f"v{VERSAO_CACHE}|".encode())
+    h.update(json.dumps(parametros, sort_keys=True).encode())
+    h.update(bytes(quadra_geom.asWkb()))
+    for wkb in sorted(bytes(g.asWkb()) for g in linhas if g and not g.isNull()):
+        h.update(len(wkb).to_bytes(8, 'little'))
+        h.update(wkb)
+    return h.hexdigest()
+
+
+def chave_cache(impressao, motor):
+    """Chave do cache: hash da entrada combinado com o motor que gerou os lotes"""
+    return hashlib.sha256(f"{impressao}|{motor}".encode()).hexdigest()
+
+
+class ResultCache:
+    """Cache em disco com descarte LRU por tamanho total"""
+
+    EXTENSAO = '.json'
+    # Ao passar do limite, descarta até esta fração dele (menos varreduras do diretório)
+    FRACAO_APOS_DESCARTE = 0.9
+
+    def __init__(self, diretorio, limite_bytes=200 * 1024 * 1024):
+        """
+        Args:
+            diretorio: Diretório das entradas (criado se necessário)
+            limite_bytes: Tamanho máximo do cache; as entradas menos usadas saem primeiro
+        """
+        self.diretorio = diretorio
+        self.limite_bytes = limite_bytes
+        self.acertos = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+        # Tamanho de cada entrada, lido uma vez; mantido a cada gravação
+        self._tamanhos = {nome: tamanho for _, tamanho, nome in self._entradas()}
+        self._total = sum(self._tamanhos.values())
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, chave + self.EXTENSAO)
+
+    def obter(self, chave):
+        """Geometrias dos lotes guardadas para a chave, ou None"""
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, 'r', encoding='utf-8') as arquivo:
+                dados = json.load(arquivo)
+            # mtime marca o último uso (LRU)
+            os.utime(caminho)
+        except (OSError, ValueError):
+            with self._lock:
+                self.falhas += 1
+            return None
+
+        geometrias = []
+        for wkb_hex in dados['lotes']:
+            geom = QgsGeometry()
+            geom.fromWkb(QByteArray.fromHex(wkb_hex.encode()))
+            geometrias.append(geom)
+        with self._lock:
+            self.acertos += 1
+        return geometrias
+
+    def gravar(self, chave, geometrias):
+        """Guarda as geometrias dos lotes; o diretório só é varrido quando o limite é excedido"""
+        dados = {'lotes': [bytes(g.asWkb()).hex() for g in geometrias]}
+        caminho = self._caminho(chave)
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(dados, arquivo)
+        tamanho = os.path.getsize(temporario)
+
+        with self._lock:
+            os.replace(temporario, caminho)
+            nome = chave + self.EXTENSAO
+            self._total += tamanho - self._tamanhos.get(nome, 0)
+            self._tamanhos[nome] = tamanho
+            if self._total > self.limite_bytes:
+                self._descartar_excedente()
+
+    def _entradas(self):
+        """(mtime, tamanho, nome) das entradas do diretório"""
+        entradas = []
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith(self.EXTENSAO):
+                continue
+            try:
+                info = os.stat(os.path.join(self.diretorio, nome))
+            except OSError:
+                continue
+            entradas.append((info.st_mtime, info.st_size, nome))
+        return entradas
+
+    def _descartar_excedente(self):
+        """Remove as entradas menos usadas até FRACAO_APOS_DESCARTE do limite (chamada com o lock)"""
+        entradas = self._entradas()
+        self._tamanhos = {nome: tamanho for _, tamanho, nome in entradas}
+        self._total = sum(self._tamanhos.values())
+
+        alvo = self.limite_bytes * self.FRACAO_APOS_DESCARTE
+        for _, tamanho, nome in sorted(entradas):
+            if self._total <= alvo:
+                break
+            try:
+                os.remove(os.path.join(self.diretorio, nome))
+                self._total -= tamanho
+                del self._tamanhos[nome]
+            except OSError:
+                pass
+
+    def limpar(self):
+        """Remove todas as entradas"""
+        with self._lock:
+            for nome in os.listdir(self.diretorio):
+                if nome.endswith(self.EXTENSAO):
+                    os.remove(os.path.join(self.diretorio, nome))
+            self._tamanhos = {}
+            self._total = 0
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Carga em massa de lotes no PostgreSQL
+Todos os lotes de uma execução em COPY (texto, geometria em EWKB
+hexadecimal) para uma tabela temporária e daí, com um INSERT ... SELECT,
+para o destino (v_lote é uma view: o PostgreSQL não aceita COPY em views),
+dentro de uma transação, ou de uma transação a cada N quadras,
+sem subprocesso ogr2ogr. Quadras já gravadas antes (reprocessamento
+incremental) têm os lotes antigos removidos na mesma transação da carga. Sem psycopg2 (dependência opcional) o plugin volta
+à importação por processing.
+"""
+from datetime import date
+import io
+import struct
+import time
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+from qgis.core import QgsGeometry, QgsWkbTypes
+
+from .pipeline_memoria import InMemoryPipeline
+from . import pool_sessoes
+from . import remocao_lotes
+
+
+TABELA_PADRAO = 'comercial_umc.v_lote'
+SRID_PADRAO = 31984
+
+# Flag de SRID do EWKB (extensão do PostGIS ao WKB)
+_EWKB_SRID = 0x20000000
+
+# Tabela temporária de cada bloco (descartada no commit)
+TABELA_CARGA = '_carga_lotes'
+
+
+def disponivel():
+    """Indica se o psycopg2 está instalado"""
+    return psycopg2 is not None
+
+
+def ewkb_hex(geom, srid):
+    """EWKB hexadecimal (com SRID) de uma geometria 2D"""
+    if QgsWkbTypes.hasZ(geom.wkbType()) or QgsWkbTypes.hasM(geom.wkbType()):
+        geom = QgsGeometry(geom)
+        geom.get().dropZValue()
+        geom.get().dropMValue()
+    wkb = bytes(geom.asWkb())
+    formato = '<I' if wkb[0] == 1 else '>I'
+    tipo = struct.unpack(formato, wkb[1:5])[0]
+    return (wkb[:1] + struct.pack(formato, tipo | _EWKB_SRID) + struct.pack(formato, srid) + wkb[5:]).hex()
+
+
+class ErroCarga(Exception):
+    """Falha na carga; os blocos já confirmados permanecem gravados"""
+
+    def __init__(self, mensagem, quadras_gravadas):
+        super().__init__(mensagem)
+        self.quadras_gravadas = quadras_gravadas
+
+
+def blocos_por_quadra(lotes, quadras_por_bloco=0):
+    """
+    Agrupa os lotes em blocos de quadras inteiras
+
+    Args:
+        lotes: Feições com o campo id_quadra
+        quadras_por_bloco: Quadras por bloco (0 = um único bloco)
+
+    Returns:
+        list: [(ids_quadra, lotes)] na ordem de chegada das quadras
+    """
+    por_quadra = {}
+    for lote in lotes:
+        por_quadra.setdefault(lote['id_quadra'], []).append(lote)
+    ids = list(por_quadra)
+    passo = quadras_por_bloco if quadras_por_bloco > 0 else max(len(ids), 1)
+    return [
+        (ids[i:i + passo], [lote for id_quadra in ids[i:i + passo] for lote in por_quadra[id_quadra]])
+        for i in range(0, len(ids), passo)
+    ]
+
+
+def _valor_copy(valor):
+    """Valor no formato texto do COPY (\\N para nulo, separadores escapados)"""
+    if valor is None or (hasattr(valor, 'isNull') and valor.isNull()):
+        return '\\N'
+    if hasattr(valor, 'toPyDate'):
+        valor = valor.toPyDate()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    texto = str(valor)
+    return (texto.replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class CargaLotes:
+    """Grava lotes (feições de InMemoryPipeline.campos_lote()) com COPY"""
+
+    def __init__(self, dsn, tabela=TABELA_PADRAO, srid=SRID_PADRAO):
+        """
+        Args:
+            dsn: String de conexão libpq
+            tabela: 'esquema.tabela' de destino
+            srid: SRID gravado no EWKB
+
+        Raises:
+            Exception: psycopg2 não instalado
+        """
+        if psycopg2 is None:
+            raise Exception("psycopg2 não está instalado")
+        self.dsn = dsn
+        self.tabela = tabela
+        self.srid = srid
+        self.colunas = InMemoryPipeline.campos_lote().names() + ['geom']
+
+    def _conteudo(self, lotes):
+        buffer = io.StringIO()
+        nomes = self.colunas[:-1]
+        for lote in lotes:
+            valores = [_valor_copy(lote[nome]) for nome in nomes]
+            valores.append(ewkb_hex(lote.geometry(), self.srid))
+            buffer.write('\t'.join(valores))
+            buffer.write('\n')
+        buffer.seek(0)
+        return buffer
+
+    def _destino(self):
+        esquema, _, nome = self.tabela.rpartition('.')
+        return f'"{esquema}"."{nome}"' if esquema else f'"{nome}"'
+
+    def _lista_colunas(self):
+        return ', '.join(f'"{c}"' for c in self.colunas)
+
+    def sql_carga(self):
+        """
+        Comandos de um bloco: tabela temporária, COPY nela e INSERT no destino
+
+        A tabela temporária copia os tipos das colunas do destino (tabela ou
+        view) e é descartada no commit do bloco.
+
+        Returns:
+            tuple: (criar, copiar, inserir)
+        """
+        colunas = self._lista_colunas()
+        criar = (f"CREATE TEMP TABLE {TABELA_CARGA} ON COMMIT DROP AS "
+                 f"SELECT {colunas} FROM {self._destino()} WITH NO DATA")
+        copiar = f"COPY {TABELA_CARGA} ({colunas}) FROM STDIN"
+        inserir = f"INSERT INTO {self._destino()} ({colunas}) SELECT {colunas} FROM {TABELA_CARGA}"
+        return criar, copiar, inserir
+
+    def gravar(self, lotes, quadras_por_commit=0, substituir=None):
+        """
+        Grava os lotes com um COPY (via tabela temporária) e um commit por bloco de quadras
+
+        Com quadras_por_commit = 0 a execução inteira é uma transação (tudo ou
+        nada); com N > 0, cada bloco de N quadras é confirmado separadamente e
+        uma falha desfaz só o bloco em curso.
+
+        Args:
+            lotes: Feições de InMemoryPipeline.campos_lote()
+            quadras_por_commit: Quadras por transação (0 = todas)
+            substituir: Ids de quadra cujos lotes já gravados são removidos
+                antes do COPY, na transação do bloco da quadra (opcional)
+
+        Returns:
+            dict: {'metodo': 'copy', 'linhas': gravadas, 'removidos': substituídos,
+                'commits': n, 'duracao_s': tempo}
+
+        Raises:
+            ErroCarga: com as quadras dos blocos já confirmados
+        """
+        inicio = time.perf_counter()
+        linhas = 0
+        removidos = 0
+        commits = 0
+        gravadas = []
+        criar, copiar, inserir = self.sql_carga()
+        substituir = {str(quadra_id) for quadra_id in (substituir or [])}
+        remover = remocao_lotes.sql_remocao('%s', self.tabela.rpartition('.')[0] or remocao_lotes.ESQUEMA)
+        try:
+            with pool_sessoes.pool(self.dsn).sessao() as sessao:
+                for ids_quadra, bloco in blocos_por_quadra(lotes, quadras_por_commit):
+                    antigas = [quadra_id for quadra_id in ids_quadra if str(quadra_id) in substituir]
+                    if antigas:
+                        removidos += sum(int(n) for _, n in sessao.executar(remover, (antigas,)))
+                    sessao.executar(criar)
+                    copiadas = sessao.copiar(copiar, self._conteudo(bloco))
+                    sessao.executar(inserir)
+                    sessao.commit()
+                    linhas += copiadas if copiadas >= 0 else len(bloco)
+                    commits += 1
+                    gravadas.extend(ids_quadra)
+        except Exception as e:
+            raise ErroCarga(str(e), gravadas) from e
+        return {
+            'metodo': 'copy',
+            'linhas': linhas,
+            'removidos': removidos,
+            'commits': commits,
+            'duracao_s': round(time.perf_counter() - inicio, 3)
+        }
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Definição declarativa do pipeline de poligonização
+Lista ordenada de etapas com parâmetros, lida do projeto QGIS ou do
+pipeline.json do plugin e validada no carregamento
+"""
+import copy
+import json
+import os
+
+from .pipeline_memoria import PARAMETROS_PADRAO
+
+
+# Ordem canônica das etapas. 'entrada'/'saida' são as chaves do estado que a
+# etapa lê e escreve; 'parametros' liga o nome usado na definição ao nome em
+# PARAMETROS_PADRAO; etapas com 'nulo_se_zero' não fazem nada com parâmetro 0.
+ETAPAS = {
+    'ExtrairFeicoes': {'obrigatoria': True, 'entrada': 'quadra_layer', 'saida': 'quadras'},
+    'LinhasDentroQuadra': {'obrigatoria': False, 'entrada': 'linhas', 'saida': 'linhas'},
+    'EstenderLinhas': {'obrigatoria': False, 'entrada': 'linhas', 'saida': 'linhas',
+                       'parametros': {'distancia': 'distancia_extensao'}, 'nulo_se_zero': True},
+    'PoligonosParaLinhas': {'obrigatoria': True, 'entrada': 'quadras', 'saida': 'bordas'},
+    'MesclarCamadas': {'obrigatoria': True, 'entrada': 'linhas', 'saida': 'linhas'},
+    'Simplificar': {'obrigatoria': False, 'entrada': 'linhas', 'saida': 'linhas',
+                    'parametros': {'tolerancia': 'tolerancia_simplificacao'}, 'nulo_se_zero': True},
+    'Poligonizar': {'obrigatoria': True, 'entrada': 'linhas', 'saida': 'poligonos'},
+    'AjustarGeometrias': {'obrigatoria': False, 'entrada': 'poligonos', 'saida': 'poligonos',
+                          'parametros': {'tolerancia': 'tolerancia_ajuste'}, 'nulo_se_zero': True},
+    'AceitarLotes': {'obrigatoria': True, 'entrada': 'poligonos', 'saida': 'aceitos',
+                     'parametros': {'razao_area': 'razao_area'}},
+    'EditarCampos': {'obrigatoria': True, 'entrada': 'aceitos', 'saida': 'lotes'}
+}
+
+DEFINICAO_PADRAO = {
+    'versao': 1,
+    'etapas': [
+        {'nome': 'ExtrairFeicoes'},
+        {'nome': 'LinhasDentroQuadra'},
+        {'nome': 'EstenderLinhas', 'parametros': {'distancia': PARAMETROS_PADRAO['distancia_extensao']}},
+        {'nome': 'PoligonosParaLinhas'},
+        {'nome': 'MesclarCamadas'},
+        {'nome': 'Simplificar', 'parametros': {'tolerancia': PARAMETROS_PADRAO['tolerancia_simplificacao']}},
+        {'nome': 'Poligonizar'},
+        {'nome': 'AjustarGeometrias', 'parametros': {'tolerancia': PARAMETROS_PADRAO['tolerancia_ajuste']}},
+        {'nome': 'AceitarLotes', 'parametros': {'razao_area': PARAMETROS_PADRAO['razao_area']}},
+        {'nome': 'EditarCampos'}
+    ]
+}
+
+ARQUIVO_PADRAO = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'pipeline.json')
+
+# Entrada do projeto com o JSON da definição ou o caminho de um arquivo
+ESCOPO_PROJETO = 'PoligonizadorLinhaCorte'
+CHAVE_PROJETO = 'pipeline'
+
+
+class DefinicaoPipeline:
+    """
+    Definição validada
+
+    etapas: nomes das etapas a executar, na ordem
+    ignoradas: etapas desativadas ou sem efeito (parâmetro 0)
+    """
+
+    def __init__(self, definicao, origem='padrão'):
+        """
+        Args:
+            definicao: dict no formato de DEFINICAO_PADRAO
+            origem: Descrição da origem (mensagens de erro)
+
+        Raises:
+            Exception: Definição inválida
+        """
+        self.origem = origem
+        self.etapas = []
+        self.ignoradas = []
+        self._parametros = dict(PARAMETROS_PADRAO)
+        self._validar(definicao)
+
+    def _erro(self, mensagem):
+        raise Exception(f"Definição do pipeline inválida ({self.origem}): {mensagem}")
+
+    def _validar(self, definicao):
+        if not isinstance(definicao, dict) or not isinstance(definicao.get('etapas'), list):
+            self._erro("esperado um objeto com a lista 'etapas'")
+
+        ordem = list(ETAPAS)
+        ultima = -1
+        vistas = set()
+        for item in definicao['etapas']:
+            nome = item.get('nome') if isinstance(item, dict) else None
+            if nome not in ETAPAS:
+                self._erro(f"etapa desconhecida: {nome!r}")
+            if nome in vistas:
+                self._erro(f"etapa repetida: {nome}")
+            if ordem.index(nome) < ultima:
+                self._erro(f"etapa fora de ordem: {nome}")
+            vistas.add(nome)
+            ultima = ordem.index(nome)
+
+            especificacao = ETAPAS[nome]
+            ativa = item.get('ativo', True)
+            if not isinstance(ativa, bool):
+                self._erro(f"'ativo' de {nome} deve ser true/false")
+            if not ativa and especificacao['obrigatoria']:
+                self._erro(f"a etapa {nome} não pode ser desativada")
+
+            parametros = self._validar_parametros(nome, item.get('parametros') or {})
+            if not ativa:
+                # Etapa desativada equivale a parâmetro nulo no pipeline em memória
+                parametros = {chave: 0.0 for chave in parametros}
+            self._parametros.update(parametros)
+
+            nula = especificacao.get('nulo_se_zero') and all(v == 0 for v in parametros.values())
+            if ativa and not nula:
+                self.etapas.append(nome)
+            else:
+                self.ignoradas.append(nome)
+
+        faltando = [nome for nome, e in ETAPAS.items() if e['obrigatoria'] and nome not in vistas]
+        if faltando:
+            self._erro(f"etapas obrigatórias ausentes: {', '.join(faltando)}")
+
+        # Etapa opcional ausente equivale a desativada: parâmetro nulo, para que
+        # o pipeline em memória, a chave do cache e as impressões acompanhem o processing
+        for nome, especificacao in ETAPAS.items():
+            if nome not in vistas and especificacao.get('nulo_se_zero'):
+                self._parametros.update({chave: 0.0 for chave in especificacao['parametros'].values()})
+                self.ignoradas.append(nome)
+
+    def _validar_parametros(self, nome, parametros):
+        """Converte os parâmetros da etapa para os nomes de PARAMETROS_PADRAO"""
+        if not isinstance(parametros, dict):
+            self._erro(f"'parametros' de {nome} deve ser um objeto")
+        mapa = ETAPAS[nome].get('parametros', {})
+        desconhecidos = set(parametros) - set(mapa)
+        if desconhecidos:
+            self._erro(f"parâmetros desconhecidos em {nome}: {', '.join(sorted(desconhecidos))}")
+
+        resultado = {}
+        for chave_etapa, chave_pipeline in mapa.items():
+            valor = parametros.get(chave_etapa, PARAMETROS_PADRAO[chave_pipeline])
+            if isinstance(valor, bool) or not isinstance(valor, (int, float)) or valor < 0:
+                self._erro(f"{nome}.{chave_etapa} deve ser um número >= 0")
+            resultado[chave_pipeline] = float(valor)
+
+        if 'razao_area' in resultado and not 0 < resultado['razao_area'] <= 1:
+            self._erro(f"{nome}.razao_area deve estar em (0, 1]")
+        return resultado
+
+    @property
+    def num_etapas(self):
+        """Quantidade de etapas executadas (para QgsProcessingMultiStepFeedback)"""
+        return len(self.etapas)
+
+    def parametros(self):
+        """Parâmetros no formato de PARAMETROS_PADRAO (pipeline em memória, cache)"""
+        return dict(self._parametros)
+
+    # ==================== CARREGAMENTO ====================
+
+    @staticmethod
+    def padrao():
+        """Definição do pipeline.json do plugin, ou a embutida se o arquivo não existir"""
+        if os.path.exists(ARQUIVO_PADRAO):
+            return DefinicaoPipeline.de_arquivo(ARQUIVO_PADRAO)
+        return DefinicaoPipeline(copy.deepcopy(DEFINICAO_PADRAO))
+
+    @staticmethod
+    def de_arquivo(caminho):
+        try:
+            with open(caminho, 'r', encoding='utf-8') as arquivo:
+                definicao = json.load(arquivo)
+        except (OSError, ValueError) as e:
+            raise Exception(f"Não foi possível ler a definição do pipeline {caminho}: {e}")
+        return DefinicaoPipeline(definicao, caminho)
+
+    @staticmethod
+    def carregar(projeto=None):
+        """
+        Definição do projeto, se houver, senão a padrão
+
+        A entrada PoligonizadorLinhaCorte/pipeline do projeto pode conter o JSON
+        da definição ou o caminho de um arquivo (relativo à pasta do projeto).
+        """
+        if projeto is not None:
+            valor, definida = projeto.readEntry(ESCOPO_PROJETO, CHAVE_PROJETO, '')
+            valor = valor.strip() if definida else ''
+            if valor.startswith('{'):
+                try:
+                    return DefinicaoPipeline(json.loads(valor), 'projeto')
+                except ValueError as e:
+                    raise Exception(f"Definição do pipeline do projeto não é um JSON válido: {e}")
+            if valor:
+                caminho = valor if os.path.isabs(valor) else os.path.join(projeto.homePath(), valor)
+                return DefinicaoPipeline.de_arquivo(caminho)
+        return DefinicaoPipeline.padrao()
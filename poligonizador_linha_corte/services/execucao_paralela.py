@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Execução paralela de quadras
+Distribui quadras independentes entre threads, maiores primeiro, e devolve
+os resultados na ordem original para relatório e importação determinísticos
+
+Threads e não processos: o trabalho de cada quadra (InMemoryPipeline) é quase
+todo GEOS, chamado por métodos do QgsGeometry que liberam o GIL, então as
+threads ocupam vários núcleos. Um pool de processos não cabe no plugin:
+QgsFeature/QgsGeometry (objetos SIP) não são serializáveis e, dentro do QGIS,
+sys.executable é o próprio QGIS e não um interpretador. processing.run também
+não entra nos workers: depende do contexto e do projeto da thread que o chama
+e não é seguro entre threads, por isso o modo paralelo exige o motor em memória.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+
+
+def custo_estimado(quadra_geom, linhas):
+    """Estima o custo de uma quadra pelo total de vértices envolvidos"""
+    vertices = quadra_geom.constGet().nCoordinates() if quadra_geom else 0
+    return vertices + sum(g.constGet().nCoordinates() for g in linhas if g and not g.isNull())
+
+
+class ParallelQuadraExecutor:
+    """Pool de workers para processar quadras em paralelo"""
+
+    def __init__(self, num_workers=0):
+        """
+        Args:
+            num_workers: Quantidade de threads (0 = número de núcleos)
+        """
+        self.num_workers = num_workers if num_workers and num_workers > 0 else (os.cpu_count() or 1)
+
+    def executar(self, tarefas, funcao, feedback=None):
+        """
+        Executa funcao(*args) para cada tarefa
+
+        No cancelamento as tarefas que ainda não começaram são descartadas;
+        as que já estavam em execução terminam e seus resultados são mantidos.
+
+        Args:
+            tarefas: Lista de tuplas (custo, args)
+            funcao: Função executada em cada worker
+            feedback: QgsFeedback para progresso e cancelamento (opcional)
+
+        Returns:
+            list: Um dict por tarefa, na ordem de entrada:
+                {'resultado': ...} ou {'erro': Exception}; None para as
+                tarefas descartadas pelo cancelamento
+        """
+        resultados = [None] * len(tarefas)
+        # Maiores primeiro para balancear a carga entre os workers
+        ordem = sorted(range(len(tarefas)), key=lambda i: (-tarefas[i][0], i))
+
+        def coletar(futuro):
+            try:
+                resultados[futuros[futuro]] = {'resultado': futuro.result()}
+            except Exception as e:
+                resultados[futuros[futuro]] = {'erro': e}
+
+        with ThreadPoolExecutor(max_workers=self.num_workers) as pool:
+            futuros = {pool.submit(funcao, *tarefas[i][1]): i for i in ordem}
+            for concluidos, futuro in enumerate(as_completed(futuros), start=1):
+                coletar(futuro)
+
+                if feedback is not None:
+                    feedback.setProgress(100.0 * concluidos / len(tarefas))
+                    if feedback.isCanceled():
+                        # Descarta o que ainda não começou
+                        for pendente in futuros:
+                            pendente.cancel()
+                        break
+
+        # Após o cancelamento: o pool esperou as tarefas já em execução
+        for futuro, indice in futuros.items():
+            if resultados[indice] is None and not futuro.cancelled():
+                coletar(futuro)
+        return resultados
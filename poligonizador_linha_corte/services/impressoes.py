@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Impressões digitais das quadras poligonizadas
+Guarda, por conexão, o hash da entrada (quadra, linhas de corte e parâmetros)
+da última execução bem-sucedida de cada quadra, para identificar as que mudaram
+"""
+import json
+import os
+import threading
+
+
+class FingerprintStore:
+    """Arquivo JSON {conexao: {id_quadra: impressao}}"""
+
+    def __init__(self, caminho):
+        """
+        Args:
+            caminho: Arquivo JSON (criado no primeiro salvar())
+        """
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        try:
+            with open(caminho, 'r', encoding='utf-8') as arquivo:
+                self._dados = json.load(arquivo)
+        except (OSError, ValueError):
+            self._dados = {}
+
+    def obter(self, conexao, quadra_id):
+        """Impressão da última execução bem-sucedida, ou None"""
+        return self._dados.get(conexao, {}).get(str(quadra_id))
+
+    def quadras(self, conexao):
+        """{id_quadra (texto): impressao} da conexão"""
+        return dict(self._dados.get(conexao, {}))
+
+    def registrar(self, conexao, quadra_id, impressao):
+        with self._lock:
+            self._dados.setdefault(conexao, {})[str(quadra_id)] = impressao
+
+    def descartar(self, conexao, quadra_ids):
+        """Esquece as quadras (ex.: lotes removidos), tornando-as pendentes"""
+        with self._lock:
+            registradas = self._dados.get(conexao, {})
+            for quadra_id in quadra_ids:
+                registradas.pop(str(quadra_id), None)
+
+    def salvar(self):
+        with self._lock:
+            diretorio = os.path.dirname(self.caminho)
+            if diretorio:
+                os.makedirs(diretorio, exist_ok=True)
+            temporario = self.caminho + '.tmp'
+            with open(temporario, 'w', encoding='utf-8') as arquivo:
+                json.dump(self._dados, arquivo)
+            os.replace(temporario, self.caminho)
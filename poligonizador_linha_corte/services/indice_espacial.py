@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Índice espacial das linhas de corte
+Construído uma vez por execução e reutilizado por todas as quadras
+"""
+from qgis.core import QgsFeature, QgsFeatureRequest, QgsGeometry, QgsSpatialIndex
+
+from .pipeline_memoria import InMemoryPipeline
+
+
+class LinhasCorteIndex:
+    """Índice espacial (com geometrias) das linhas de corte de uma execução"""
+
+    def __init__(self, linhas_layer, extensao=None):
+        """
+        Args:
+            linhas_layer: Camada Linhas_corte
+            extensao: QgsRectangle que limita as linhas indexadas (opcional),
+                normalmente a extensão das quadras selecionadas
+        """
+        request = QgsFeatureRequest().setNoAttributes()
+        if extensao is not None and not extensao.isNull():
+            request.setFilterRect(extensao)
+
+        self.ids = []
+        self.index = QgsSpatialIndex(flags=QgsSpatialIndex.FlagStoreFeatureGeometries)
+        for feature in linhas_layer.getFeatures(request):
+            self.index.addFeature(feature)
+            self.ids.append(feature.id())
+
+    @staticmethod
+    def _engine_preparado(geom):
+        engine = QgsGeometry.createGeometryEngine(geom.constGet())
+        engine.prepareGeometry()
+        return engine
+
+    def candidatos(self, geom):
+        """Ids das linhas cujo retângulo envolvente intersecta a geometria"""
+        return self.index.intersects(geom.boundingBox())
+
+    def tem_linhas(self, geom):
+        """Indica se alguma linha intersecta a geometria (para no primeiro acerto)"""
+        engine = self._engine_preparado(geom)
+        return any(
+            engine.intersects(self.index.geometry(fid).constGet())
+            for fid in self.candidatos(geom)
+        )
+
+    def estendidas(self, distancia):
+        """
+        {id: linha estendida} de todas as linhas indexadas
+
+        Uma única chamada a InMemoryPipeline.estender_linhas para a execução
+        inteira: com NumPy a extensão é vetorizada sobre todas as linhas da
+        seleção, em vez de poucas linhas por quadra.
+        """
+        geometrias = [self.index.geometry(fid) for fid in self.ids]
+        return dict(zip(self.ids, InMemoryPipeline.estender_linhas(geometrias, distancia)))
+
+    def linhas_intersectando(self, geom):
+        """Feições (id e geometria) das linhas que intersectam a geometria"""
+        engine = self._engine_preparado(geom)
+        linhas = []
+        for fid in sorted(self.candidatos(geom)):
+            linha_geom = self.index.geometry(fid)
+            if engine.intersects(linha_geom.constGet()):
+                linha = QgsFeature(fid)
+                linha.setGeometry(linha_geom)
+                linhas.append(linha)
+        return linhas
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Poligonização de um município inteiro em ladrilhos, com retomada
+As quadras são divididas em ladrilhos (por um campo como id_setor ou por uma
+grade), processadas ladrilho a ladrilho e cada quadra concluída é registrada
+em um diário SQLite local; uma execução interrompida continua de onde parou
+"""
+from datetime import datetime
+import json
+import math
+import sqlite3
+
+from qgis.core import QgsExpression, QgsFeatureRequest, QgsRectangle
+
+from .carga_lotes import ErroCarga
+from .definicao_pipeline import DefinicaoPipeline
+from .nucleo import info_quadra, poligonizar_quadras, MOTIVO_CANCELADA
+from .pipeline_memoria import InMemoryPipeline
+from .profiler import PipelineProfiler
+
+
+class Ladrilho:
+    """Conjunto de quadras processado e gravado de uma vez"""
+
+    def __init__(self, chave, request, celula=None):
+        """
+        Args:
+            chave: Identificação do ladrilho no diário
+            request: QgsFeatureRequest das quadras candidatas
+            celula: QgsRectangle da grade; só entram as quadras cujo ponto
+                interior está na célula (cada quadra em um único ladrilho)
+        """
+        self.chave = chave
+        self.request = request
+        self.celula = celula
+
+    def quadras(self, quadra_layer):
+        """Feições das quadras do ladrilho"""
+        quadras = quadra_layer.getFeatures(self.request)
+        if self.celula is None:
+            return list(quadras)
+        c = self.celula
+        resultado = []
+        for quadra in quadras:
+            ponto = quadra.geometry().pointOnSurface().asPoint()
+            # Intervalo semiaberto: ponto na divisa fica na célula da direita/de cima
+            if c.xMinimum() <= ponto.x() < c.xMaximum() and c.yMinimum() <= ponto.y() < c.yMaximum():
+                resultado.append(quadra)
+        return resultado
+
+
+def ladrilhos_por_campo(quadra_layer, campo, extensao=None):
+    """Um ladrilho por valor do campo (ex.: id_setor), em ordem crescente"""
+    indice = quadra_layer.fields().lookupField(campo)
+    if indice < 0:
+        raise Exception(f"A camada de quadras não possui o campo '{campo}'")
+
+    valores, nulos = [], False
+    for valor in quadra_layer.uniqueValues(indice):
+        if valor is None or (hasattr(valor, 'isNull') and valor.isNull()):
+            nulos = True
+        else:
+            valores.append(valor)
+
+    ladrilhos = []
+    for valor in sorted(valores, key=lambda v: (str(type(v)), v)):
+        request = QgsFeatureRequest().setFilterExpression(
+            f"{QgsExpression.quotedColumnRef(campo)} = {QgsExpression.quotedValue(valor)}"
+        )
+        ladrilhos.append(Ladrilho(f"{campo}={valor}", request))
+    if nulos:
+        request = QgsFeatureRequest().setFilterExpression(f"{QgsExpression.quotedColumnRef(campo)} IS NULL")
+        ladrilhos.append(Ladrilho(f"{campo}=NULL", request))
+
+    if extensao is not None:
+        for ladrilho in ladrilhos:
+            ladrilho.request.setFilterRect(extensao)
+    return ladrilhos
+
+
+def ladrilhos_em_grade(quadra_layer, tamanho, extensao=None):
+    """Células quadradas de `tamanho` (unidades do SRC) cobrindo a extensão das quadras"""
+    if tamanho <= 0:
+        raise Exception("O tamanho da grade deve ser positivo")
+    extensao = extensao or quadra_layer.extent()
+    if extensao.isNull() or extensao.isEmpty():
+        return []
+
+    # Origem alinhada a múltiplos do tamanho: a grade não muda entre execuções
+    x0 = math.floor(extensao.xMinimum() / tamanho) * tamanho
+    y0 = math.floor(extensao.yMinimum() / tamanho) * tamanho
+    colunas = max(1, math.ceil((extensao.xMaximum() - x0) / tamanho) + 1)
+    linhas = max(1, math.ceil((extensao.yMaximum() - y0) / tamanho) + 1)
+
+    ladrilhos = []
+    for linha in range(linhas):
+        for coluna in range(colunas):
+            xmin, ymin = x0 + coluna * tamanho, y0 + linha * tamanho
+            celula = QgsRectangle(xmin, ymin, xmin + tamanho, ymin + tamanho)
+            ladrilhos.append(Ladrilho(
+                f"grade:{tamanho:g}:{int(round(xmin))}:{int(round(ymin))}",
+                QgsFeatureRequest().setFilterRect(celula), celula
+            ))
+    return ladrilhos
+
+
+class DiarioCheckpoint:
+    """
+    Diário SQLite de um ou mais jobs
+
+    Uma linha por ladrilho (pendente, gravando, concluido) e por quadra
+    registrada (processada, ignorada, erro). Cada ladrilho é registrado em
+    uma única transação depois da gravação dos lotes.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._conexao = sqlite3.connect(caminho)
+        with self._conexao:
+            self._conexao.executescript('''
+                CREATE TABLE IF NOT EXISTS job (
+                    id TEXT PRIMARY KEY, particao TEXT, parametros TEXT, criado TEXT
+                );
+                CREATE TABLE IF NOT EXISTS ladrilho (
+                    job TEXT, chave TEXT, status TEXT, quadras INTEGER, lotes INTEGER, atualizado TEXT,
+                    PRIMARY KEY (job, chave)
+                );
+                CREATE TABLE IF NOT EXISTS quadra (
+                    job TEXT, quadra_id TEXT, ladrilho TEXT, status TEXT, lotes INTEGER,
+                    motivo TEXT, atualizado TEXT,
+                    PRIMARY KEY (job, quadra_id)
+                );
+            ''')
+
+    def fechar(self):
+        self._conexao.close()
+
+    def abrir_job(self, job_id, particao, parametros):
+        """
+        Cria o job ou confere se o existente usa a mesma partição e parâmetros
+
+        Raises:
+            Exception: Job existente com outra partição ou outros parâmetros
+        """
+        parametros = json.dumps(parametros, sort_keys=True)
+        linha = self._conexao.execute(
+            'SELECT particao, parametros FROM job WHERE id = ?', (job_id,)
+        ).fetchone()
+        if linha is None:
+            with self._conexao:
+                self._conexao.execute(
+                    'INSERT INTO job VALUES (?, ?, ?, ?)',
+                    (job_id, particao, parametros, datetime.now().isoformat(timespec='seconds'))
+                )
+            return False
+        if linha != (particao, parametros):
+            raise Exception(
+                f"O job '{job_id}' já existe no diário com outra partição ou outros parâmetros; "
+                "use outro nome de job"
+            )
+        return True
+
+    def status_ladrilhos(self, job_id):
+        """
+        {chave: status} dos ladrilhos já iniciados
+
+        Ladrilho concluído com quadras em erro volta a 'pendente' (diários
+        gravados antes desta regra), para que a retomada refaça essas quadras.
+        """
+        return dict(self._conexao.execute(
+            """
+            SELECT l.chave,
+                   CASE WHEN l.status = 'concluido' AND EXISTS (
+                            SELECT 1 FROM quadra q
+                            WHERE q.job = l.job AND q.ladrilho = l.chave AND q.status = 'erro'
+                        ) THEN 'pendente' ELSE l.status END
+            FROM ladrilho l WHERE l.job = ?
+            """, (job_id,)
+        ))
+
+    def quadras_registradas(self, job_id):
+        """Ids (texto) das quadras que não precisam ser refeitas (processadas ou ignoradas sem erro)"""
+        return {linha[0] for linha in self._conexao.execute(
+            "SELECT quadra_id FROM quadra WHERE job = ? AND status != 'erro'", (job_id,)
+        )}
+
+    def iniciar_gravacao(self, job_id, chave):
+        """Marca o ladrilho como em gravação (lotes podem estar gravados sem registro)"""
+        with self._conexao:
+            self._conexao.execute(
+                'INSERT OR REPLACE INTO ladrilho VALUES (?, ?, ?, NULL, NULL, ?)',
+                (job_id, chave, 'gravando', datetime.now().isoformat(timespec='seconds'))
+            )
+
+    def registrar_ladrilho(self, job_id, chave, relatorio, concluido):
+        """
+        Registra as quadras do ladrilho e seu novo status em uma transação
+
+        O ladrilho só fica 'concluido' se nenhuma quadra terminou em erro.
+
+        Returns:
+            str: Status gravado
+        """
+        agora = datetime.now().isoformat(timespec='seconds')
+        registros = [
+            (job_id, str(item['id']), chave, 'processada', item['lotes'], None, agora)
+            for item in relatorio['processadas']
+        ]
+        for item in relatorio['ignoradas']:
+            if item['motivo'] == MOTIVO_CANCELADA:
+                continue
+            status = 'erro' if item['motivo'].startswith('Erro') else 'ignorada'
+            registros.append((job_id, str(item['id']), chave, status, 0, item['motivo'], agora))
+
+        com_erro = any(registro[3] == 'erro' for registro in registros)
+        status = 'concluido' if concluido and not com_erro else 'pendente'
+        with self._conexao:
+            self._conexao.executemany('INSERT OR REPLACE INTO quadra VALUES (?, ?, ?, ?, ?, ?, ?)', registros)
+            self._conexao.execute(
+                'INSERT OR REPLACE INTO ladrilho VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, chave, status, len(relatorio['processadas']), relatorio['total_lotes'], agora)
+            )
+        return status
+
+    def registrar_falha_gravacao(self, job_id, chave, relatorio, erro):
+        """
+        Registra um ladrilho cuja gravação falhou no meio (ErroCarga)
+
+        As quadras dos blocos confirmados ficam como processadas; as demais,
+        como erro, e o ladrilho volta a 'pendente' para que a retomada as refaça.
+        """
+        gravadas = {str(quadra_id) for quadra_id in erro.quadras_gravadas}
+        parcial = {'processadas': [], 'ignoradas': list(relatorio['ignoradas']), 'total_lotes': 0}
+        for item in relatorio['processadas']:
+            if str(item['id']) in gravadas:
+                parcial['processadas'].append(item)
+                parcial['total_lotes'] += item['lotes']
+            else:
+                parcial['ignoradas'].append({
+                    'inscricao': item['inscricao'], 'id': item['id'],
+                    'motivo': f'Erro na gravação: {str(erro)[:50]}'
+                })
+        self.registrar_ladrilho(job_id, chave, parcial, False)
+        return parcial
+
+    def resumo(self, job_id):
+        """Totais do job no diário (todas as execuções)"""
+        quadras = dict(self._conexao.execute(
+            'SELECT status, COUNT(*) FROM quadra WHERE job = ? GROUP BY status', (job_id,)
+        ))
+        lotes = self._conexao.execute(
+            'SELECT COALESCE(SUM(lotes), 0) FROM quadra WHERE job = ?', (job_id,)
+        ).fetchone()[0]
+        return {'quadras': quadras, 'lotes': lotes}
+
+
+def executar_job(quadra_layer, linhas_layer, ladrilhos, diario, job_id, gravar, particao='',
+                 definicao=None, num_workers=1, perfil=None, feedback=None, ao_concluir_ladrilho=None,
+                 nodagem=False):
+    """
+    Processa os ladrilhos em ordem, pulando o que o diário já registra
+
+    Para cada ladrilho: poligoniza as quadras ainda não registradas, marca o
+    ladrilho como 'gravando', chama gravar(lotes, substituir) e registra as
+    quadras. A retomada é idempotente: um ladrilho já iniciado (o processo
+    morreu durante a gravação ou quadras falharam) é regravado com os ids
+    das quadras refeitas em `substituir`, e gravar remove do destino os lotes
+    que elas já tenham antes de acrescentar os novos. Se gravar levantar
+    ErroCarga, as quadras dos blocos confirmados são registradas como
+    processadas e as demais como erro antes de a exceção seguir.
+
+    Args:
+        ladrilhos: Lista de Ladrilho (ladrilhos_por_campo / ladrilhos_em_grade)
+        diario: DiarioCheckpoint
+        job_id: Nome do job no diário
+        gravar: Função (lotes, substituir) que grava os lotes (QgsFeature),
+            removendo antes os já gravados das quadras com id em `substituir`
+        particao: Descrição da partição, conferida na retomada
+        ao_concluir_ladrilho: Função (indice, total, chave, relatorio) chamada a cada ladrilho (opcional)
+        nodagem: Usa o caminho de nodagem única (motor 'geos')
+
+    Returns:
+        dict: Relatório da execução no formato do plugin, mais 'ladrilhos' e 'diario'
+    """
+    definicao = definicao or DefinicaoPipeline.padrao()
+    perfil = perfil or PipelineProfiler(ativo=False)
+    contexto = InMemoryPipeline.contexto_execucao()
+
+    retomado = diario.abrir_job(job_id, particao, definicao.parametros())
+    status = diario.status_ladrilhos(job_id)
+    registradas = diario.quadras_registradas(job_id)
+
+    relatorio = {
+        'processadas': [], 'ignoradas': [], 'total_lotes': 0,
+        'ladrilhos': {'total': len(ladrilhos), 'ja_concluidos': 0, 'concluidos': 0, 'vazios': 0},
+        'ladrilhos_incertos': [chave for chave, s in status.items() if s == 'gravando'],
+        'ladrilhos_regravados': [],
+        'retomado': retomado
+    }
+
+    for indice, ladrilho in enumerate(ladrilhos):
+        if feedback is not None and feedback.isCanceled():
+            break
+        if status.get(ladrilho.chave) == 'concluido':
+            relatorio['ladrilhos']['ja_concluidos'] += 1
+            continue
+
+        quadras = [q for q in ladrilho.quadras(quadra_layer) if str(info_quadra(q)['id']) not in registradas]
+        if not quadras:
+            relatorio['ladrilhos']['vazios'] += 1
+            diario.registrar_ladrilho(
+                job_id, ladrilho.chave, {'processadas': [], 'ignoradas': [], 'total_lotes': 0}, True
+            )
+            continue
+
+        lotes, parcial = poligonizar_quadras(
+            quadras, linhas_layer, definicao, num_workers, contexto, perfil, feedback, nodagem
+        )
+        cancelado = feedback is not None and feedback.isCanceled()
+
+        # Ladrilho já iniciado: o destino pode ter lotes das quadras refeitas
+        substituir = [info_quadra(q)['id'] for q in quadras] if ladrilho.chave in status else []
+        diario.iniciar_gravacao(job_id, ladrilho.chave)
+        if lotes:
+            try:
+                with perfil.etapa('GravarLotes', lotes):
+                    gravar(lotes, substituir)
+            except ErroCarga as e:
+                diario.registrar_falha_gravacao(job_id, ladrilho.chave, parcial, e)
+                raise
+            if substituir:
+                relatorio['ladrilhos_regravados'].append(ladrilho.chave)
+        status_ladrilho = diario.registrar_ladrilho(job_id, ladrilho.chave, parcial, not cancelado)
+
+        relatorio['processadas'].extend(parcial['processadas'])
+        relatorio['ignoradas'].extend(parcial['ignoradas'])
+        relatorio['total_lotes'] += parcial['total_lotes']
+        if status_ladrilho == 'concluido':
+            relatorio['ladrilhos']['concluidos'] += 1
+        if ao_concluir_ladrilho is not None:
+            ao_concluir_ladrilho(indice, len(ladrilhos), ladrilho.chave, parcial)
+
+    relatorio['cancelado'] = feedback is not None and feedback.isCanceled()
+    relatorio['diario'] = diario.resumo(job_id)
+    return relatorio
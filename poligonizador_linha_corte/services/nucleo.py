@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+Núcleo de poligonização sem interface gráfica
+Geometria da quadra + linhas de corte → lotes, leitura das camadas de origem
+(GeoPackage ou PostGIS) e gravação dos lotes em massa. Não usa iface, canvas,
+camadas do projeto nem diálogos; serve ao plugin e à linha de comando (cli.py)
+"""
+import os
+import sys
+import time
+
+from qgis.core import (QgsCoordinateReferenceSystem, QgsCoordinateTransformContext, QgsDataSourceUri,
+                       QgsExpression, QgsFeature, QgsFeatureRequest, QgsFields, QgsProviderRegistry,
+                       QgsRectangle, QgsVectorFileWriter, QgsVectorLayer, QgsWkbTypes)
+
+from .pipeline_memoria import InMemoryPipeline
+from .definicao_pipeline import DefinicaoPipeline
+from .execucao_paralela import ParallelQuadraExecutor, custo_estimado
+from .indice_espacial import LinhasCorteIndex
+from .profiler import PipelineProfiler
+from . import preverificacao
+from .carga_lotes import CargaLotes
+from . import carga_lotes
+from . import remocao_lotes
+
+
+# Destino dos lotes no banco (o mesmo da importação do plugin)
+ESQUEMA_LOTES = 'comercial_umc'
+TABELA_LOTES = 'v_lote'
+SRID_LOTES = 31984
+
+MOTIVO_CANCELADA = 'Cancelado pelo usuário'
+
+
+def iniciar_qgis(com_processing=False):
+    """
+    Inicializa o QGIS sem interface (scripts e linha de comando)
+
+    Returns:
+        QgsApplication: chamar exitQgis() ao terminar
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from qgis.core import QgsApplication
+
+    QgsApplication.setPrefixPath(os.environ.get('QGIS_PREFIX_PATH', '/usr'), True)
+    app = QgsApplication([], False)
+    app.initQgis()
+
+    if com_processing:
+        plugins = os.path.join(QgsApplication.pkgDataPath(), 'python', 'plugins')
+        if plugins not in sys.path:
+            sys.path.append(plugins)
+        from processing.core.Processing import Processing
+        Processing.initialize()
+    return app
+
+
+# ==================== API DE GEOMETRIA ====================
+
+def info_quadra(feature):
+    """Inscrição, id e geometria da quadra (campos ins_quadra e id, se existirem)"""
+    fields = feature.fields().names()
+    return {
+        'inscricao': feature['ins_quadra'] if 'ins_quadra' in fields else f"ID {feature.id()}",
+        'id': feature['id'] if 'id' in fields else feature.id(),
+        'geometry': feature.geometry()
+    }
+
+
+def poligonizar(quadra_geom, linhas, parametros=None, nodagem=False):
+    """
+    Lotes de uma quadra, só geometria
+
+    Args:
+        quadra_geom: QgsGeometry da quadra
+        linhas: Geometrias das linhas de corte (as que não tocam a quadra são ignoradas)
+        parametros: Sobrescreve PARAMETROS_PADRAO (opcional)
+        nodagem: Usa o caminho de nodagem única (ver InMemoryPipeline.executar)
+
+    Returns:
+        list: QgsGeometry dos lotes
+    """
+    quadra = QgsFeature(QgsFields())
+    quadra.setGeometry(quadra_geom)
+    resultado = InMemoryPipeline.executar(quadra, list(linhas), parametros, nodagem=nodagem)
+    return [lote.geometry() for lote in resultado['lotes']]
+
+
+def poligonizar_camadas(quadra_layer, linhas_layer, ids=None, bbox=None, definicao=None,
+                        num_workers=1, contexto=None, perfil=None, feedback=None, nodagem=False):
+    """
+    Poligoniza as quadras de uma camada filtradas por id e/ou extensão
+
+    Args:
+        quadra_layer, linhas_layer: Camadas de quadras e de linhas de corte
+        ids: Valores do campo id das quadras (opcional)
+        bbox: QgsRectangle ou (xmin, ymin, xmax, ymax) (opcional)
+        Demais: como em poligonizar_quadras()
+
+    Returns:
+        tuple: (lotes [QgsFeature], relatório {'processadas', 'ignoradas', 'total_lotes'}
+            no formato do relatório do plugin)
+    """
+    quadras = list(quadra_layer.getFeatures(requisicao_quadras(quadra_layer, ids, bbox)))
+    lotes, relatorio = poligonizar_quadras(
+        quadras, linhas_layer, definicao, num_workers, contexto, perfil, feedback, nodagem
+    )
+    if ids:
+        encontradas = {str(info_quadra(quadra)['id']) for quadra in quadras}
+        for quadra_id in ids:
+            if str(quadra_id) not in encontradas:
+                relatorio['ignoradas'].append({
+                    'inscricao': f"ID {quadra_id}", 'id': quadra_id, 'motivo': 'Quadra não encontrada'
+                })
+    return lotes, relatorio
+
+
+def poligonizar_quadras(quadras, linhas_layer, definicao=None, num_workers=1,
+                        contexto=None, perfil=None, feedback=None, nodagem=False, preverificar=True):
+    """
+    Poligoniza uma lista de feições de quadra
+
+    Só as linhas na extensão das quadras são indexadas, então a memória
+    usada acompanha o tamanho da lista e não o da camada de linhas.
+
+    Args:
+        quadras: Feições das quadras
+        linhas_layer: Camada de linhas de corte
+        definicao: DefinicaoPipeline (padrão: a do plugin)
+        num_workers: Threads (0 = número de núcleos)
+        contexto: Resultado de InMemoryPipeline.contexto_execucao() (opcional)
+        perfil: PipelineProfiler (opcional)
+        feedback: QgsFeedback para progresso e cancelamento (opcional)
+        nodagem: Usa o caminho de nodagem única (motor 'geos')
+        preverificar: Descarta antes do pipeline as quadras que as linhas não dividem
+
+    Returns:
+        tuple: (lotes [QgsFeature], relatório {'processadas', 'ignoradas', 'total_lotes'})
+    """
+    definicao = definicao or DefinicaoPipeline.padrao()
+    parametros = definicao.parametros()
+    contexto = contexto or InMemoryPipeline.contexto_execucao()
+    perfil = perfil or PipelineProfiler(ativo=False)
+    relatorio = {'processadas': [], 'ignoradas': [], 'total_lotes': 0}
+    if not quadras:
+        return [], relatorio
+
+    extensao = QgsRectangle(quadras[0].geometry().boundingBox())
+    for quadra in quadras[1:]:
+        extensao.combineExtentWith(quadra.geometry().boundingBox())
+    indice = LinhasCorteIndex(linhas_layer, extensao)
+    # Extensão de todas as linhas em uma chamada (vetorizada com NumPy)
+    extensoes = indice.estendidas(parametros['distancia_extensao']) \
+        if not nodagem and parametros['distancia_extensao'] > 0 else None
+
+    pendentes, tarefas = [], []
+    for quadra in quadras:
+        info = info_quadra(quadra)
+        feicoes = indice.linhas_intersectando(info['geometry'])
+        linhas = [f.geometry() for f in feicoes]
+        estendidas = [extensoes[f.id()] for f in feicoes] if extensoes is not None else None
+        if not linhas:
+            motivo = 'Sem linhas de corte'
+        elif preverificar:
+            motivo = preverificacao.preverificar(info['geometry'], linhas, parametros, info['inscricao'])
+        else:
+            motivo = None
+        if motivo:
+            relatorio['ignoradas'].append({'inscricao': info['inscricao'], 'id': info['id'], 'motivo': motivo})
+            continue
+        pendentes.append(info)
+        tarefas.append((custo_estimado(info['geometry'], linhas),
+                        (info['id'], quadra, linhas, parametros, contexto, perfil, nodagem, estendidas)))
+
+    def executar_quadra(quadra_id, *args):
+        with perfil.quadra(quadra_id):
+            return InMemoryPipeline.executar(*args)
+
+    resultados = ParallelQuadraExecutor(num_workers).executar(tarefas, executar_quadra, feedback)
+
+    lotes = []
+    for info, item in zip(pendentes, resultados):
+        if item is None:
+            motivo = MOTIVO_CANCELADA
+        elif 'erro' in item:
+            motivo = f"Erro: {str(item['erro'])[:50]}"
+        elif not item['resultado']['lotes']:
+            motivo = 'Linhas não alcançam a borda'
+        else:
+            lotes.extend(item['resultado']['lotes'])
+            relatorio['processadas'].append({
+                'inscricao': info['inscricao'], 'id': info['id'], 'lotes': len(item['resultado']['lotes'])
+            })
+            relatorio['total_lotes'] += len(item['resultado']['lotes'])
+            continue
+        relatorio['ignoradas'].append({'inscricao': info['inscricao'], 'id': info['id'], 'motivo': motivo})
+
+    return lotes, relatorio
+
+
+def requisicao_quadras(quadra_layer, ids=None, bbox=None):
+    """QgsFeatureRequest das quadras com os ids e/ou dentro da extensão informados"""
+    request = QgsFeatureRequest()
+    if ids:
+        if 'id' not in quadra_layer.fields().names():
+            raise Exception("A camada de quadras não possui o campo 'id'")
+        valores = ', '.join(QgsExpression.quotedValue(i) for i in ids)
+        request.setFilterExpression(f'"id" IN ({valores})')
+    if bbox is not None:
+        request.setFilterRect(bbox if isinstance(bbox, QgsRectangle) else QgsRectangle(*bbox))
+    return request
+
+
+# ==================== ORIGEM E DESTINO ====================
+
+def criar_camada_memoria(features, fields, wkb_type, crs_authid, nome):
+    """Camada de memória (fora do projeto) com cópia das feições"""
+    layer = QgsVectorLayer(f"{QgsWkbTypes.displayString(wkb_type)}?crs={crs_authid}", nome, 'memory')
+    provider = layer.dataProvider()
+    provider.addAttributes(fields.toList())
+    layer.updateFields()
+    provider.addFeatures(features)
+    layer.updateExtents()
+    return layer
+
+
+def abrir_camada_gpkg(caminho, nome):
+    """Camada de um GeoPackage"""
+    layer = QgsVectorLayer(f"{caminho}|layername={nome}", nome, 'ogr')
+    if not layer.isValid():
+        raise Exception(f"Camada '{nome}' não encontrada em {caminho}")
+    return layer
+
+
+def uri_postgis(conexao, tabela, coluna_geometria='geom', chave=''):
+    """
+    URI de uma tabela PostGIS
+
+    Args:
+        conexao: String de conexão libpq ("host=... dbname=... user=..." ou "service=...")
+        tabela: 'esquema.tabela' ou 'tabela' (esquema public)
+    """
+    esquema, _, nome = tabela.rpartition('.')
+    uri = QgsDataSourceUri(conexao)
+    uri.setDataSource(esquema or 'public', nome, coluna_geometria, '', chave)
+    return uri
+
+
+def abrir_camada_postgis(conexao, tabela, coluna_geometria='geom'):
+    """Camada de uma tabela PostGIS"""
+    layer = QgsVectorLayer(uri_postgis(conexao, tabela, coluna_geometria).uri(False), tabela, 'postgres')
+    if not layer.isValid():
+        raise Exception(f"Tabela '{tabela}' não encontrada ou inacessível")
+    return layer
+
+
+def gravar_lotes_gpkg(lotes, caminho, crs_authid, nome='lotes', anexar=False):
+    """
+    Grava os lotes em uma camada de GeoPackage
+
+    Com anexar=True acrescenta à camada, se ela já existir; senão a substitui.
+    """
+    opcoes = QgsVectorFileWriter.SaveVectorOptions()
+    opcoes.driverName = 'GPKG'
+    opcoes.layerName = nome
+    if not os.path.exists(caminho):
+        opcoes.actionOnExistingFile = QgsVectorFileWriter.CreateOrOverwriteFile
+    elif anexar and QgsVectorLayer(f"{caminho}|layername={nome}", nome, 'ogr').isValid():
+        opcoes.actionOnExistingFile = QgsVectorFileWriter.AppendToLayerNoNewFields
+    else:
+        opcoes.actionOnExistingFile = QgsVectorFileWriter.CreateOrOverwriteLayer
+    writer = QgsVectorFileWriter.create(
+        caminho, InMemoryPipeline.campos_lote(), QgsWkbTypes.Polygon,
+        QgsCoordinateReferenceSystem(crs_authid), QgsCoordinateTransformContext(), opcoes
+    )
+    if writer.hasError() != QgsVectorFileWriter.NoError:
+        raise Exception(f"Erro ao gravar {nome}: {writer.errorMessage()}")
+    if not writer.addFeatures(lotes):
+        raise Exception(f"Erro ao gravar {nome}: {writer.errorMessage()}")
+    del writer
+
+
+def remover_lotes_gpkg(caminho, quadra_ids, nome='lotes'):
+    """
+    Remove da camada do GeoPackage os lotes das quadras (campo id_quadra)
+
+    Returns:
+        int: Lotes removidos (0 se o arquivo ou a camada ainda não existem)
+    """
+    if not quadra_ids or not os.path.exists(caminho):
+        return 0
+    layer = QgsVectorLayer(f"{caminho}|layername={nome}", nome, 'ogr')
+    if not layer.isValid():
+        return 0
+    valores = ', '.join(QgsExpression.quotedValue(i) for i in quadra_ids)
+    request = QgsFeatureRequest().setFilterExpression(f'"id_quadra" IN ({valores})')
+    request.setFlags(QgsFeatureRequest.NoGeometry)
+    ids = [lote.id() for lote in layer.getFeatures(request)]
+    if ids and not layer.dataProvider().deleteFeatures(ids):
+        raise Exception(f"Erro ao remover lotes de {nome}: {'; '.join(layer.dataProvider().errors()[-3:])}")
+    return len(ids)
+
+
+def gravar_lotes_postgis(lotes, conexao, tabela=f"{ESQUEMA_LOTES}.{TABELA_LOTES}", quadras_por_commit=0,
+                         substituir=None):
+    """
+    Acrescenta os lotes à tabela em uma transação
+
+    Com psycopg2, COPY (CargaLotes) com um commit a cada quadras_por_commit
+    quadras (0 = um só); sem ele, uma única chamada ao
+    provider, copiando os atributos por nome. Campos da tabela que os lotes
+    não têm (ex.: a chave primária) recebem o valor padrão do banco.
+
+    Os lotes já gravados das quadras em `substituir` são removidos antes: no
+    COPY, na mesma transação; pelo provider, em um comando anterior.
+    """
+    if carga_lotes.disponivel():
+        return CargaLotes(conexao, tabela, SRID_LOTES).gravar(lotes, quadras_por_commit, substituir)
+
+    if substituir:
+        ids = ','.join(str(int(quadra_id)) for quadra_id in substituir)
+        esquema = tabela.rpartition('.')[0] or ESQUEMA_LOTES
+        banco = QgsProviderRegistry.instance().providerMetadata('postgres').createConnection(conexao, {})
+        banco.executeSql(remocao_lotes.sql_remocao(f"ARRAY[{ids}]::bigint[]", esquema))
+
+    uri = uri_postgis(conexao, tabela, chave='id')
+    uri.setSrid(str(SRID_LOTES))
+    uri.setWkbType(QgsWkbTypes.Polygon)
+    layer = QgsVectorLayer(uri.uri(False), tabela, 'postgres')
+    if not layer.isValid():
+        raise Exception(f"Tabela '{tabela}' não encontrada ou inacessível")
+
+    provider = layer.dataProvider()
+    destino = provider.fields()
+    padroes = [provider.defaultValueClause(i) for i in range(destino.count())]
+    feicoes = []
+    for lote in lotes:
+        feicao = QgsFeature(destino)
+        feicao.setGeometry(lote.geometry())
+        nomes = lote.fields().names()
+        for indice, campo in enumerate(destino):
+            if campo.name() in nomes:
+                feicao.setAttribute(indice, lote[campo.name()])
+            elif padroes[indice]:
+                feicao.setAttribute(indice, padroes[indice])
+        feicoes.append(feicao)
+
+    inicio = time.perf_counter()
+    ok, _ = provider.addFeatures(feicoes)
+    if not ok:
+        raise Exception(f"Erro ao gravar lotes em {tabela}: {'; '.join(provider.errors()[-3:])}")
+    return {'metodo': 'provider', 'linhas': len(feicoes), 'duracao_s': round(time.perf_counter() - inicio, 3)}
@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline de poligonização em memória
+Executa extração, extensão, poligonização, limpeza, filtro de área e
+atributos em uma única passagem sobre objetos QgsGeometry, sem processing.run
+"""
+import math
+
+from qgis.PyQt.QtCore import QVariant, QDate
+from qgis.core import (QgsGeometry, QgsFeature, QgsField, QgsFields, QgsVectorLayer,
+                       QgsPointXY, QgsExpressionContextUtils, QgsMultiLineString, QgsWkbTypes,
+                       QgsSpatialIndex)
+
+from .profiler import PipelineProfiler
+from . import vetorizado
+
+
+# Mesmos parâmetros usados pelo pipeline de processing
+PARAMETROS_PADRAO = {
+    'distancia_extensao': 0.3,
+    'tolerancia_simplificacao': 0.001,
+    'tolerancia_ajuste': 0.0001,
+    'razao_area': 0.95
+}
+
+# (campo na quadra, campo no lote)
+CAMPOS_QUADRA = [
+    ('id_localidade', 'id_localidade'),
+    ('id_setor', 'id_setor'),
+    ('id_bairro', 'id_bairro'),
+    ('id', 'id_quadra'),
+    ('ins_quadra', 'ins_quadra')
+]
+
+
+class InMemoryPipeline:
+    """Pipeline de poligonização em passagem única sobre geometrias em memória"""
+
+    @staticmethod
+    def parametros(parametros=None):
+        """Retorna parâmetros padrão sobrescritos pelos informados"""
+        resultado = dict(PARAMETROS_PADRAO)
+        resultado.update(parametros or {})
+        return resultado
+
+    @staticmethod
+    def campos_lote():
+        """Campos da camada de lotes (equivalentes ao refactorfields)"""
+        fields = QgsFields()
+        for _, nome in CAMPOS_QUADRA:
+            fields.append(QgsField(nome, QVariant.LongLong))
+        fields.append(QgsField('sit_imovel', QVariant.String))
+        fields.append(QgsField('usuario', QVariant.String))
+        fields.append(QgsField('data_atual', QVariant.Date))
+        return fields
+
+    @staticmethod
+    def contexto_execucao():
+        """Calcula usuário e data uma única vez por execução"""
+        escopo = QgsExpressionContextUtils.globalScope()
+        usuario = f"{escopo.variable('user_account_name')} - {escopo.variable('user_full_name')}"
+        return {'usuario': usuario, 'data_atual': QDate.currentDate()}
+
+    # ==================== ETAPAS ====================
+
+    @staticmethod
+    def indices_dentro(linhas, quadra_geom):
+        """Índices das linhas que intersectam a quadra"""
+        engine = QgsGeometry.createGeometryEngine(quadra_geom.constGet())
+        engine.prepareGeometry()
+        return [i for i, g in enumerate(linhas) if g and not g.isEmpty() and engine.intersects(g.constGet())]
+
+    @staticmethod
+    def extrair_linhas(linhas, quadra_geom):
+        """Mantém apenas as linhas que intersectam a quadra"""
+        return [linhas[i] for i in InMemoryPipeline.indices_dentro(linhas, quadra_geom)]
+
+    @staticmethod
+    def estender_linhas(linhas, distancia):
+        """Estende as linhas nas duas extremidades (vetorizado com NumPy quando compensa)"""
+        if vetorizado.disponivel() and len(linhas) >= vetorizado.LIMIAR_VETORIZACAO:
+            return vetorizado.estender_linhas(linhas, distancia)
+        return [g.extendLine(distancia, distancia) for g in linhas]
+
+    @staticmethod
+    def bordas_da_quadra(quadra_geom):
+        """Converte os anéis da quadra em linhas (cópia direta dos anéis, sem GEOS)"""
+        poligono = quadra_geom.constGet()
+        if not QgsWkbTypes.isMultiType(quadra_geom.wkbType()):
+            poligonos = [poligono]
+        else:
+            poligonos = [poligono.geometryN(i) for i in range(poligono.numGeometries())]
+
+        aneis = QgsMultiLineString()
+        for parte in poligonos:
+            if parte.exteriorRing() is None:
+                continue
+            for anel in [parte.exteriorRing()] + [parte.interiorRing(i) for i in range(parte.numInteriorRings())]:
+                # Anéis curvos não cabem em QgsMultiLineString: usa o boundary do GEOS
+                if not aneis.addGeometry(anel.clone()):
+                    return QgsGeometry(poligono.boundary())
+        return QgsGeometry(aneis)
+
+    @staticmethod
+    def simplificar(linhas, tolerancia):
+        """Simplifica as linhas (Douglas-Peucker por distância)"""
+        return [g.simplify(tolerancia) for g in linhas]
+
+    @staticmethod
+    def poligonizar(linhas):
+        """Une, noda e poligoniza as linhas"""
+        if not linhas:
+            return []
+        uniao = QgsGeometry.unaryUnion(linhas)
+        poligonos = QgsGeometry.polygonize([uniao])
+        if poligonos.isNull() or poligonos.isEmpty():
+            return []
+        return poligonos.asGeometryCollection()
+
+    # ==================== NODAGEM ÚNICA ====================
+
+    @staticmethod
+    def _ponta_na_rede(ponta, vizinho, rede, indice, propria, alcance, tolerancia):
+        """
+        Novo vértice final: primeiro cruzamento com a rede em até `alcance` na direção da ponta
+
+        Só as geometrias da rede que o índice espacial aponta perto da ponta ou
+        do raio são testadas; `propria` (a própria linha) fica de fora.
+        """
+        ponto = QgsGeometry.fromPointXY(ponta)
+        perto = ponto.boundingBox().buffered(tolerancia)
+        if any(i != propria and ponto.distance(rede[i]) <= tolerancia for i in indice.intersects(perto)):
+            return ponta
+
+        dx, dy = ponta.x() - vizinho.x(), ponta.y() - vizinho.y()
+        comprimento = math.hypot(dx, dy)
+        if comprimento == 0:
+            return ponta
+        raio = QgsGeometry.fromPolylineXY([
+            ponta, QgsPointXY(ponta.x() + dx / comprimento * alcance, ponta.y() + dy / comprimento * alcance)
+        ])
+
+        melhor, menor = ponta, None
+        for i in indice.intersects(raio.boundingBox()):
+            if i == propria:
+                continue
+            for v in raio.intersection(rede[i]).vertices():
+                distancia = math.hypot(v.x() - ponta.x(), v.y() - ponta.y())
+                if distancia > tolerancia and (menor is None or distancia < menor):
+                    melhor, menor = QgsPointXY(v.x(), v.y()), distancia
+        return melhor
+
+    @staticmethod
+    def fechar_pontas(linhas, borda, alcance, tolerancia=1e-6):
+        """
+        Prolonga cada ponta solta até a primeira linha ou borda a até `alcance`
+
+        Diferente de estender_linhas, a ponta para exatamente no cruzamento:
+        não sobra trecho para fora nem cruza a linha vizinha. Pontas que já
+        tocam a rede e pontas sem nada ao alcance ficam como estão. As pontas
+        são levadas até as linhas vizinhas originais (não às já prolongadas),
+        então o resultado não depende da ordem das linhas. Um índice espacial
+        da rede, montado uma vez, limita os testes às geometrias próximas.
+        """
+        rede = [borda] + list(linhas)
+        indice = QgsSpatialIndex()
+        for i, geom in enumerate(rede):
+            indice.addFeature(i, geom.boundingBox())
+
+        resultado = []
+        for posicao, geom in enumerate(linhas):
+            propria = posicao + 1
+            multi = geom.isMultipart()
+            partes = geom.asMultiPolyline() if multi else [geom.asPolyline()]
+            novas = []
+            for pontos in partes:
+                pontos = list(pontos)
+                if len(pontos) >= 2:
+                    pontos[0] = InMemoryPipeline._ponta_na_rede(
+                        pontos[0], pontos[1], rede, indice, propria, alcance, tolerancia
+                    )
+                    pontos[-1] = InMemoryPipeline._ponta_na_rede(
+                        pontos[-1], pontos[-2], rede, indice, propria, alcance, tolerancia
+                    )
+                novas.append(pontos)
+            resultado.append(QgsGeometry.fromMultiPolylineXY(novas) if multi else QgsGeometry.fromPolylineXY(novas[0]))
+        return resultado
+
+    @staticmethod
+    def nodar(linhas, quadra_geom, borda):
+        """
+        Recorta as linhas na quadra e noda com a borda
+
+        Um recorte (todas as linhas de uma vez) e uma unaryUnion: o resultado
+        já tem nós em todos os cruzamentos e vai direto para polygonize.
+        """
+        if not linhas:
+            return borda
+        recortadas = QgsGeometry.collectGeometry(linhas).intersection(quadra_geom)
+        return QgsGeometry.unaryUnion([recortadas, borda])
+
+    @staticmethod
+    def poligonizar_nodado(rede):
+        """Poligoniza uma rede já nodada (sem nova união)"""
+        poligonos = QgsGeometry.polygonize([rede])
+        if poligonos.isNull() or poligonos.isEmpty():
+            return []
+        return poligonos.asGeometryCollection()
+
+    @staticmethod
+    def ajustar_a_grade(poligonos, tolerancia):
+        """Lista de ajustar_a_grade_fluxo"""
+        return list(InMemoryPipeline.ajustar_a_grade_fluxo(poligonos, tolerancia))
+
+    @staticmethod
+    def ajustar_a_grade_fluxo(poligonos, tolerancia):
+        """
+        Ajusta os vértices a uma grade de precisão e remove duplicados em uma passagem
+
+        Cada vértice vai para a célula (round(x / tolerancia), round(y / tolerancia));
+        um mapa de hash guarda o ponto canônico de cada célula, então vértices
+        compartilhados por lotes vizinhos ficam com coordenadas idênticas e o
+        resultado é repetível bit a bit. Vértices consecutivos na mesma célula
+        são descartados e anéis degenerados removidos. O ajuste pode colapsar
+        ou autointersectar um polígono (vértices quase coincidentes): o que
+        não passa em isGeosValid é reparado com makeValid, mantendo só as
+        partes poligonais de área positiva; um polígono simples repartido
+        pelo reparo sai como polígonos separados.
+        """
+        escala = 1.0 / tolerancia
+        pontos = {}
+
+        def ajustar_anel(anel):
+            novo, ultima = [], None
+            for vertice in anel:
+                celula = (round(vertice.x() * escala), round(vertice.y() * escala))
+                if celula == ultima:
+                    continue
+                ponto = pontos.get(celula)
+                if ponto is None:
+                    ponto = QgsPointXY(celula[0] / escala, celula[1] / escala)
+                    pontos[celula] = ponto
+                novo.append(ponto)
+                ultima = celula
+            if len(novo) > 1 and novo[0] != novo[-1]:
+                novo.append(novo[0])
+            return novo if len(novo) >= 4 else None
+
+        for geom in poligonos:
+            partes = geom.asMultiPolygon() if geom.isMultipart() else [geom.asPolygon()]
+            novas_partes = []
+            for parte in partes:
+                aneis = [ajustar_anel(anel) for anel in parte]
+                if not aneis or aneis[0] is None:
+                    continue
+                novas_partes.append([anel for anel in aneis if anel is not None])
+
+            if not novas_partes:
+                continue
+            if geom.isMultipart():
+                nova = QgsGeometry.fromMultiPolygonXY(novas_partes)
+            else:
+                nova = QgsGeometry.fromPolygonXY(novas_partes[0])
+            if nova.isGeosValid():
+                if nova.area() > 0:
+                    yield nova
+                continue
+
+            reparadas = [
+                parte for parte in nova.makeValid().asGeometryCollection()
+                if parte.type() == QgsWkbTypes.PolygonGeometry and parte.area() > 0
+            ]
+            if not reparadas:
+                continue
+            if geom.isMultipart():
+                yield QgsGeometry.collectGeometry(reparadas)
+            else:
+                yield from reparadas
+
+    @staticmethod
+    def filtrar_lotes(poligonos, quadra_geom, razao_area):
+        """Mantém os polígonos internos à quadra, descartando o equivalente à quadra inteira"""
+        engine = QgsGeometry.createGeometryEngine(quadra_geom.constGet())
+        engine.prepareGeometry()
+        limite = quadra_geom.area() * razao_area
+        return [
+            g for g in poligonos
+            if g.area() < limite and engine.contains(g.pointOnSurface().constGet())
+        ]
+
+    @staticmethod
+    def valores_lote(quadra_feature, contexto):
+        """Atributos de um lote da quadra, na ordem de campos_lote()"""
+        nomes_quadra = quadra_feature.fields().names()
+        valores_quadra = [
+            quadra_feature[campo] if campo in nomes_quadra else None
+            for campo, _ in CAMPOS_QUADRA
+        ]
+        return valores_quadra + ['Habitado', contexto['usuario'], contexto['data_atual']]
+
+    @staticmethod
+    def carimbar_atributos(poligonos, quadra_feature, contexto, fields=None):
+        """Cria as feições de lote com os atributos da quadra"""
+        fields = fields or InMemoryPipeline.campos_lote()
+        valores = InMemoryPipeline.valores_lote(quadra_feature, contexto)
+
+        lotes = []
+        for geom in poligonos:
+            lote = QgsFeature(fields)
+            lote.setGeometry(geom)
+            lote.setAttributes(list(valores))
+            lotes.append(lote)
+        return lotes
+
+    # ==================== EXECUÇÃO ====================
+
+    @staticmethod
+    def executar(quadra_feature, linhas, parametros=None, contexto=None, perfil=None, nodagem=False,
+                 estendidas=None):
+        """
+        Executa o pipeline completo para uma quadra
+
+        Args:
+            quadra_feature: Feição da quadra
+            linhas: Geometrias das linhas de corte candidatas
+            parametros: Sobrescreve PARAMETROS_PADRAO (opcional); normalmente
+                DefinicaoPipeline.parametros()
+            contexto: Resultado de contexto_execucao() (opcional)
+            perfil: PipelineProfiler para medir as etapas (opcional)
+            nodagem: Caminho de nodagem única (motor 'geos'): pontas soltas vão
+                até a rede (alcance = distancia_extensao), as linhas são recortadas
+                na quadra e nodadas com a borda em uma união, sem simplificação
+            estendidas: Linhas já estendidas, na ordem de `linhas` (opcional),
+                normalmente de LinhasCorteIndex.estendidas() para a execução inteira
+
+        Returns:
+            dict: {'lotes': [QgsFeature], 'linhas_estendidas': [QgsGeometry]}
+        """
+        p = InMemoryPipeline.parametros(parametros)
+        contexto = contexto or InMemoryPipeline.contexto_execucao()
+        perfil = perfil or PipelineProfiler(ativo=False)
+        quadra_geom = quadra_feature.geometry()
+
+        with perfil.etapa('ExtrairLinhas', linhas) as etapa:
+            dentro = InMemoryPipeline.indices_dentro(linhas, quadra_geom)
+            linhas_dentro = etapa.saida = [linhas[i] for i in dentro]
+
+        if nodagem:
+            borda = InMemoryPipeline.bordas_da_quadra(quadra_geom)
+            linhas_estendidas = linhas_dentro
+            if p['distancia_extensao'] > 0:
+                with perfil.etapa('FecharPontas', linhas_dentro) as etapa:
+                    linhas_estendidas = etapa.saida = InMemoryPipeline.fechar_pontas(
+                        linhas_dentro, borda, p['distancia_extensao']
+                    )
+            with perfil.etapa('Nodar', linhas_estendidas) as etapa:
+                rede = InMemoryPipeline.nodar(linhas_estendidas, quadra_geom, borda)
+                etapa.saida = [rede]
+            with perfil.etapa('Poligonizar', [rede]) as etapa:
+                poligonos = etapa.saida = InMemoryPipeline.poligonizar_nodado(rede)
+        else:
+            # Parâmetro 0 = etapa desativada na definição do pipeline
+            linhas_estendidas = linhas_dentro
+            if p['distancia_extensao'] > 0 and estendidas is not None:
+                linhas_estendidas = [estendidas[i] for i in dentro]
+            elif p['distancia_extensao'] > 0:
+                with perfil.etapa('EstenderLinhas', linhas_dentro) as etapa:
+                    linhas_estendidas = etapa.saida = InMemoryPipeline.estender_linhas(
+                        linhas_dentro, p['distancia_extensao']
+                    )
+            simplificadas = linhas_estendidas + [InMemoryPipeline.bordas_da_quadra(quadra_geom)]
+            if p['tolerancia_simplificacao'] > 0:
+                with perfil.etapa('Simplificar', simplificadas) as etapa:
+                    simplificadas = etapa.saida = InMemoryPipeline.simplificar(
+                        simplificadas, p['tolerancia_simplificacao']
+                    )
+            with perfil.etapa('Poligonizar', simplificadas) as etapa:
+                poligonos = etapa.saida = InMemoryPipeline.poligonizar(simplificadas)
+        ajustados = poligonos
+        if p['tolerancia_ajuste'] > 0:
+            with perfil.etapa('AjustarGeometrias', poligonos) as etapa:
+                ajustados = etapa.saida = InMemoryPipeline.ajustar_a_grade(poligonos, p['tolerancia_ajuste'])
+        with perfil.etapa('AceitarLotes', ajustados) as etapa:
+            aceitos = etapa.saida = InMemoryPipeline.filtrar_lotes(ajustados, quadra_geom, p['razao_area'])
+        with perfil.etapa('EditarCampos', aceitos) as etapa:
+            lotes = etapa.saida = InMemoryPipeline.carimbar_atributos(aceitos, quadra_feature, contexto)
+
+        return {
+            'lotes': lotes,
+            'linhas_estendidas': linhas_estendidas
+        }
+
+    # ==================== CAMADAS ====================
+
+    @staticmethod
+    def criar_camada_lotes(lotes, crs_authid='EPSG:31984', nome='lotes'):
+        """Cria camada de memória com os lotes gerados"""
+        layer = QgsVectorLayer(f"Polygon?crs={crs_authid}", nome, "memory")
+        provider = layer.dataProvider()
+        provider.addAttributes(InMemoryPipeline.campos_lote().toList())
+        layer.updateFields()
+        provider.addFeatures(lotes)
+        layer.updateExtents()
+        return layer
+
+    @staticmethod
+    def criar_camada_linhas(linhas, crs_authid='EPSG:31984', nome='linhas'):
+        """Cria camada de memória com as linhas estendidas"""
+        layer = QgsVectorLayer(f"MultiLineString?crs={crs_authid}", nome, "memory")
+        features = []
+        for geom in linhas:
+            geom = QgsGeometry(geom)
+            geom.convertToMultiType()
+            feature = QgsFeature()
+            feature.setGeometry(geom)
+            features.append(feature)
+        layer.dataProvider().addFeatures(features)
+        layer.updateExtents()
+        return layer
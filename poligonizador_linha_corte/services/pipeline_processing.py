@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline de poligonização sobre camadas (processing + etapas em fluxo)
+Executa a definição do pipeline sobre as quadras selecionadas de uma camada;
+não depende da interface do plugin
+"""
+import itertools
+
+from qgis.core import (QgsProcessingException, QgsCoordinateReferenceSystem, QgsVectorLayer,
+                       QgsFeatureRequest, QgsFeature, QgsGeometry, QgsSpatialIndex)
+import processing
+
+from .pipeline_memoria import InMemoryPipeline
+from .profiler import PipelineProfiler
+from .definicao_pipeline import DefinicaoPipeline, ETAPAS
+from .armazenamento import ArmazenamentoIntermediario
+from . import vetorizado
+
+
+class ProcessingPipeline:
+    """Pipeline de processamento de poligonização"""
+
+    @staticmethod
+    def aceitar_lotes(poligonos, quadra_layer, razao_area):
+        """
+        Atribui cada polígono à quadra que contém seu ponto interior e aceita só
+        os menores que razao_area × área da quadra (descarta a quadra inteira)
+
+        Polígonos fora de qualquer quadra selecionada (vazios entre quadras
+        vizinhas) são descartados. Consome e produz em fluxo.
+
+        Yields:
+            tuple: (quadra, geometria aceita)
+        """
+        quadras = {quadra.id(): quadra for quadra in quadra_layer.getSelectedFeatures()}
+        indice = QgsSpatialIndex()
+        for quadra in quadras.values():
+            indice.addFeature(quadra)
+
+        limites = {}
+        for geom in poligonos:
+            ponto = geom.pointOnSurface()
+            for fid in sorted(indice.intersects(ponto.boundingBox())):
+                quadra = quadras[fid]
+                if not quadra.geometry().contains(ponto):
+                    continue
+                if fid not in limites:
+                    limites[fid] = quadra.geometry().area() * razao_area
+                if geom.area() < limites[fid]:
+                    yield quadra, geom
+                break
+
+    @staticmethod
+    def carimbar_atributos(aceitos, crs_authid, contexto):
+        """Cria a camada de lotes copiando os atributos da quadra, sem expressões aggregate"""
+        fields = InMemoryPipeline.campos_lote()
+        valores = {}
+        lotes = []
+        for quadra, geom in aceitos:
+            if quadra.id() not in valores:
+                valores[quadra.id()] = InMemoryPipeline.valores_lote(quadra, contexto)
+            lote = QgsFeature(fields)
+            lote.setGeometry(geom)
+            lote.setAttributes(list(valores[quadra.id()]))
+            lotes.append(lote)
+        return InMemoryPipeline.criar_camada_lotes(lotes, crs_authid)
+
+    @staticmethod
+    def _iniciar_etapa(feedback, etapa):
+        """Avança a etapa, interrompendo o pipeline se a tarefa foi cancelada"""
+        if feedback.isCanceled():
+            raise QgsProcessingException("Processamento cancelado")
+        feedback.setCurrentStep(etapa)
+
+    @staticmethod
+    def _geometrias(obj):
+        """Geometrias (em fluxo) de uma camada, arquivo, lista ou gerador de geometrias"""
+        if isinstance(obj, str):
+            obj = QgsVectorLayer(obj, 'intermediaria', 'ogr')
+        if isinstance(obj, QgsVectorLayer):
+            return (f.geometry() for f in obj.getFeatures(QgsFeatureRequest().setNoAttributes()))
+        return obj
+
+    @staticmethod
+    def _materializar(geometrias, tipo, crs_authid):
+        """Grava um fluxo de geometrias em uma camada de memória multipart (entrada de processing)"""
+        layer = QgsVectorLayer(f"Multi{tipo}?crs={crs_authid}", 'intermediaria', 'memory')
+        features = []
+        for geom in geometrias:
+            geom = QgsGeometry(geom)
+            geom.convertToMultiType()
+            feature = QgsFeature()
+            feature.setGeometry(geom)
+            features.append(feature)
+        layer.dataProvider().addFeatures(features)
+        return layer
+
+    # ==================== ETAPAS ====================
+    # Cada etapa recebe o estado do pipeline, os parâmetros e o feedback e
+    # devolve a saída, gravada no estado na chave 'saida' de ETAPAS. Etapas
+    # locais (uma geometria por vez) devolvem geradores e não criam camadas;
+    # só materializam as que precisam do conjunto inteiro (processing, poligonizar).
+
+    @staticmethod
+    def _extrair_feicoes(estado, p, feedback):
+        """Extrai as feições selecionadas da quadra"""
+        return processing.run('native:saveselectedfeatures', {
+            'INPUT': estado['quadra_layer'],
+            'OUTPUT': estado['armazenamento'].saida()
+        }, feedback=feedback)['OUTPUT']
+
+    @staticmethod
+    def _linhas_dentro_quadra(estado, p, feedback):
+        """Mantém as linhas que intersectam as quadras"""
+        return processing.run('native:extractbylocation', {
+            'INPUT': estado['linhas'],
+            'INTERSECT': estado['quadras'],
+            'PREDICATE': [0],
+            'OUTPUT': estado['armazenamento'].saida()
+        }, feedback=feedback)['OUTPUT']
+
+    @staticmethod
+    def _estender_linhas(estado, p, feedback):
+        """Estende as linhas nas duas extremidades (em fluxo; em blocos vetorizados com NumPy)"""
+        distancia = p['distancia_extensao']
+        linhas = ProcessingPipeline._geometrias(estado['linhas'])
+        if vetorizado.disponivel():
+            return vetorizado.estender_em_blocos(linhas, distancia)
+        return (g.extendLine(distancia, distancia) for g in linhas)
+
+    @staticmethod
+    def _poligonos_para_linhas(estado, p, feedback):
+        """Bordas das quadras como linhas (em fluxo)"""
+        return (InMemoryPipeline.bordas_da_quadra(g) for g in ProcessingPipeline._geometrias(estado['quadras']))
+
+    @staticmethod
+    def _mesclar_camadas(estado, p, feedback):
+        """Une linhas de corte e bordas das quadras"""
+        # Linhas de corte como ficaram antes da mescla (exibidas ao final);
+        # são poucas, por isso ficam em lista em vez de seguir só em fluxo
+        estado['linhas_corte'] = list(ProcessingPipeline._geometrias(estado['linhas']))
+        return itertools.chain(estado['linhas_corte'], estado['bordas'])
+
+    @staticmethod
+    def _simplificar(estado, p, feedback):
+        """Simplifica as linhas (Douglas-Peucker, em fluxo)"""
+        tolerancia = p['tolerancia_simplificacao']
+        return (g.simplify(tolerancia) for g in ProcessingPipeline._geometrias(estado['linhas']))
+
+    @staticmethod
+    def _poligonizar(estado, p, feedback):
+        """Poligoniza as linhas (precisa do conjunto inteiro: materializa)"""
+        linhas = ProcessingPipeline._materializar(
+            ProcessingPipeline._geometrias(estado['linhas']), 'LineString',
+            estado['quadra_layer'].crs().authid()
+        )
+        return processing.run('native:polygonize', {
+            'INPUT': linhas,
+            'KEEP_FIELDS': False,
+            'OUTPUT': estado['armazenamento'].saida()
+        }, feedback=feedback)['OUTPUT']
+
+    @staticmethod
+    def _ajustar_geometrias(estado, p, feedback):
+        """Ajusta à grade e remove vértices duplicados (em fluxo)"""
+        return InMemoryPipeline.ajustar_a_grade_fluxo(
+            ProcessingPipeline._geometrias(estado['poligonos']), p['tolerancia_ajuste']
+        )
+
+    @staticmethod
+    def _aceitar_lotes(estado, p, feedback):
+        """Descarta o polígono equivalente à quadra"""
+        return ProcessingPipeline.aceitar_lotes(
+            ProcessingPipeline._geometrias(estado['poligonos']), estado['quadra_layer'], p['razao_area']
+        )
+
+    @staticmethod
+    def _editar_campos(estado, p, feedback):
+        """Atributos da quadra, usuário e data"""
+        return ProcessingPipeline.carimbar_atributos(
+            estado['aceitos'], estado['quadra_layer'].crs().authid(), estado['contexto']
+        )
+
+    EXECUTORES = {
+        'ExtrairFeicoes': _extrair_feicoes,
+        'LinhasDentroQuadra': _linhas_dentro_quadra,
+        'EstenderLinhas': _estender_linhas,
+        'PoligonosParaLinhas': _poligonos_para_linhas,
+        'MesclarCamadas': _mesclar_camadas,
+        'Simplificar': _simplificar,
+        'Poligonizar': _poligonizar,
+        'AjustarGeometrias': _ajustar_geometrias,
+        'AceitarLotes': _aceitar_lotes,
+        'EditarCampos': _editar_campos
+    }
+
+    @staticmethod
+    def executar_pipeline_completo(quadra_layer, linhas_layer, conexao_nome, feedback,
+                                   contexto=None, definicao=None, perfil=None, armazenamento=None):
+        """
+        Executa o pipeline de poligonização descrito pela definição
+
+        Todas as quadras selecionadas em quadra_layer passam juntas pelo pipeline;
+        cada lote é atribuído à quadra que contém seu ponto interior.
+        contexto é o resultado de InMemoryPipeline.contexto_execucao(), calculado
+        uma vez por execução; definicao é uma DefinicaoPipeline (padrão: a do
+        plugin) e feedback deve ter definicao.num_etapas passos; perfil é um
+        PipelineProfiler opcional que mede cada etapa; armazenamento é o
+        ArmazenamentoIntermediario das saídas de processing (padrão: memória),
+        limpo ao fim da chamada mesmo em caso de erro ou cancelamento.
+
+        O estado guarda só a saída mais recente de cada tipo; etapas em fluxo
+        devolvem geradores consumidos pela etapa seguinte. O profiler troca
+        esses geradores por iteradores medidos, então o tempo e as contagens
+        de cada etapa em fluxo são atribuídos a ela, no consumo.
+
+        Returns:
+            dict: {'EditarCampos': {'OUTPUT': camada de lotes},
+                   'LinhasCorte': {'OUTPUT': [linhas antes da mescla com as bordas]}}
+        """
+        definicao = definicao or DefinicaoPipeline.padrao()
+        perfil = perfil or PipelineProfiler(ativo=False)
+        p = definicao.parametros()
+        armazenamento = armazenamento or ArmazenamentoIntermediario()
+        estado = {
+            'quadra_layer': quadra_layer,
+            'linhas': linhas_layer,
+            'contexto': contexto or InMemoryPipeline.contexto_execucao(),
+            'armazenamento': armazenamento
+        }
+
+        try:
+            for indice, nome in enumerate(definicao.etapas):
+                ProcessingPipeline._iniciar_etapa(feedback, indice)
+                especificacao = ETAPAS[nome]
+                with perfil.etapa(nome, estado.get(especificacao['entrada'])) as etapa:
+                    etapa.saida = ProcessingPipeline.EXECUTORES[nome].__func__(estado, p, feedback)
+                # Depois do bloco: saída em fluxo já trocada pelo iterador medido
+                estado[especificacao['saida']] = etapa.saida
+
+            return {
+                'EditarCampos': {'OUTPUT': estado['lotes']},
+                'LinhasCorte': {'OUTPUT': estado['linhas_corte']}
+            }
+        finally:
+            # Libera as camadas intermediárias antes de apagar os arquivos
+            estado.clear()
+            armazenamento.limpar()
+
+    @staticmethod
+    def contar_lotes_por_quadra(lotes_layer):
+        """Conta lotes gerados por id_quadra (chave em texto); lotes sem id_quadra não entram"""
+        request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry)
+        request.setSubsetOfAttributes(['id_quadra'], lotes_layer.fields())
+        contagem = {}
+        for lote in lotes_layer.getFeatures(request):
+            valor = lote['id_quadra']
+            if valor is None or (hasattr(valor, 'isNull') and valor.isNull()):
+                continue
+            chave = str(valor)
+            contagem[chave] = contagem.get(chave, 0) + 1
+        return contagem
+
+    @staticmethod
+    def lotes_por_quadra(lotes_layer, quadras):
+        """
+        Agrupa os lotes pela quadra que contém seu ponto interior (regra de aceitar_lotes)
+
+        Não depende dos atributos carimbados: vale para quadras sem id.
+
+        Args:
+            quadras: Lista de (chave, QgsGeometry da quadra)
+
+        Returns:
+            dict: {chave: [QgsFeature]}
+        """
+        indice = QgsSpatialIndex()
+        for posicao, (_, geom) in enumerate(quadras):
+            indice.addFeature(posicao, geom.boundingBox())
+
+        grupos = {}
+        for lote in lotes_layer.getFeatures():
+            ponto = lote.geometry().pointOnSurface()
+            for posicao in sorted(indice.intersects(ponto.boundingBox())):
+                chave, geom = quadras[posicao]
+                if geom.contains(ponto):
+                    grupos.setdefault(chave, []).append(lote)
+                    break
+        return grupos
+
+    @staticmethod
+    def importar_para_banco(output_layer, conexao_nome, feedback):
+        """Importa lotes gerados para o banco de dados"""
+        processing.run('gdal:importvectorintopostgisdatabaseavailableconnections', {
+            'ADDFIELDS': False,
+            'APPEND': True,
+            'A_SRS': QgsCoordinateReferenceSystem('EPSG:31984'),
+            'DATABASE': conexao_nome,
+            'GEOCOLUMN': 'geom',
+            'INPUT': output_layer,
+            'LAUNDER': False,
+            'OVERWRITE': False,
+            'PRECISION': True,
+            'PROMOTETOMULTI': False,
+            'SCHEMA': 'comercial_umc',
+            'TABLE': 'v_lote',
+            'SKIPFAILURES': False
+        }, feedback=feedback)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Pool de sessões PostgreSQL por conexão
+Mantém abertas as sessões psycopg2 entre consultas e entre execuções, para
+não pagar o estabelecimento da conexão (VPN, TLS, autenticação) a cada
+consulta. Sessões ociosas além do limite são fechadas; sessões paradas há
+algum tempo passam por um SELECT 1 antes de serem reutilizadas.
+"""
+from contextlib import contextmanager
+import threading
+import time
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+
+TAMANHO_PADRAO = 4
+OCIOSO_MAXIMO_S = 300
+VERIFICAR_APOS_S = 30
+
+_pools = {}
+_trava_pools = threading.Lock()
+
+
+def disponivel():
+    """Indica se o psycopg2 está instalado"""
+    return psycopg2 is not None
+
+
+def pool(dsn):
+    """Pool compartilhado da string de conexão (criado no primeiro uso)"""
+    with _trava_pools:
+        if dsn not in _pools:
+            _pools[dsn] = PoolSessoes(dsn)
+        return _pools[dsn]
+
+
+def fechar_todos():
+    """Fecha as sessões de todos os pools (descarregamento do plugin)"""
+    with _trava_pools:
+        for p in _pools.values():
+            p.fechar()
+        _pools.clear()
+
+
+class Sessao:
+    """Sessão emprestada do pool; conta as consultas executadas"""
+
+    def __init__(self, conexao, pool):
+        self.conexao = conexao
+        self._pool = pool
+
+    def executar(self, sql, parametros=None):
+        """Executa um comando e retorna as linhas (lista vazia se não houver resultado)"""
+        with self.conexao.cursor() as cursor:
+            cursor.execute(sql, parametros)
+            self._pool._contar('consultas')
+            return cursor.fetchall() if cursor.description else []
+
+    def copiar(self, sql, arquivo):
+        """COPY ... FROM STDIN a partir de um arquivo (ou StringIO); retorna as linhas copiadas"""
+        with self.conexao.cursor() as cursor:
+            cursor.copy_expert(sql, arquivo)
+            self._pool._contar('consultas')
+            return cursor.rowcount
+
+    def commit(self):
+        self.conexao.commit()
+
+    def rollback(self):
+        self.conexao.rollback()
+
+
+class PoolSessoes:
+    """Sessões psycopg2 reutilizáveis para uma string de conexão"""
+
+    def __init__(self, dsn, tamanho=TAMANHO_PADRAO, ocioso_maximo_s=OCIOSO_MAXIMO_S,
+                 verificar_apos_s=VERIFICAR_APOS_S):
+        """
+        Args:
+            dsn: String de conexão libpq
+            tamanho: Máximo de sessões ociosas mantidas
+            ocioso_maximo_s: Sessões ociosas por mais tempo são fechadas
+            verificar_apos_s: Sessões ociosas por mais tempo passam por SELECT 1
+
+        Raises:
+            Exception: psycopg2 não instalado
+        """
+        if psycopg2 is None:
+            raise Exception("psycopg2 não está instalado")
+        self.dsn = dsn
+        self.tamanho = tamanho
+        self.ocioso_maximo_s = ocioso_maximo_s
+        self.verificar_apos_s = verificar_apos_s
+        self._ociosas = []  # [(conexao, instante em que foi devolvida)]
+        self._trava = threading.Lock()
+        self._contadores = {'abertas': 0, 'reutilizadas': 0, 'descartadas': 0, 'consultas': 0}
+
+    def _contar(self, nome, quantidade=1):
+        with self._trava:
+            self._contadores[nome] += quantidade
+
+    def _saudavel(self, conexao, ociosa_s):
+        """Sessão ainda utilizável (SELECT 1 só se ficou parada por algum tempo)"""
+        if conexao.closed:
+            return False
+        if ociosa_s < self.verificar_apos_s:
+            return True
+        try:
+            with conexao.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conexao.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _descartar(self, conexao):
+        self._contar('descartadas')
+        try:
+            conexao.close()
+        except Exception:
+            pass
+
+    def _emprestar(self):
+        agora = time.monotonic()
+        while True:
+            with self._trava:
+                if not self._ociosas:
+                    break
+                conexao, devolvida = self._ociosas.pop()
+            ociosa_s = agora - devolvida
+            if ociosa_s <= self.ocioso_maximo_s and self._saudavel(conexao, ociosa_s):
+                self._contar('reutilizadas')
+                return conexao
+            self._descartar(conexao)
+
+        conexao = psycopg2.connect(self.dsn)
+        self._contar('abertas')
+        return conexao
+
+    def _devolver(self, conexao):
+        if conexao.closed:
+            self._contar('descartadas')
+            return
+        try:
+            # Nada pendente volta ao pool: o que não foi confirmado é desfeito
+            conexao.rollback()
+        except Exception:
+            self._descartar(conexao)
+            return
+        with self._trava:
+            if len(self._ociosas) < self.tamanho:
+                self._ociosas.append((conexao, time.monotonic()))
+                return
+        self._descartar(conexao)
+
+    @contextmanager
+    def sessao(self):
+        """
+        Empresta uma sessão pelo bloco with
+
+        O chamador confirma com sessao.commit(); ao sair do bloco, o que não
+        foi confirmado é desfeito e a sessão volta ao pool.
+        """
+        conexao = self._emprestar()
+        try:
+            yield Sessao(conexao, self)
+        finally:
+            self._devolver(conexao)
+
+    def estatisticas(self):
+        """Contadores de sessões abertas, reutilizadas, descartadas e consultas executadas"""
+        with self._trava:
+            estatisticas = dict(self._contadores)
+            estatisticas['ociosas'] = len(self._ociosas)
+        return estatisticas
+
+    def fechar(self):
+        """Fecha as sessões ociosas"""
+        with self._trava:
+            ociosas, self._ociosas = self._ociosas, []
+        for conexao, _ in ociosas:
+            self._descartar(conexao)
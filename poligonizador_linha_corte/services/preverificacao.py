@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Pré-verificação geométrica das quadras
+Antes do pipeline, confere se as linhas de corte (estendidas e recortadas na
+quadra) formam ao menos uma partição fechada com a borda. Quadras que não
+dividem são descartadas com o motivo, sem pagar o pipeline inteiro.
+"""
+import math
+import sys
+import traceback
+
+from qgis.core import QgsGeometry, QgsPointXY, QgsWkbTypes
+
+from .pipeline_memoria import InMemoryPipeline
+
+
+# Folga mínima para considerar que uma ponta toca a borda ou outra linha
+TOLERANCIA_MINIMA = 1e-6
+
+
+def _partes(geom):
+    """
+    Listas de QgsPointXY de cada parte linear da geometria
+
+    O recorte pode devolver pontos ou coleções mistas (linha que só toca a
+    borda); apenas as partes lineares interessam.
+    """
+    if geom is None or geom.isNull() or geom.isEmpty():
+        return []
+    partes = []
+    for parte in geom.asGeometryCollection():
+        if parte.type() != QgsWkbTypes.LineGeometry:
+            continue
+        polilinhas = parte.asMultiPolyline() if parte.isMultipart() else [parte.asPolyline()]
+        partes.extend(list(p) for p in polilinhas if len(p) >= 2)
+    return partes
+
+
+def _distintos(pontos, tolerancia):
+    """Pontos a mais de `tolerancia` uns dos outros"""
+    resultado = []
+    for ponto in pontos:
+        if all(math.hypot(ponto.x() - o.x(), ponto.y() - o.y()) > tolerancia for o in resultado):
+            resultado.append(ponto)
+    return resultado
+
+
+def classificar_quadra(quadra_geom, linhas, parametros=None):
+    """
+    Indica se as linhas de corte conseguem dividir a quadra
+
+    Uma cadeia de linhas conectadas divide a quadra se toca a borda em dois
+    pontos distintos ou se fecha um anel dentro dela (linha que se cruza, dois
+    trechos que se cruzam duas vezes, ciclo entre trechos). Custa uma
+    extensão, um recorte e testes de distância entre as poucas linhas da quadra.
+
+    Args:
+        quadra_geom: QgsGeometry da quadra
+        linhas: Geometrias das linhas de corte que intersectam a quadra
+        parametros: Parâmetros do pipeline (distancia_extensao, tolerancia_simplificacao)
+
+    Returns:
+        str: Motivo para ignorar a quadra, ou None se ela pode ser dividida
+    """
+    p = InMemoryPipeline.parametros(parametros)
+    tolerancia = max(p['tolerancia_simplificacao'], TOLERANCIA_MINIMA)
+
+    linhas = [g for g in linhas if g is not None and not g.isNull() and not g.isEmpty()]
+    if not linhas:
+        return 'Sem linhas de corte'
+    if p['distancia_extensao'] > 0:
+        linhas = InMemoryPipeline.estender_linhas(linhas, p['distancia_extensao'])
+
+    recortadas = QgsGeometry.collectGeometry(linhas).intersection(quadra_geom)
+    trechos = [QgsGeometry.fromPolylineXY(pontos) for pontos in _partes(recortadas)]
+    if not trechos:
+        return 'Linhas fora da quadra'
+
+    borda = InMemoryPipeline.bordas_da_quadra(quadra_geom)
+
+    # Trecho que cruza a si mesmo fecha uma área
+    if any(not t.isSimple() for t in trechos):
+        return None
+
+    # Componentes conectados (união-busca sobre os trechos que se tocam); uma
+    # ligação entre trechos já conectados fecha um ciclo, que pode ser um lote
+    # interno, assim como dois trechos que se tocam em dois pontos distintos
+    pai = list(range(len(trechos)))
+
+    def raiz(i):
+        while pai[i] != i:
+            pai[i] = pai[pai[i]]
+            i = pai[i]
+        return i
+
+    caixas = [t.boundingBox().buffered(tolerancia) for t in trechos]
+    for i in range(len(trechos)):
+        for j in range(i + 1, len(trechos)):
+            if caixas[i].intersects(caixas[j]) and trechos[i].distance(trechos[j]) <= tolerancia:
+                if raiz(i) == raiz(j):
+                    return None
+                cruzamentos = [QgsPointXY(v.x(), v.y()) for v in trechos[i].intersection(trechos[j]).vertices()]
+                if len(_distintos(cruzamentos, tolerancia)) >= 2:
+                    return None
+                pai[raiz(i)] = raiz(j)
+
+    contatos = {}
+    folga_minima = None
+    for indice, trecho in enumerate(trechos):
+        pontos = trecho.asPolyline()
+        if math.hypot(pontos[0].x() - pontos[-1].x(), pontos[0].y() - pontos[-1].y()) <= tolerancia:
+            return None  # Anel fechado dentro da quadra
+
+        # Toques no meio do trecho (linha tangente à borda) e pontas sobre a borda
+        toques = [QgsPointXY(v.x(), v.y()) for v in trecho.intersection(borda).vertices()]
+        for ponta in (pontos[0], pontos[-1]):
+            geom_ponta = QgsGeometry.fromPointXY(ponta)
+            distancia = geom_ponta.distance(borda)
+            if distancia <= tolerancia:
+                toques.append(ponta)
+            elif folga_minima is None or distancia < folga_minima:
+                # Ponta apoiada em outra linha não é ponta solta
+                apoiada = any(
+                    outro != indice and trechos[outro].distance(geom_ponta) <= tolerancia
+                    for outro in range(len(trechos))
+                )
+                if not apoiada:
+                    folga_minima = distancia
+        contatos.setdefault(raiz(indice), []).extend(toques)
+
+    if any(len(_distintos(pontos, tolerancia)) >= 2 for pontos in contatos.values()):
+        return None
+
+    folga = f" (ponta solta a {folga_minima:.2f} m)" if folga_minima is not None else ''
+    if not any(contatos.values()):
+        return f"Linhas não alcançam a borda{folga}"
+    return f"Linhas tocam a borda em um só ponto{folga}"
+
+
+def preverificar(quadra_geom, linhas, parametros=None, inscricao=None):
+    """
+    classificar_quadra protegida: em caso de erro a quadra segue para o pipeline
+
+    Usada pelo plugin e pelo núcleo; um erro da pré-verificação não pode
+    descartar uma quadra que o pipeline talvez divida.
+
+    Returns:
+        str: Motivo para ignorar a quadra, ou None (pode ser dividida ou erro)
+    """
+    try:
+        return classificar_quadra(quadra_geom, linhas, parametros)
+    except Exception:
+        print(f"Erro na pré-verificação da quadra {inscricao}: {traceback.format_exc()}", file=sys.stderr)
+        return None
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Profiler do pipeline de poligonização
+Mede tempo de parede, tempo de CPU, feições e vértices de entrada/saída de
+cada etapa e grava os registros por quadra e por execução em JSON-lines
+
+Etapas em fluxo devolvem geradores que só trabalham quando a etapa seguinte
+os consome. A saída delas é trocada por um iterador medido: o tempo de cada
+item e a contagem de feições e vértices vão para a etapa que o produziu, e o
+tempo é exclusivo (o que uma etapa passa puxando itens de outra é descontado).
+"""
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import threading
+import time
+
+from qgis.core import QgsFeature, QgsFeatureRequest, QgsVectorLayer
+
+
+def vertices_item(item):
+    """Vértices de uma geometria, feição ou tupla (..., geometria) de uma etapa"""
+    if isinstance(item, tuple):
+        item = item[-1]
+    geom = item.geometry() if isinstance(item, QgsFeature) else item
+    if geom is None or geom.isNull():
+        return 0
+    return geom.constGet().nCoordinates()
+
+
+def contar_feicoes_vertices(obj):
+    """
+    Conta feições e vértices de uma camada (ou caminho de arquivo) ou lista
+    de geometrias/feições
+
+    Geradores (etapas em fluxo) não são contados aqui, pois contá-los os
+    consumiria: a contagem deles é feita pelo iterador medido, no consumo.
+
+    Returns:
+        tuple: (feicoes, vertices) ou (None, None) se obj for None ou gerador
+    """
+    if obj is None or isinstance(obj, Iterator):
+        return None, None
+    if isinstance(obj, str):
+        # Saída de processing gravada em arquivo
+        obj = QgsVectorLayer(obj, 'intermediaria', 'ogr')
+    if isinstance(obj, QgsVectorLayer):
+        itens = (f.geometry() for f in obj.getFeatures(QgsFeatureRequest().setNoAttributes()))
+    else:
+        itens = obj
+
+    feicoes = vertices = 0
+    for item in itens:
+        feicoes += 1
+        vertices += vertices_item(item)
+    return feicoes, vertices
+
+
+class _Etapa:
+    """
+    Medição em andamento; o chamador informa a saída em .saida
+
+    Uma saída em fluxo é trocada ao fim do bloco por um iterador medido:
+    quem consome a etapa deve usar .saida depois do bloco with.
+    """
+
+    def __init__(self):
+        self.saida = None
+
+
+_FIM = object()
+
+
+class _FluxoMedido(Iterator):
+    """Iterador que mede, no consumo, a etapa em fluxo que o produziu"""
+
+    def __init__(self, perfil, iterador, registro):
+        self._perfil = perfil
+        self._iterador = iterador
+        self.registro = registro
+        # Registros das etapas que recebem este fluxo como entrada
+        self.consumidores = []
+
+    def __next__(self):
+        with self._perfil._medir(self.registro):
+            item = next(self._iterador, _FIM)
+        if item is _FIM:
+            raise StopIteration
+        vertices = vertices_item(item)
+        for registro in [self.registro] + self.consumidores:
+            chave = 'saida' if registro is self.registro else 'entrada'
+            registro[f'feicoes_{chave}'] += 1
+            registro[f'vertices_{chave}'] += vertices
+        return item
+
+
+class PipelineProfiler:
+    """Profiler opcional por etapa; inativo, não mede nem grava nada"""
+
+    def __init__(self, caminho_saida=None, ativo=True):
+        """
+        Args:
+            caminho_saida: Arquivo JSON-lines (acrescenta registros)
+            ativo: False cria um profiler nulo
+        """
+        self.caminho_saida = caminho_saida
+        self.ativo = ativo
+        self.execucao = datetime.now().strftime('%Y%m%dT%H%M%S')
+        self.registros = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def _medir(self, registro):
+        """Soma ao registro o tempo exclusivo do bloco (sem o de fluxos medidos consumidos nele)"""
+        pilha = getattr(self._local, 'pilha', None)
+        if pilha is None:
+            pilha = self._local.pilha = []
+        filhos = [0.0, 0.0]
+        pilha.append(filhos)
+        inicio_parede = time.perf_counter()
+        inicio_cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            parede = time.perf_counter() - inicio_parede
+            cpu = time.thread_time() - inicio_cpu
+            pilha.pop()
+            if pilha:
+                pilha[-1][0] += parede
+                pilha[-1][1] += cpu
+            registro['parede_s'] += parede - filhos[0]
+            registro['cpu_s'] += cpu - filhos[1]
+
+    @contextmanager
+    def quadra(self, quadra_id):
+        """Associa as etapas medidas nesta thread a uma quadra"""
+        anterior = getattr(self._local, 'quadra', None)
+        self._local.quadra = quadra_id
+        try:
+            yield
+        finally:
+            self._local.quadra = anterior
+
+    @contextmanager
+    def etapa(self, nome, entrada=None):
+        """
+        Mede uma etapa
+
+        Uso:
+            with perfil.etapa('Poligonizar', entrada) as etapa:
+                ...
+                etapa.saida = resultado
+            proxima = etapa.saida  # iterador medido, se resultado for um gerador
+
+        O tempo é exclusivo: não inclui o que o bloco passa consumindo a
+        saída em fluxo de outra etapa, que é atribuído a ela. A entrada e a
+        saída em fluxo são contadas à medida que são consumidas, e o registro
+        leva 'fluxo': True.
+        """
+        medicao = _Etapa()
+        if not self.ativo:
+            yield medicao
+            return
+
+        registro = {
+            'tipo': 'etapa',
+            'execucao': self.execucao,
+            'quadra': getattr(self._local, 'quadra', None),
+            'etapa': nome,
+            'parede_s': 0.0,
+            'cpu_s': 0.0,
+            'feicoes_entrada': None,
+            'feicoes_saida': None,
+            'vertices_entrada': None,
+            'vertices_saida': None
+        }
+        if isinstance(entrada, _FluxoMedido):
+            registro['feicoes_entrada'] = registro['vertices_entrada'] = 0
+            entrada.consumidores.append(registro)
+        try:
+            with self._medir(registro):
+                yield medicao
+        finally:
+            if not isinstance(entrada, _FluxoMedido):
+                registro['feicoes_entrada'], registro['vertices_entrada'] = contar_feicoes_vertices(entrada)
+            if isinstance(medicao.saida, Iterator):
+                registro['fluxo'] = True
+                registro['feicoes_saida'] = registro['vertices_saida'] = 0
+                medicao.saida = _FluxoMedido(self, medicao.saida, registro)
+            else:
+                registro['feicoes_saida'], registro['vertices_saida'] = contar_feicoes_vertices(medicao.saida)
+            with self._lock:
+                self.registros.append(registro)
+
+    def resumo(self):
+        """Totais por etapa na ordem em que apareceram: [{'etapa', 'parede_s', 'cpu_s', 'chamadas'}]"""
+        totais = {}
+        for registro in self.registros:
+            total = totais.setdefault(registro['etapa'], {
+                'etapa': registro['etapa'], 'parede_s': 0.0, 'cpu_s': 0.0, 'chamadas': 0
+            })
+            total['parede_s'] += registro['parede_s']
+            total['cpu_s'] += registro['cpu_s']
+            total['chamadas'] += 1
+        return list(totais.values())
+
+    def _resumo_quadras(self):
+        quadras = {}
+        for registro in self.registros:
+            if registro['quadra'] is None:
+                continue
+            total = quadras.setdefault(str(registro['quadra']), {
+                'tipo': 'quadra', 'execucao': self.execucao, 'quadra': registro['quadra'],
+                'parede_s': 0.0, 'cpu_s': 0.0
+            })
+            total['parede_s'] += registro['parede_s']
+            total['cpu_s'] += registro['cpu_s']
+        return list(quadras.values())
+
+    def gravar(self):
+        """Acrescenta ao arquivo os registros de etapa, por quadra e da execução"""
+        if not self.ativo or not self.caminho_saida or not self.registros:
+            return
+        execucao = {
+            'tipo': 'execucao',
+            'execucao': self.execucao,
+            'parede_s': sum(r['parede_s'] for r in self.registros),
+            'cpu_s': sum(r['cpu_s'] for r in self.registros),
+            'etapas': self.resumo()
+        }
+        with open(self.caminho_saida, 'a', encoding='utf-8') as arquivo:
+            for registro in self.registros + self._resumo_quadras() + [execucao]:
+                registro = dict(registro, parede_s=round(registro['parede_s'], 6),
+                                cpu_s=round(registro['cpu_s'], 6))
+                arquivo.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Remoção transacional dos lotes de quadras
+Um único comando (CTE com DELETE ... RETURNING) remove slote, cálculo de
+testada e lotes de todas as quadras selecionadas e devolve a contagem por
+quadra: uma ida ao banco para a seleção inteira, ou uma a cada N quadras.
+Com psycopg2 (dependência opcional) o comando é parametrizado e corre em uma
+sessão do pool; sem ele o plugin o envia pelo provider.
+"""
+import traceback
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+from . import pool_sessoes
+
+
+ESQUEMA = 'comercial_umc'
+
+
+def disponivel():
+    """Indica se o psycopg2 está instalado"""
+    return psycopg2 is not None
+
+
+def sql_remocao(ids, esquema=ESQUEMA):
+    """
+    Comando que remove os lotes das quadras e seus dependentes
+
+    Os três DELETEs são irmãos na CTE e veem o mesmo instantâneo: cada um
+    seleciona as linhas pelos ids de lote de `lotes`, não pelo efeito dos
+    outros. As chaves estrangeiras de slote e do cálculo de testada (NO
+    ACTION, não adiáveis) são conferidas no fim do comando, quando os
+    dependentes já foram removidos; com ON DELETE RESTRICT, conferida linha
+    a linha, o comando falharia. v_lote precisa aceitar DELETE em CTE (view
+    atualizável ou trigger INSTEAD OF; regras DO INSTEAD não são aceitas).
+
+    Args:
+        ids: Expressão SQL do array de ids de quadra ('%s' para parâmetro)
+        esquema: Esquema das tabelas de lotes
+
+    Returns:
+        str: SELECT de (id_quadra, lotes removidos) por quadra
+    """
+    return f"""
+        WITH lotes AS (
+            SELECT id FROM {esquema}.v_lote WHERE id_quadra = ANY({ids})
+        ), slote AS (
+            DELETE FROM {esquema}.slote WHERE id_lote IN (SELECT id FROM lotes)
+        ), testada AS (
+            DELETE FROM {esquema}.v_calcular_testada WHERE id_lote IN (SELECT id FROM lotes)
+        ), removidos AS (
+            DELETE FROM {esquema}.v_lote WHERE id IN (SELECT id FROM lotes)
+            RETURNING id_quadra
+        )
+        SELECT id_quadra, COUNT(*) FROM removidos GROUP BY id_quadra
+    """
+
+
+def separar_ids(quadras):
+    """
+    Separa as quadras com id inteiro das demais (nulo ou não numérico)
+
+    Returns:
+        tuple: ([(id inteiro, quadra_info)], [quadra_info com id inválido])
+    """
+    validas, invalidas = [], []
+    for quadra_info in quadras:
+        try:
+            validas.append((int(str(quadra_info['id'])), quadra_info))
+        except (TypeError, ValueError):
+            invalidas.append(quadra_info)
+    return validas, invalidas
+
+
+def registrar_invalidas(relatorio, quadras):
+    """Registra como ignoradas as quadras sem id de quadra utilizável"""
+    for quadra_info in quadras:
+        relatorio['ignoradas'].append({
+            'inscricao': quadra_info['inscricao'],
+            'id': quadra_info['id'],
+            'motivo': 'Id de quadra nulo ou não numérico'
+        })
+
+
+def registrar_contagem(relatorio, quadras, linhas):
+    """Registra no relatório as quadras de um bloco a partir das linhas (id_quadra, removidos)"""
+    contagem = {str(id_quadra): int(removidos) for id_quadra, removidos in linhas}
+    for quadra_info in quadras:
+        removidos = contagem.get(str(quadra_info['id']), 0)
+        if removidos:
+            relatorio['processadas'].append({
+                'inscricao': quadra_info['inscricao'],
+                'id': quadra_info['id'],
+                'lotes_removidos': removidos
+            })
+            relatorio['total_removidos'] += removidos
+        else:
+            relatorio['ignoradas'].append({
+                'inscricao': quadra_info['inscricao'],
+                'id': quadra_info['id'],
+                'motivo': 'Nenhum lote encontrado'
+            })
+
+
+class RemocaoLotes:
+    """Remove os lotes de quadras com um comando por bloco de quadras"""
+
+    def __init__(self, dsn, esquema=ESQUEMA):
+        """
+        Args:
+            dsn: String de conexão libpq
+            esquema: Esquema das tabelas de lotes
+
+        Raises:
+            Exception: psycopg2 não instalado
+        """
+        if psycopg2 is None:
+            raise Exception("psycopg2 não está instalado")
+        self.dsn = dsn
+        self.esquema = esquema
+
+    def remover(self, quadras, quadras_por_commit=0, feedback=None):
+        """
+        Remove os lotes das quadras
+
+        Com quadras_por_commit = 0 a seleção inteira é uma transação; com
+        N > 0 cada bloco de N quadras é confirmado separadamente. Uma falha
+        desfaz o bloco em curso e encerra a remoção. O cancelamento é
+        atendido entre blocos; quadras com id nulo ou não numérico são
+        registradas como ignoradas.
+
+        Args:
+            quadras: Lista de dicts {'id', 'inscricao'}
+            quadras_por_commit: Quadras por transação (0 = todas)
+            feedback: QgsFeedback opcional (progresso e cancelamento)
+
+        Returns:
+            dict: {'processadas', 'ignoradas', 'total_removidos', 'commits'}
+        """
+        relatorio = {'processadas': [], 'ignoradas': [], 'total_removidos': 0, 'commits': 0}
+        validas, invalidas = separar_ids(quadras)
+        registrar_invalidas(relatorio, invalidas)
+        passo = quadras_por_commit if quadras_por_commit > 0 else max(len(validas), 1)
+        comando = sql_remocao('%s', self.esquema)
+
+        with pool_sessoes.pool(self.dsn).sessao() as sessao:
+            try:
+                for inicio in range(0, len(validas), passo):
+                    if feedback is not None:
+                        if feedback.isCanceled():
+                            break
+                        feedback.setProgress(100.0 * inicio / len(validas))
+
+                    bloco = validas[inicio:inicio + passo]
+                    linhas = sessao.executar(comando, ([quadra_id for quadra_id, _ in bloco],))
+                    sessao.commit()
+                    relatorio['commits'] += 1
+                    registrar_contagem(relatorio, [quadra_info for _, quadra_info in bloco], linhas)
+            except Exception as e:
+                print(f"Erro na remoção, bloco desfeito: {traceback.format_exc()}")
+                if not sessao.conexao.closed:
+                    sessao.rollback()
+                registradas = {str(item['id']) for item in relatorio['processadas'] + relatorio['ignoradas']}
+                for quadra_info in quadras:
+                    if str(quadra_info['id']) not in registradas:
+                        relatorio['ignoradas'].append({
+                            'inscricao': quadra_info['inscricao'],
+                            'id': quadra_info['id'],
+                            'motivo': f'Não removido (transação desfeita): {str(e)[:50]}'
+                        })
+        return relatorio
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Extensão de linhas vetorizada com NumPy
+Copia as coordenadas de todas as linhas para vetores contíguos, move as
+extremidades em operações sobre os vetores e reconstrói as geometrias uma vez.
+Sem NumPy (dependência opcional) o pipeline usa QgsGeometry.extendLine.
+"""
+from qgis.core import QgsGeometry, QgsLineString, QgsMultiLineString, QgsWkbTypes
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Quantidade mínima de linhas para vetorizar: a cópia para vetores e a
+# reconstrução das geometrias têm custo fixo que só compensa com várias
+# linhas. 64 é uma estimativa conservadora, ainda não medida; o cruzamento
+# real sai de `python -m benchmarks.benchmark_pipeline --vetorizacao`, que
+# compara os dois caminhos e sugere o limiar.
+LIMIAR_VETORIZACAO = 64
+TAMANHO_BLOCO = 4096
+
+
+def disponivel():
+    """Indica se o NumPy está instalado"""
+    return np is not None
+
+
+def _vetorizavel(geom):
+    """Linhas 2D (simples ou multi) não vazias"""
+    if geom is None or geom.isNull() or geom.isEmpty():
+        return False
+    tipo = geom.wkbType()
+    return (QgsWkbTypes.flatType(tipo) in (QgsWkbTypes.LineString, QgsWkbTypes.MultiLineString)
+            and not QgsWkbTypes.hasZ(tipo) and not QgsWkbTypes.hasM(tipo))
+
+
+def _partes(geom):
+    linha = geom.constGet()
+    if QgsWkbTypes.isMultiType(geom.wkbType()):
+        return [linha.geometryN(i) for i in range(linha.numGeometries())]
+    return [linha]
+
+
+def _mover_extremidades(x, y, ancora, vizinho, distancia):
+    """Afasta x/y[ancora] de x/y[vizinho] por distancia (segmentos nulos ficam como estão)"""
+    dx = x[ancora] - x[vizinho]
+    dy = y[ancora] - y[vizinho]
+    comprimento = np.hypot(dx, dy)
+    fator = np.divide(distancia, comprimento, out=np.zeros_like(comprimento), where=comprimento > 0)
+    return x[ancora] + dx * fator, y[ancora] + dy * fator
+
+
+def estender_linhas(linhas, distancia):
+    """
+    Equivalente a [g.extendLine(distancia, distancia) for g in linhas]
+
+    Cada parte tem o primeiro e o último vértice deslocados ao longo do
+    primeiro e do último segmento. Geometrias com Z/M ou que não são linhas
+    seguem pelo caminho por feição.
+    """
+    linhas = list(linhas)
+    resultado = [None] * len(linhas)
+    grupos = []  # (índice da linha, quantidade de partes, multi)
+    xs, ys, tamanhos = [], [], []
+
+    for indice, geom in enumerate(linhas):
+        if not _vetorizavel(geom):
+            resultado[indice] = geom.extendLine(distancia, distancia) if geom is not None else geom
+            continue
+        partes = _partes(geom)
+        for parte in partes:
+            xs.extend(parte.xVector())
+            ys.extend(parte.yVector())
+            tamanhos.append(parte.numPoints())
+        grupos.append((indice, len(partes), QgsWkbTypes.isMultiType(geom.wkbType())))
+
+    if not grupos:
+        return resultado
+
+    x = np.asarray(xs, dtype=float)
+    y = np.asarray(ys, dtype=float)
+    n = np.asarray(tamanhos)
+    fim = np.cumsum(n) - 1
+    inicio = fim - n + 1
+    validas = n >= 2
+
+    inicio_v, fim_v = inicio[validas], fim[validas]
+    # Calcula as duas pontas a partir das coordenadas originais
+    novo_inicio = _mover_extremidades(x, y, inicio_v, inicio_v + 1, distancia)
+    novo_fim = _mover_extremidades(x, y, fim_v, fim_v - 1, distancia)
+    x[inicio_v], y[inicio_v] = novo_inicio
+    x[fim_v], y[fim_v] = novo_fim
+
+    parte = 0
+    for indice, num_partes, multi in grupos:
+        novas = []
+        for _ in range(num_partes):
+            a, b = inicio[parte], fim[parte] + 1
+            novas.append(QgsLineString(x[a:b].tolist(), y[a:b].tolist()))
+            parte += 1
+        if multi:
+            colecao = QgsMultiLineString()
+            for nova in novas:
+                colecao.addGeometry(nova)
+            resultado[indice] = QgsGeometry(colecao)
+        else:
+            resultado[indice] = QgsGeometry(novas[0])
+    return resultado
+
+
+def estender_em_blocos(linhas, distancia, tamanho_bloco=TAMANHO_BLOCO):
+    """Versão em fluxo de estender_linhas: vetoriza blocos de linhas e os devolve um a um"""
+    bloco = []
+    for geom in linhas:
+        bloco.append(geom)
+        if len(bloco) >= tamanho_bloco:
+            yield from estender_linhas(bloco, distancia)
+            bloco = []
+    if bloco:
+        yield from estender_linhas(bloco, distancia)
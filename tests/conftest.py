@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import uuid
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def qgis_app():
+    """QgsApplication sem interface (provedores de dados, camadas de memória)"""
+    pytest.importorskip('qgis.core')
+    from poligonizador_linha_corte.services.nucleo import iniciar_qgis
+    app = iniciar_qgis()
+    yield app
+    app.exitQgis()
+
+
+@pytest.fixture(scope='session')
+def processing(qgis_app):
+    """Framework processing inicializado (algoritmos nativos)"""
+    from qgis.core import QgsApplication
+    plugins = os.path.join(QgsApplication.pkgDataPath(), 'python', 'plugins')
+    if plugins not in sys.path:
+        sys.path.append(plugins)
+    modulo = pytest.importorskip('processing.core.Processing')
+    modulo.Processing.initialize()
+
+
+@pytest.fixture
+def esquema_lotes():
+    """
+    Esquema temporário com lote, a view v_lote e os dependentes slote e v_calcular_testada
+
+    Requer psycopg2 e POLIGONIZADOR_TESTE_DSN (banco com a extensão postgis).
+    """
+    psycopg2 = pytest.importorskip('psycopg2')
+    dsn = os.environ.get('POLIGONIZADOR_TESTE_DSN')
+    if not dsn:
+        pytest.skip('POLIGONIZADOR_TESTE_DSN não definido')
+    from poligonizador_linha_corte.services import pool_sessoes
+
+    nome = f"teste_lotes_{uuid.uuid4().hex[:8]}"
+    conexao = psycopg2.connect(dsn)
+    conexao.autocommit = True
+    with conexao.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA {nome}")
+        cursor.execute(f"""
+            CREATE TABLE {nome}.lote (
+                id serial PRIMARY KEY,
+                id_localidade bigint, id_setor bigint, id_bairro bigint,
+                id_quadra bigint, ins_quadra bigint,
+                sit_imovel text, usuario text, data_atual date,
+                geom geometry(Polygon, 31984)
+            )
+        """)
+        # v_lote é uma view no banco de produção: COPY direto nela é recusado
+        cursor.execute(f"CREATE VIEW {nome}.v_lote AS SELECT * FROM {nome}.lote")
+        # Dependentes com chave estrangeira não adiável, como no banco de produção
+        for tabela in ('slote', 'v_calcular_testada'):
+            cursor.execute(f"CREATE TABLE {nome}.{tabela} "
+                           f"(id serial PRIMARY KEY, id_lote integer NOT NULL REFERENCES {nome}.lote (id))")
+    try:
+        yield nome
+    finally:
+        pool_sessoes.fechar_todos()
+        with conexao.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA {nome} CASCADE")
+        conexao.close()
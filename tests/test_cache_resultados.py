@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+pytest.importorskip('qgis.core')
+
+from qgis.core import QgsFeature, QgsGeometry, QgsWkbTypes
+
+from poligonizador_linha_corte.services.cache_resultados import ResultCache, chave_cache, hash_entrada
+from poligonizador_linha_corte.services.nucleo import criar_camada_memoria
+from poligonizador_linha_corte.services.pipeline_memoria import InMemoryPipeline
+
+QUADRA = QgsGeometry.fromWkt('POLYGON((0 0, 10 0, 10 10, 0 10, 0 0))')
+LOTES = [QgsGeometry.fromWkt('POLYGON((0 0, 5 0, 5 10, 0 10, 0 0))'),
+         QgsGeometry.fromWkt('POLYGON((5 0, 10 0, 10 10, 5 10, 5 0))')]
+PARAMETROS = InMemoryPipeline.parametros()
+
+
+def _linha(wkt):
+    return QgsGeometry.fromWkt(wkt)
+
+
+def test_acerto_e_falha(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cache.gravar('a', LOTES)
+
+    assert [g.asWkt() for g in cache.obter('a')] == [g.asWkt() for g in LOTES]
+    assert cache.obter('b') is None
+    assert (cache.acertos, cache.falhas) == (1, 1)
+
+
+def test_tamanho_acompanhado_entre_gravacoes_e_instancias(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cache.gravar('a', LOTES)
+    tamanho = cache._total
+    cache.gravar('a', LOTES)
+
+    assert cache._total == tamanho
+    assert ResultCache(str(tmp_path))._total == tamanho
+
+
+def test_descarte_lru_mantem_entrada_usada(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    for chave in 'abc':
+        cache.gravar(chave, LOTES)
+    tamanho = cache._total // 3
+    for instante, chave in enumerate('abc', start=1):
+        os.utime(tmp_path / f'{chave}.json', (instante * 1000, instante * 1000))
+    cache.obter('a')  # uso recente: 'b' passa a ser a menos usada
+
+    cache.limite_bytes = int(tamanho * 3.5)
+    cache.gravar('d', LOTES)
+
+    assert sorted(os.listdir(tmp_path)) == ['a.json', 'c.json', 'd.json']
+    assert cache._total == 3 * tamanho
+
+
+def test_chave_muda_com_a_geometria_das_linhas():
+    linhas = [_linha('LINESTRING(5 0, 5 10)'), _linha('LINESTRING(0 5, 5 5)')]
+    movida = [_linha('LINESTRING(5.5 0, 5.5 10)'), _linha('LINESTRING(0 5, 5 5)')]
+
+    impressao = hash_entrada(QUADRA, linhas, PARAMETROS)
+    assert impressao == hash_entrada(QUADRA, list(reversed(linhas)), PARAMETROS)
+    assert impressao != hash_entrada(QUADRA, movida, PARAMETROS)
+    assert chave_cache(impressao, 'memoria') != chave_cache(impressao, 'processing')
+
+
+def test_lotes_agrupados_pela_feicao_da_quadra_mesmo_sem_id(processing):
+    from poligonizador_linha_corte.services.pipeline_processing import ProcessingPipeline
+
+    lotes = []
+    for geom in LOTES:
+        lote = QgsFeature(InMemoryPipeline.campos_lote())
+        lote.setGeometry(geom)
+        lotes.append(lote)  # id_quadra nulo
+    camada = criar_camada_memoria(lotes, InMemoryPipeline.campos_lote(), QgsWkbTypes.Polygon,
+                                  'EPSG:31984', 'lotes')
+    outra = QgsGeometry.fromWkt('POLYGON((20 0, 30 0, 30 10, 20 10, 20 0))')
+
+    grupos = ProcessingPipeline.lotes_por_quadra(camada, [(7, QUADRA), (8, outra)])
+
+    assert list(grupos) == [7]
+    assert len(grupos[7]) == 2
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Carga por COPY contra um banco PostGIS real
+
+Requer psycopg2 e a variável POLIGONIZADOR_TESTE_DSN (string libpq de um
+banco com a extensão postgis); sem elas os testes são ignorados.
+"""
+import os
+
+import pytest
+
+pytest.importorskip('qgis.core')
+psycopg2 = pytest.importorskip('psycopg2')
+
+from qgis.core import QgsFeature, QgsGeometry
+from qgis.PyQt.QtCore import QDate
+
+from poligonizador_linha_corte.services.carga_lotes import CargaLotes
+from poligonizador_linha_corte.services.pipeline_memoria import InMemoryPipeline
+
+DSN = os.environ.get('POLIGONIZADOR_TESTE_DSN')
+pytestmark = pytest.mark.skipif(not DSN, reason='POLIGONIZADOR_TESTE_DSN não definido')
+
+
+def _lote(id_quadra, x):
+    feature = QgsFeature(InMemoryPipeline.campos_lote())
+    feature.setAttributes([1, 2, 3, id_quadra, 10 + id_quadra, 'Territorial', 'teste', QDate(2025, 1, 2)])
+    feature.setGeometry(QgsGeometry.fromWkt(f'POLYGON(({x} 0, {x + 1} 0, {x + 1} 1, {x} 1, {x} 0))'))
+    return feature
+
+
+def test_copy_em_view_via_tabela_temporaria(esquema_lotes):
+    lotes = [_lote(7, 0), _lote(7, 1), _lote(8, 2)]
+
+    carga = CargaLotes(DSN, f'{esquema_lotes}.v_lote').gravar(lotes, quadras_por_commit=1)
+
+    assert carga['linhas'] == 3
+    assert carga['commits'] == 2
+    conexao = psycopg2.connect(DSN)
+    try:
+        with conexao.cursor() as cursor:
+            cursor.execute(f"SELECT id_quadra, COUNT(*), MIN(ST_SRID(geom)) FROM {esquema_lotes}.lote "
+                           f"GROUP BY id_quadra ORDER BY id_quadra")
+            assert cursor.fetchall() == [(7, 2, 31984), (8, 1, 31984)]
+    finally:
+        conexao.close()
+
+
+def _contagem(esquema):
+    conexao = psycopg2.connect(DSN)
+    try:
+        with conexao.cursor() as cursor:
+            cursor.execute(f"SELECT id_quadra, COUNT(*), MIN(ST_XMin(geom)) FROM {esquema}.lote "
+                           f"GROUP BY id_quadra ORDER BY id_quadra")
+            return cursor.fetchall()
+    finally:
+        conexao.close()
+
+
+def test_reprocessamento_incremental_substitui_lotes(esquema_lotes):
+    carga = CargaLotes(DSN, f'{esquema_lotes}.v_lote')
+    carga.gravar([_lote(7, 0), _lote(7, 1), _lote(8, 2)])
+    conexao = psycopg2.connect(DSN)
+    conexao.autocommit = True
+    with conexao.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {esquema_lotes}.slote (id_lote) "
+                       f"SELECT id FROM {esquema_lotes}.lote WHERE id_quadra = 7")
+    conexao.close()
+
+    # Linhas da quadra 7 alteradas: dois lotes novos em outra posição, duas vezes
+    for _ in range(2):
+        resultado = carga.gravar([_lote(7, 10), _lote(7, 11)], substituir=[7])
+        assert resultado['removidos'] == 2
+
+    assert _contagem(esquema_lotes) == [(7, 2, 10.0), (8, 1, 2.0)]
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+pytest.importorskip('qgis.core')
+
+from poligonizador_linha_corte.services.definicao_pipeline import DefinicaoPipeline, DEFINICAO_PADRAO
+
+
+def _sem(*omitidas):
+    return {'versao': 1, 'etapas': [e for e in DEFINICAO_PADRAO['etapas'] if e['nome'] not in omitidas]}
+
+
+def test_etapas_opcionais_ausentes_zeram_parametros():
+    definicao = DefinicaoPipeline(_sem('EstenderLinhas', 'Simplificar'))
+
+    parametros = definicao.parametros()
+    assert parametros['distancia_extensao'] == 0.0
+    assert parametros['tolerancia_simplificacao'] == 0.0
+    assert 'EstenderLinhas' not in definicao.etapas
+    assert {'EstenderLinhas', 'Simplificar'} <= set(definicao.ignoradas)
+
+
+def test_etapa_ausente_muda_parametros_da_chave_do_cache():
+    completa = DefinicaoPipeline(_sem()).parametros()
+    reduzida = DefinicaoPipeline(_sem('EstenderLinhas', 'Simplificar')).parametros()
+
+    assert completa != reduzida
+    assert completa['razao_area'] == reduzida['razao_area']
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from poligonizador_linha_corte.services.execucao_paralela import ParallelQuadraExecutor
+
+
+class FeedbackCancelado:
+    """Cancela no primeiro progresso e libera a tarefa que estava em execução"""
+
+    def __init__(self, liberar):
+        self.liberar = liberar
+        self.cancelado = False
+
+    def setProgress(self, progresso):
+        self.cancelado = True
+        self.liberar.set()
+
+    def isCanceled(self):
+        return self.cancelado
+
+
+def test_resultados_na_ordem_de_entrada():
+    tarefas = [(custo, (valor,)) for custo, valor in [(1, 'a'), (3, 'b'), (2, 'c')]]
+
+    resultados = ParallelQuadraExecutor(2).executar(tarefas, str.upper)
+
+    assert resultados == [{'resultado': 'A'}, {'resultado': 'B'}, {'resultado': 'C'}]
+
+
+def test_cancelamento_mantem_tarefas_em_execucao():
+    liberar = threading.Event()
+
+    def funcao(nome):
+        if nome == 'lenta':
+            liberar.wait(5)
+        return nome
+
+    # Maior custo primeiro: 'lenta' e 'rapida' começam, 'fila' espera um worker
+    tarefas = [(3, ('lenta',)), (2, ('rapida',)), (1, ('fila',))]
+
+    resultados = ParallelQuadraExecutor(2).executar(tarefas, funcao, FeedbackCancelado(liberar))
+
+    assert resultados[0] == {'resultado': 'lenta'}
+    assert resultados[1] == {'resultado': 'rapida'}
+    assert resultados[2] in (None, {'resultado': 'fila'})
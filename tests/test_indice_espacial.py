@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+pytest.importorskip('qgis.core')
+
+from qgis.core import QgsFeature, QgsFields, QgsGeometry, QgsPointXY, QgsRectangle, QgsWkbTypes
+
+from poligonizador_linha_corte.services.indice_espacial import LinhasCorteIndex
+from poligonizador_linha_corte.services.nucleo import criar_camada_memoria
+
+
+def _linha(xa, ya, xb, yb):
+    feature = QgsFeature()
+    feature.setGeometry(QgsGeometry.fromPolylineXY([QgsPointXY(xa, ya), QgsPointXY(xb, yb)]))
+    return feature
+
+
+@pytest.fixture
+def linhas_layer(qgis_app):
+    features = [_linha(0, 5, 10, 5), _linha(5, 0, 5, 10), _linha(100, 100, 110, 100)]
+    return criar_camada_memoria(features, QgsFields(), QgsWkbTypes.LineString, 'EPSG:31984', 'Linhas_corte')
+
+
+def test_indice_de_camada_de_memoria(linhas_layer):
+    indice = LinhasCorteIndex(linhas_layer)
+
+    assert sorted(indice.ids) == sorted(f.id() for f in linhas_layer.getFeatures())
+    quadra = QgsGeometry.fromRect(QgsRectangle(0, 0, 10, 10))
+    assert indice.tem_linhas(quadra)
+    assert len(indice.linhas_intersectando(quadra)) == 2
+    assert not indice.tem_linhas(QgsGeometry.fromRect(QgsRectangle(50, 50, 60, 60)))
+
+
+def test_extensao_limita_linhas_indexadas(linhas_layer):
+    indice = LinhasCorteIndex(linhas_layer, QgsRectangle(-1, -1, 11, 11))
+
+    assert len(indice.ids) == 2
+    estendidas = indice.estendidas(1.0)
+    assert set(estendidas) == set(indice.ids)
+    assert all(g.length() == pytest.approx(12.0) for g in estendidas.values())
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import copy
+
+import pytest
+
+pytest.importorskip('qgis.core')
+
+from poligonizador_linha_corte.services import job_ladrilhos
+from poligonizador_linha_corte.services.carga_lotes import ErroCarga
+from poligonizador_linha_corte.services.definicao_pipeline import DefinicaoPipeline, DEFINICAO_PADRAO
+from poligonizador_linha_corte.services.job_ladrilhos import DiarioCheckpoint, executar_job
+
+
+class LadrilhoFixo:
+    def __init__(self, chave, ids):
+        self.chave = chave
+        self.ids = ids
+
+    def quadras(self, layer):
+        return list(self.ids)
+
+
+@pytest.fixture
+def diario(tmp_path):
+    diario = DiarioCheckpoint(str(tmp_path / 'job.sqlite'))
+    yield diario
+    diario.fechar()
+
+
+@pytest.fixture
+def falhas(monkeypatch):
+    """Quadras que falham no próximo poligonizar_quadras; chamadas registradas"""
+    estado = {'falham': set(), 'chamadas': []}
+
+    def poligonizar_quadras(quadras, *args):
+        estado['chamadas'].append(list(quadras))
+        relatorio = {'processadas': [], 'ignoradas': [], 'total_lotes': 0}
+        lotes = []
+        for quadra_id in quadras:
+            if quadra_id in estado['falham']:
+                relatorio['ignoradas'].append({'inscricao': quadra_id, 'id': quadra_id, 'motivo': 'Erro: falha'})
+            else:
+                relatorio['processadas'].append({'inscricao': quadra_id, 'id': quadra_id, 'lotes': 1})
+                relatorio['total_lotes'] += 1
+                lotes.append(quadra_id)
+        return lotes, relatorio
+
+    monkeypatch.setattr(job_ladrilhos, 'poligonizar_quadras', poligonizar_quadras)
+    monkeypatch.setattr(job_ladrilhos, 'info_quadra', lambda quadra_id: {'id': quadra_id})
+    monkeypatch.setattr(job_ladrilhos.InMemoryPipeline, 'contexto_execucao', staticmethod(lambda: {}))
+    return estado
+
+
+class Destino:
+    """Lotes gravados por quadra; falha na gravação do ladrilho indicado"""
+
+    def __init__(self):
+        self.lotes = {}
+        self.falha = None
+
+    def gravar(self, lotes, substituir):
+        if self.falha is not None:
+            falha, self.falha = self.falha, None
+            # Metade da carga confirmada antes da falha
+            for quadra_id in lotes[:len(lotes) // 2]:
+                self.lotes[quadra_id] = self.lotes.get(quadra_id, 0) + 1
+            raise falha
+        for quadra_id in substituir:
+            self.lotes.pop(quadra_id, None)
+        for quadra_id in lotes:
+            self.lotes[quadra_id] = self.lotes.get(quadra_id, 0) + 1
+
+
+def _executar(diario, destino=None):
+    ladrilhos = [LadrilhoFixo('a', [1, 2]), LadrilhoFixo('b', [3])]
+    definicao = DefinicaoPipeline(copy.deepcopy(DEFINICAO_PADRAO))
+    gravar = destino.gravar if destino is not None else lambda lotes, substituir: None
+    return executar_job(None, None, ladrilhos, diario, 'job', gravar, definicao=definicao)
+
+
+def test_retomada_refaz_quadras_com_erro(diario, falhas):
+    falhas['falham'] = {2}
+    primeira = _executar(diario)
+
+    assert primeira['ladrilhos']['concluidos'] == 1
+    assert diario.status_ladrilhos('job') == {'a': 'pendente', 'b': 'concluido'}
+
+    falhas['falham'] = set()
+    falhas['chamadas'].clear()
+    segunda = _executar(diario)
+
+    assert falhas['chamadas'] == [[2]]
+    assert segunda['ladrilhos']['ja_concluidos'] == 1
+    assert diario.status_ladrilhos('job') == {'a': 'concluido', 'b': 'concluido'}
+    assert diario.resumo('job')['quadras'] == {'processada': 3}
+
+
+def test_diario_antigo_reabre_ladrilho_concluido_com_erro(diario):
+    relatorio = {
+        'processadas': [{'inscricao': 1, 'id': 1, 'lotes': 2}],
+        'ignoradas': [{'inscricao': 2, 'id': 2, 'motivo': 'Erro: falha'}],
+        'total_lotes': 2
+    }
+    diario.registrar_ladrilho('job', 'a', relatorio, True)
+    # Diários anteriores gravavam 'concluido' mesmo com quadras em erro
+    with diario._conexao:
+        diario._conexao.execute("UPDATE ladrilho SET status = 'concluido'")
+
+    assert diario.status_ladrilhos('job') == {'a': 'pendente'}
+    assert diario.quadras_registradas('job') == {'1'}
+
+
+def test_retomada_apos_queda_na_gravacao_substitui_lotes(diario, falhas):
+    destino = Destino()
+    destino.falha = RuntimeError('conexão perdida')
+    with pytest.raises(RuntimeError):
+        _executar(diario, destino)
+    assert diario.status_ladrilhos('job') == {'a': 'gravando'}
+
+    relatorio = _executar(diario, destino)
+
+    assert relatorio['ladrilhos_regravados'] == ['a']
+    assert destino.lotes == {1: 1, 2: 1, 3: 1}
+    assert diario.status_ladrilhos('job') == {'a': 'concluido', 'b': 'concluido'}
+
+
+def test_falha_parcial_da_carga_registra_quadras_confirmadas(diario, falhas):
+    destino = Destino()
+    destino.falha = ErroCarga('bloco desfeito', [1])
+    with pytest.raises(ErroCarga):
+        _executar(diario, destino)
+    assert diario.status_ladrilhos('job') == {'a': 'pendente'}
+    assert diario.quadras_registradas('job') == {'1'}
+
+    falhas['chamadas'].clear()
+    _executar(diario, destino)
+
+    assert falhas['chamadas'] == [[2], [3]]
+    assert destino.lotes == {1: 1, 2: 1, 3: 1}
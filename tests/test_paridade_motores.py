@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+O motor em memória gera os mesmos lotes que a cadeia de processing
+
+Quadras e linhas de corte sintéticas (benchmarks/dados_sinteticos.py), com
+as pontas das linhas antes da borda, como nos desenhos reais.
+"""
+import pytest
+
+pytest.importorskip('qgis.core')
+
+from qgis.core import QgsFields, QgsProcessingFeedback, QgsProcessingMultiStepFeedback, QgsWkbTypes
+
+from benchmarks.dados_sinteticos import CRS_PADRAO, campos_quadra, gerar_linhas_corte, gerar_quadras
+from poligonizador_linha_corte.services.definicao_pipeline import DefinicaoPipeline
+from poligonizador_linha_corte.services.nucleo import criar_camada_memoria
+from poligonizador_linha_corte.services.pipeline_memoria import InMemoryPipeline
+
+LOTES_POR_LADO = 3
+
+
+def _resumo(lotes):
+    """(atributos, área, ponto interior) de cada lote, em ordem"""
+    resumo = []
+    for lote in lotes:
+        geom = lote.geometry()
+        ponto = geom.pointOnSurface().asPoint()
+        resumo.append((
+            tuple(str(valor) for valor in lote.attributes()),
+            round(geom.area(), 3),
+            round(ponto.x(), 1), round(ponto.y(), 1)
+        ))
+    return sorted(resumo)
+
+
+def test_memoria_e_processing_geram_os_mesmos_lotes(processing):
+    from poligonizador_linha_corte.services.pipeline_processing import ProcessingPipeline
+
+    quadras = gerar_quadras(2)
+    linhas = gerar_linhas_corte(quadras, LOTES_POR_LADO)
+    definicao = DefinicaoPipeline.padrao()
+    contexto = InMemoryPipeline.contexto_execucao()
+
+    quadra_layer = criar_camada_memoria(quadras, campos_quadra(), QgsWkbTypes.Polygon, CRS_PADRAO, 'Quadra')
+    quadra_layer.selectAll()
+    linhas_layer = criar_camada_memoria(linhas, QgsFields(), QgsWkbTypes.LineString, CRS_PADRAO, 'Linhas_corte')
+    outputs = ProcessingPipeline.executar_pipeline_completo(
+        quadra_layer, linhas_layer, None,
+        QgsProcessingMultiStepFeedback(definicao.num_etapas, QgsProcessingFeedback()),
+        contexto=contexto, definicao=definicao
+    )
+    lotes_processing = list(outputs['EditarCampos']['OUTPUT'].getFeatures())
+
+    geometrias_linhas = [linha.geometry() for linha in linhas]
+    lotes_memoria = []
+    for quadra in quadras:
+        lotes_memoria.extend(InMemoryPipeline.executar(
+            quadra, geometrias_linhas, definicao.parametros(), contexto
+        )['lotes'])
+
+    assert len(lotes_memoria) == len(quadras) * 2 * LOTES_POR_LADO
+    assert _resumo(lotes_memoria) == _resumo(lotes_processing)
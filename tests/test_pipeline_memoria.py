@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Ajuste à grade com vértices quase coincidentes (distância abaixo da tolerância)"""
+import pytest
+
+pytest.importorskip('qgis.core')
+
+from qgis.core import QgsGeometry
+
+from poligonizador_linha_corte.services.pipeline_memoria import InMemoryPipeline
+
+TOLERANCIA = 0.0001
+
+
+def _ajustar(*wkts):
+    return InMemoryPipeline.ajustar_a_grade([QgsGeometry.fromWkt(wkt) for wkt in wkts], TOLERANCIA)
+
+
+def test_cintura_fechada_pelo_ajuste_vira_dois_poligonos_validos(qgis_app):
+    # Os vértices da cintura (5 4.99996) e (5 5.00004) caem na mesma célula
+    ampulheta = ('POLYGON((0 0, 4 0, 5 4.99996, 6 0, 10 0, 10 10, 6 10, '
+                 '5 5.00004, 4 10, 0 10, 0 0))')
+
+    ajustados = _ajustar(ampulheta)
+
+    assert len(ajustados) == 2
+    assert all(g.isGeosValid() and not g.isMultipart() for g in ajustados)
+    assert sum(g.area() for g in ajustados) == pytest.approx(QgsGeometry.fromWkt(ampulheta).area(), abs=1e-3)
+
+
+def test_espinho_colapsado_e_removido(qgis_app):
+    # (5.00004 10) volta sobre (5 10): o espinho até (5 15) fica com área nula
+    ajustados = _ajustar('POLYGON((0 0, 10 0, 10 10, 5.00004 10, 5 15, 5 10, 0 10, 0 0))')
+
+    assert len(ajustados) == 1
+    assert ajustados[0].isGeosValid()
+    assert ajustados[0].area() == pytest.approx(100.0)
+
+
+def test_poligono_colapsado_em_linha_e_descartado(qgis_app):
+    ajustados = _ajustar(
+        'POLYGON((0 0, 10 0, 10 0.00004, 5 0.00004, 0 0.00004, 0 0))',
+        'POLYGON((0 0, 10 0, 10 10, 0 10, 0 0))'
+    )
+
+    assert [g.area() for g in ajustados] == [pytest.approx(100.0)]
+
+
+def test_multipoligono_reparado_continua_multiparte(qgis_app):
+    ajustados = _ajustar(
+        'MULTIPOLYGON(((0 0, 4 0, 5 4.99996, 6 0, 10 0, 10 10, 6 10, 5 5.00004, 4 10, 0 10, 0 0)),'
+        '((20 0, 30 0, 30 10, 20 10, 20 0)))'
+    )
+
+    assert len(ajustados) == 1
+    assert ajustados[0].isMultipart() and ajustados[0].isGeosValid()
+    assert ajustados[0].constGet().numGeometries() == 3
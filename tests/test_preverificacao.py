@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+pytest.importorskip('qgis.core')
+
+from qgis.core import QgsGeometry
+
+from poligonizador_linha_corte.services.preverificacao import classificar_quadra, preverificar
+
+QUADRA = 'POLYGON((0 0, 10 0, 10 10, 0 10, 0 0))'
+
+
+def _classificar(*linhas):
+    return classificar_quadra(QgsGeometry.fromWkt(QUADRA), [QgsGeometry.fromWkt(w) for w in linhas])
+
+
+def test_sem_linhas_ignora_a_quadra():
+    assert _classificar() == 'Sem linhas de corte'
+
+
+def test_linha_solta_toca_a_borda_em_um_ponto():
+    motivo = _classificar('LINESTRING(0 5, 5 5)')
+
+    assert motivo.startswith('Linhas tocam a borda em um só ponto')
+    assert '(ponta solta a 4.70 m)' in motivo
+
+
+def test_linhas_que_nao_alcancam_a_borda():
+    assert _classificar('LINESTRING(3 5, 6 5)').startswith('Linhas não alcançam a borda')
+
+
+def test_linha_que_atravessa_divide_a_quadra():
+    # Pontas a 0.1 m da borda: a extensão de 0.3 m as leva até ela
+    assert _classificar('LINESTRING(0.1 5, 9.9 5)') is None
+
+
+def test_erro_na_preverificacao_nao_descarta_a_quadra():
+    assert preverificar(None, [QgsGeometry.fromWkt('LINESTRING(0 5, 5 5)')], inscricao='Q1') is None
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+pytest.importorskip('qgis.core')
+
+from qgis.core import QgsGeometry
+
+from poligonizador_linha_corte.services.profiler import PipelineProfiler
+
+
+def _linhas(quantidade, espera):
+    for i in range(quantidade):
+        time.sleep(espera)
+        yield QgsGeometry.fromWkt(f'LINESTRING({i} 0, {i} 1, {i} 2)')
+
+
+def test_etapa_em_fluxo_medida_no_consumo():
+    perfil = PipelineProfiler()
+
+    with perfil.etapa('Estender', [QgsGeometry.fromWkt('POINT(0 0)')]) as etapa:
+        etapa.saida = _linhas(4, 0.02)
+    fluxo = etapa.saida
+    with perfil.etapa('Poligonizar', fluxo) as etapa:
+        etapa.saida = list(fluxo)
+
+    estender, poligonizar = perfil.registros
+    assert estender['fluxo'] is True
+    assert estender['parede_s'] >= 0.08
+    assert poligonizar['parede_s'] < 0.04
+    assert (estender['feicoes_saida'], estender['vertices_saida']) == (4, 12)
+    assert (poligonizar['feicoes_entrada'], poligonizar['vertices_entrada']) == (4, 12)
+    assert (poligonizar['feicoes_saida'], poligonizar['vertices_saida']) == (4, 12)
+
+
+def test_profiler_inativo_nao_troca_a_saida():
+    perfil = PipelineProfiler(ativo=False)
+    gerador = _linhas(1, 0)
+
+    with perfil.etapa('Estender') as etapa:
+        etapa.saida = gerador
+
+    assert etapa.saida is gerador
+    assert perfil.registros == []
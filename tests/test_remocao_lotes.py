@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Remoção em um comando contra um banco PostGIS real
+
+Requer psycopg2 e a variável POLIGONIZADOR_TESTE_DSN; sem elas os testes
+que usam o banco são ignorados.
+"""
+import os
+
+import pytest
+
+from poligonizador_linha_corte.services import remocao_lotes
+
+DSN = os.environ.get('POLIGONIZADOR_TESTE_DSN')
+
+
+def _quadra(quadra_id):
+    return {'id': quadra_id, 'inscricao': f"Q{quadra_id}"}
+
+
+def test_separar_ids_descarta_nulos_e_nao_numericos():
+    validas, invalidas = remocao_lotes.separar_ids([_quadra(7), _quadra('8'), _quadra(None), _quadra('7A')])
+
+    assert [quadra_id for quadra_id, _ in validas] == [7, 8]
+    assert [quadra_info['id'] for quadra_info in invalidas] == [None, '7A']
+
+
+def test_um_comando_remove_lotes_e_dependentes(esquema_lotes):
+    psycopg2 = pytest.importorskip('psycopg2')
+    conexao = psycopg2.connect(DSN)
+    conexao.autocommit = True
+    with conexao.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {esquema_lotes}.lote (id_quadra) VALUES (7), (7), (8), (9)")
+        for tabela in ('slote', 'v_calcular_testada'):
+            cursor.execute(f"INSERT INTO {esquema_lotes}.{tabela} (id_lote) "
+                           f"SELECT id FROM {esquema_lotes}.lote WHERE id_quadra IN (7, 8)")
+
+    relatorio = remocao_lotes.RemocaoLotes(DSN, esquema_lotes).remover(
+        [_quadra(7), _quadra(8), _quadra(10), _quadra(None)]
+    )
+
+    assert relatorio['total_removidos'] == 3
+    assert relatorio['commits'] == 1
+    assert {item['id'] for item in relatorio['processadas']} == {7, 8}
+    assert {item['id'] for item in relatorio['ignoradas']} == {10, None}
+    with conexao.cursor() as cursor:
+        cursor.execute(f"SELECT id_quadra FROM {esquema_lotes}.lote")
+        assert cursor.fetchall() == [(9,)]
+        cursor.execute(f"SELECT COUNT(*) FROM {esquema_lotes}.slote")
+        assert cursor.fetchone() == (0,)
+    conexao.close()